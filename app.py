@@ -1,13 +1,25 @@
-from flask import Flask, render_template, request, jsonify, send_from_directory
+from flask import Flask, render_template, request, jsonify, send_from_directory, stream_with_context
 import pandas as pd
 import numpy as np
-import joblib
 import json
 from datetime import datetime
 import logging
 import traceback
+import hmac
 import math
 import os
+from functools import partial
+
+from batch_valuation import BatchValuation, read_csv_chunks, read_ndjson_chunks, write_csv, write_ndjson
+from car_index import TrimIndex
+from comparables import ComparablesIndex
+from data_store import AUCTION_SCHEMA, LISTING_SCHEMA, PREDICTED_SCHEMA, DatasetStore, read_typed_dataset
+from features import MODEL_FEATURES, FeaturePipeline
+from inference import PredictionCache
+from listing_table import ListingTable
+from market_stats import (IncrementalMarketStats, listing_analysis, prepare_listing_rows, prepare_sold_out_rows,
+                          sold_out_analysis)
+from model_registry import ModelRegistry
 
 
 app = Flask(__name__)
@@ -15,15 +27,69 @@ logging.basicConfig(level=logging.DEBUG)
 
 app.static_folder = 'static'
 
-global model
-model = None
-
-try:
-    model = joblib.load(
-        "./models/['Age', 'Kilometers', 'Make', 'Model', 'Trim', 'Regional Specs', 'Age_Kilometers', 'Kilometers_per_Year']_best_xgb_new.joblib")
-    app.logger.info("Model loaded successfully")
-except Exception as e:
-    app.logger.error(f"Error loading model: {e}")
+# Valuations skip pandas and sklearn: rows are encoded straight into the booster's input matrix. A changed model file
+# is loaded and warmed up in the background, then swapped in (see model_registry.py)
+models = ModelRegistry(log=app.logger.info)
+models.register('valuation', warm_up=lambda loaded: warm_up_valuation_model(loaded))
+# The /admin/models endpoints answer only requests carrying this token in X-Admin-Token; unset disables them
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+
+# Repeat valuations of the same features are answered from memory; entries are dropped when the model file changes
+PREDICTION_CACHE_SIZE = 10000
+PREDICTION_CACHE_TTL = 6 * 60 * 60
+# Set to e.g. 1000 to share predictions between kilometers in the same 1000 km bucket
+PREDICTION_CACHE_KM_BUCKET = None
+prediction_cache = PredictionCache(PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TTL, PREDICTION_CACHE_KM_BUCKET)
+# Most recently used cache entries re-scored by a new model before it goes live
+PREDICTION_CACHE_WARM_ROWS = 1000
+
+# Model features derived against the running year
+feature_pipeline = FeaturePipeline()
+
+# Rows read, scored and written at a time by /api/valuations/batch, which bounds its memory whatever the upload size
+BATCH_CHUNK_ROWS = 5000
+BATCH_READERS = {'csv': read_csv_chunks, 'ndjson': read_ndjson_chunks}
+BATCH_WRITERS = {'csv': (write_csv, 'text/csv'), 'ndjson': (write_ndjson, 'application/x-ndjson')}
+
+# Most listings returned per similar-car list of a valuation, closest mileage first
+SIMILAR_CARS_LIMIT = 50
+# Comparables returned per dataset by /get-comparables, by default and at most
+COMPARABLES_K = 10
+COMPARABLES_MAX_K = 50
+
+LISTING_PAGE_SIZE = 10
+LISTING_MAX_PAGE_SIZE = 100
+# Query parameters of /get-cars-for-sale and the listing fields they filter
+LISTING_EQUALITY_PARAMS = {'make': 'Make', 'model': 'Model', 'regional_specs': 'Regional Specs', 'source': 'Source',
+                           'seller_type': 'Seller Type'}
+LISTING_RANGE_PARAMS = {'year': 'Year', 'km': 'Kilometers', 'price': 'Price'}
+
+# Each dataset is loaded once from its typed Parquet copy (or parsed from CSV), then reloaded only when
+# car_price_monitor.py replaces the file
+datasets = DatasetStore()
+# Listing fields the endpoints read: listing pages and comparables, the market-insights stats and the trim index
+LISTING_FIELDS = ['id', 'Make', 'Model', 'Trim', 'Year', 'Kilometers', 'Regional Specs', 'Price', 'Seller Type',
+                  'Posted Datetime', 'Source', 'permalink', 'Body Type', 'Fuel Type', 'Transmission Type']
+datasets.register('cars_for_sale', "./car_data/cars_for_sale.csv",
+                  partial(read_typed_dataset, **LISTING_SCHEMA, columns=LISTING_FIELDS), unique_key='id')
+datasets.register('sold_out', "./car_data/dubizzle_cars_sold_out.csv",
+                  partial(read_typed_dataset, **LISTING_SCHEMA, columns=LISTING_FIELDS), unique_key='id')
+datasets.register('cars_predicted', "./car_data/cars_predicted.csv",
+                  partial(read_typed_dataset, **PREDICTED_SCHEMA,
+                          columns=['id', 'Make', 'Model', 'Year', 'Kilometers', 'Regional Specs', 'Price',
+                                   'Predicted_Price', 'price/expected_price', 'Seller Type', 'Posted Datetime',
+                                   'Source', 'permalink']),
+                  unique_key='id')
+datasets.register('auction_sold', "./car_data/auction_sold_cars.csv",
+                  partial(read_typed_dataset, **AUCTION_SCHEMA,
+                          columns=['Id', 'Make', 'Model', 'Year', 'Kilometers', 'Regional Specs', 'Primary Damage',
+                                   'Start Price', 'Final Price', 'Bid Difference', 'Bid Difference Percentage',
+                                   'Auction Date', 'Participation Count', 'Source']),
+                  unique_key='Id')
+
+# Market-insights aggregates carried across data versions; a new version applies only its changed rows
+listing_stats = IncrementalMarketStats(prepare_listing_rows)
+sold_out_stats = IncrementalMarketStats(prepare_sold_out_rows)
 
 
 @app.route('/value-your-car', methods=['GET', 'POST'])
@@ -49,152 +115,22 @@ def value_your_car():
                 if not user_input[feature]:
                     return jsonify({"success": False, "error": f"Missing required field: {feature}"}), 400
 
-            input_df = pd.DataFrame([user_input])
-
             # Convert numeric fields with error handling
             try:
-                input_df['Kilometers'] = pd.to_numeric(input_df['Kilometers'], errors='coerce')
-                input_df['Year'] = pd.to_numeric(input_df['Year'], errors='coerce')
+                kilometers = pd.to_numeric(user_input['Kilometers'], errors='coerce')
+                year = pd.to_numeric(user_input['Year'], errors='coerce')
 
                 # Check for NaN values after conversion
-                if input_df['Kilometers'].isna().any() or input_df['Year'].isna().any():
+                if pd.isna(kilometers) or pd.isna(year):
                     raise ValueError("Invalid numeric input for Kilometers or Year")
 
                 # Ensure Year is an integer
-                input_df['Year'] = input_df['Year'].astype('int64')
+                year = np.int64(year)
             except ValueError as ve:
                 app.logger.error(f"Numeric conversion error: {str(ve)}")
                 return jsonify({"success": False, "error": f"Invalid numeric input: {str(ve)}"}), 400
 
-            # Calculate Age from Year
-            current_year = datetime.now().year
-            input_df['Age'] = current_year - input_df['Year']
-
-            # Calculate new features
-            input_df['Age_Kilometers'] = input_df['Age'] * input_df['Kilometers']
-            input_df['Kilometers_per_Year'] = input_df['Kilometers'] / input_df['Age'].replace(0, 1)
-
-            # Ensure all categorical variables are strings
-            categorical_columns = [col for col in features if col not in ['Kilometers', 'Year']]
-            for col in categorical_columns:
-                input_df[col] = input_df[col].astype(str)
-
-            # Validate input
-            input_df = validate_input(input_df, options)
-
-            # Handle Unknown Trim
-            if input_df['Trim'].iloc[0] == 'Unknown':
-                # Load sold out cars data
-                sold_out_df = pd.read_csv("./car_data/dubizzle_cars_sold_out.csv")
-
-                # Filter for the same make and model
-                relevant_cars = sold_out_df[
-                    (sold_out_df['Make'] == input_df['Make'].iloc[0]) &
-                    (sold_out_df['Model'] == input_df['Model'].iloc[0])
-                ]
-
-                if relevant_cars.empty:
-                    return jsonify(
-                        {"success": False, "error": "No data available for this make and model combination."})
-
-                # Get unique trims
-                trims = relevant_cars['Trim'].unique()
-
-                trim_predictions = {}
-                predictions = []
-                for trim in trims:
-                    trim_input = input_df.copy()
-                    trim_input['Trim'] = trim
-
-                    # Select only the features required by the model
-                    model_features = ['Age', 'Kilometers', 'Make', 'Model', 'Trim', 'Regional Specs', 'Age_Kilometers',
-                                      'Kilometers_per_Year']
-                    trim_input_model = trim_input[model_features]
-
-                    trim_input_model = preprocess_dataframe(trim_input_model)
-
-                    prediction = model.predict(trim_input_model)[0]
-                    predictions.append(prediction)
-                    trim_predictions[trim] = f"AED {round(prediction):,}"
-
-                min_prediction = min(predictions)
-                max_prediction = max(predictions)
-                prediction = f"AED {round(min_prediction):,} - {round(max_prediction):,}"
-            else:
-                # Select only the features required by the model
-                model_features = ['Age', 'Kilometers', 'Make', 'Model', 'Trim', 'Regional Specs', 'Age_Kilometers',
-                                  'Kilometers_per_Year']
-                input_df_model = input_df[model_features]
-
-                input_df_model = preprocess_dataframe(input_df_model)
-                app.logger.info(f"Processed input data: {input_df_model.to_dict()}")
-
-                prediction = model.predict(input_df_model)[0]
-                prediction = f"AED {round(prediction):,}"
-                trim_predictions = None
-
-            # Fetch similar cars for sale
-            cars_for_sale_df = pd.read_csv("./car_data/cars_for_sale.csv", dtype=str)
-            cars_for_sale_df['Year'] = pd.to_numeric(cars_for_sale_df['Year'], errors='coerce').astype('int64')
-            cars_for_sale_df['Price'] = pd.to_numeric(cars_for_sale_df['Price'], errors='coerce')
-            cars_for_sale_df['Kilometers'] = pd.to_numeric(cars_for_sale_df['Kilometers'], errors='coerce')
-
-            filtered_cars = cars_for_sale_df[
-                (cars_for_sale_df['Make'] == user_input['Make']) &
-                (cars_for_sale_df['Model'] == user_input['Model']) &
-                (cars_for_sale_df['Year'] == input_df['Year'].iloc[0])
-            ]
-
-            app.logger.info(f"Found {len(filtered_cars)} similar cars for sale")
-
-            # Fetch similar sold-out cars
-            sold_out_df = pd.read_csv("./car_data/dubizzle_cars_sold_out.csv", dtype=str)
-            sold_out_df['Year'] = pd.to_numeric(sold_out_df['Year'], errors='coerce').astype('int64')
-            sold_out_df['Price'] = pd.to_numeric(sold_out_df['Price'], errors='coerce')
-            sold_out_df['Kilometers'] = pd.to_numeric(sold_out_df['Kilometers'], errors='coerce')
-
-            filtered_sold_out = sold_out_df[
-                (sold_out_df['Make'] == user_input['Make']) &
-                (sold_out_df['Model'] == user_input['Model']) &
-                (sold_out_df['Year'] == input_df['Year'].iloc[0])
-            ]
-
-            app.logger.info(f"Found {len(filtered_sold_out)} similar sold-out cars")
-
-            # Prepare filtered cars data
-            filtered_cars = preprocess_dataframe(filtered_cars)
-            filtered_cars_list = filtered_cars.to_dict('records')
-            for car in filtered_cars_list:
-                car['Price'] = int(float(car['Price'])) if car['Price'] else None
-                car['Kilometers'] = int(float(car['Kilometers'])) if car['Kilometers'] is not None else None
-                car['Year'] = int(car['Year']) if car['Year'] else None
-                car['Regional Specs'] = car.get('Regional Specs', 'N/A')
-                car['Seller Type'] = car.get('Seller Type', 'N/A')
-                car['Posted Date'] = car.get('Posted Datetime', 'N/A')
-                car['Source'] = car.get('Source', 'N/A')
-
-            # Prepare filtered sold-out cars data
-            filtered_sold_out = preprocess_dataframe(filtered_sold_out)
-            sold_out_list = filtered_sold_out.to_dict('records')
-            for car in sold_out_list:
-                car['Price'] = int(float(car['Price'])) if car['Price'] else None
-                car['Kilometers'] = int(float(car['Kilometers'])) if car['Kilometers'] is not None else None
-                car['Year'] = int(car['Year']) if car['Year'] else None
-                car['Regional Specs'] = car.get('Regional Specs', 'N/A')
-                car['Seller Type'] = car.get('Seller Type', 'N/A')
-                car['Posted Date'] = car.get('Posted Datetime', 'N/A')
-                car['Source'] = car.get('Source', 'N/A')
-
-            response_data = {
-                "success": True,
-                "prediction": prediction,
-                "car_info": user_input,
-                "similar_cars": filtered_cars_list,
-                "sold_out_cars": sold_out_list,
-                "trim_predictions": trim_predictions
-            }
-
-            return jsonify(response_data)
+            return valuation_response(user_input, kilometers, year, options)
 
         except Exception as e:
             app.logger.error(f"Prediction error: {str(e)}")
@@ -202,6 +138,43 @@ def value_your_car():
             return jsonify({"success": False, "error": f"Unable to make prediction: {str(e)}"}), 500
 
 
+@app.route('/api/valuations/batch', methods=['POST'])
+def valuations_batch():
+    try:
+        loaded = models.current('valuation')
+    except Exception as e:
+        app.logger.error(f"Error loading model: {str(e)}")
+        return jsonify({"success": False, "error": "Unable to load necessary data. Please try again later."}), 500
+    # The upload is a raw request body or a multipart 'file' field, CSV or JSON lines
+    upload = request.files.get('file')
+    stream = upload.stream if upload else request.stream
+    mimetype = upload.mimetype if upload else request.mimetype
+    filename = (upload.filename or '') if upload else ''
+    input_format = request.args.get('input') or (
+        'csv' if mimetype in ('text/csv', 'application/csv') or filename.endswith('.csv') else 'ndjson')
+    output_format = request.args.get('format') or (
+        'csv' if request.accept_mimetypes.best == 'text/csv' else 'ndjson')
+    if input_format not in BATCH_READERS or output_format not in BATCH_WRITERS:
+        return jsonify({"success": False, "error": "input and format must be csv or ndjson"}), 400
+
+    options, _ = load_data_and_options()
+    valuation = BatchValuation(feature_pipeline, partial(model_predict_frame, loaded=loaded), options,
+                               trim_index().trims_for, loaded.version)
+    read = BATCH_READERS[input_format]
+    write, output_mimetype = BATCH_WRITERS[output_format]
+
+    def generate():
+        try:
+            yield from write(valuation.run(read(stream, BATCH_CHUNK_ROWS)))
+        except Exception as e:
+            app.logger.error(f"Batch valuation error: {str(e)}")
+            app.logger.error(traceback.format_exc())
+            # The status line has been sent already, so the failure is reported as the last line
+            yield json.dumps({"success": False, "error": f"Unable to value batch: {str(e)}"}) + "\n"
+
+    return app.response_class(stream_with_context(generate()), mimetype=output_mimetype)
+
+
 @app.route('/cars-for-sale')
 def cars_for_sale():
     return render_template('cars_for_sale.html')
@@ -215,13 +188,7 @@ def auction_cars():
 @app.route('/undervalued-cars')
 def undervalued_cars():
     try:
-        cars_predicted_df = pd.read_csv("./car_data/cars_predicted.csv", dtype=str)
-        cars_predicted_df = cars_predicted_df.drop_duplicates(subset=['id'], keep='last', ignore_index=True)
-
-        cars_predicted_df['Year'] = pd.to_numeric(cars_predicted_df['Year'], errors='coerce').astype('int64')
-        numeric_fields = ['Kilometers', 'Price', 'Predicted_Price', 'price/expected_price']
-        for field in numeric_fields:
-            cars_predicted_df[field] = pd.to_numeric(cars_predicted_df[field], errors='coerce')
+        cars_predicted_df = datasets.unique('cars_predicted')
 
         underpriced_cars_df = cars_predicted_df[cars_predicted_df['Price'] > 0]
         undervalued_cars_df = underpriced_cars_df[
@@ -277,6 +244,87 @@ def preprocess_dataframe(df):
     return df
 
 
+def model_predict(rows, loaded=None):
+    # Model prices for FeaturePipeline rows; the pandas path is kept for models the row encoder does not cover
+    loaded = loaded or models.current('valuation')
+    if loaded.predictor is not None:
+        return loaded.predictor.predict(rows)
+    return loaded.pipeline.predict(preprocess_dataframe(pd.DataFrame(rows)[MODEL_FEATURES]))
+
+
+def model_predict_frame(df, loaded=None):
+    # Model prices for a FeaturePipeline frame, scored column-wise; batch valuations bypass the prediction cache
+    loaded = loaded or models.current('valuation')
+    if loaded.predictor is not None:
+        return loaded.predictor.predict_frame(df)
+    return loaded.pipeline.predict(preprocess_dataframe(df[MODEL_FEATURES]))
+
+
+def predict_rows(rows, loaded):
+    # Cached per model generation, so a swap never serves the previous model's prices
+    predictions = prediction_cache.predict(rows, partial(model_predict, loaded=loaded), loaded.generation)
+    app.logger.debug(f"Prediction cache: {prediction_cache.stats()}")
+    return predictions
+
+
+def warm_up_valuation_model(loaded):
+    # Runs before the model goes live: the hottest cached rows are re-scored so the swap does not empty the cache
+    rows = prediction_cache.recent_rows(PREDICTION_CACHE_WARM_ROWS)
+    warm_rows = rows or [feature_pipeline.row({'Make': 'Unknown', 'Model': 'Unknown', 'Trim': 'Unknown',
+                                               'Regional Specs': 'Unknown', 'Year': feature_pipeline.reference_year(),
+                                               'Kilometers': 0})]
+    predictions = model_predict(warm_rows, loaded)
+    model_predict_frame(pd.DataFrame(warm_rows), loaded)
+    if rows:
+        prediction_cache.prime(rows, predictions, loaded.generation)
+    app.logger.info(f"Model version {loaded.version} warmed up with {len(warm_rows)} rows")
+
+
+def whole_number(value):
+    # A preprocess_dataframe value (number or two-decimal string) as an int, None when missing or not finite
+    if value is None:
+        return None
+    value = float(value)
+    return int(value) if math.isfinite(value) else None
+
+
+def comparable_records(df):
+    # Response dicts for the similar-car lists, built once per index group rather than on every valuation
+    records_df = preprocess_dataframe(df)
+    # Object columns keep the ints and Nones as they are instead of turning them into floats and NaN
+    records_df['Price'] = pd.Series([whole_number(price) if price else None for price in records_df['Price']],
+                                    index=records_df.index, dtype=object)
+    records_df['Kilometers'] = pd.Series([whole_number(km) for km in records_df['Kilometers']],
+                                         index=records_df.index, dtype=object)
+    records_df['Year'] = pd.Series([whole_number(year) if year else None for year in records_df['Year']],
+                                   index=records_df.index, dtype=object)
+    for column in ['Regional Specs', 'Seller Type', 'Source']:
+        if column not in records_df.columns:
+            records_df[column] = 'N/A'
+    records_df['Posted Date'] = records_df['Posted Datetime'] if 'Posted Datetime' in records_df.columns else 'N/A'
+    return records_df.to_dict('records')
+
+
+def comparables(name):
+    # Per-snapshot (Make, Model, Year) index behind the similar-car lists
+    return datasets.snapshot(name).derived('comparables', lambda snapshot: ComparablesIndex(snapshot.frame,
+                                                                                            comparable_records))
+
+
+def nearest_comparables(name):
+    # Same index over the deduplicated listings, so a car relisted several times is one comparable
+    return datasets.snapshot(name).derived('nearest_comparables', lambda snapshot: ComparablesIndex(
+        snapshot.unique, comparable_records))
+
+
+def predict_trim_range(row, trims, loaded):
+    # Score every candidate trim in a single model call instead of one call per trim
+    predictions = predict_rows([{**row, 'Trim': trim} for trim in trims], loaded)
+
+    trim_predictions = {trim: f"AED {round(prediction):,}" for trim, prediction in zip(trims, predictions)}
+    return trim_predictions, min(predictions), max(predictions)
+
+
 def format_value(value):
     if value is None or pd.isna(value) or (isinstance(value, float) and math.isinf(value)):
         return 'N/A'
@@ -298,46 +346,116 @@ def generate_year_range(df=None):
     return list(range(current_year, start_year - 1, -1))
 
 
+def build_listing_table(snapshot):
+    cars_for_sale_df = snapshot.unique[['Make', 'Model', 'Year', 'Kilometers', 'Regional Specs', 'Price', 'Seller Type',
+                                        'Posted Datetime', 'Source', 'permalink']]
+    return ListingTable(cars_for_sale_df[cars_for_sale_df['Price'] > 0])
+
+
+def build_listing_year_range(snapshot):
+    table = snapshot.derived('listing_table', build_listing_table)
+    return generate_year_range(table.frame[['Year']].copy())
+
+
+def build_trim_index(snapshot):
+    return TrimIndex(snapshot.frame)
+
+
+def build_options(snapshot):
+    index = snapshot.derived('trim_index', build_trim_index)
+    return index.options(), index.filtering_rules()
+
+
+def trim_index():
+    # Shared Make -> Model -> Trim index, rebuilt only when the sold-out file changes
+    return datasets.snapshot('sold_out').derived('trim_index', build_trim_index)
+
+
 def load_data_and_options():
     try:
-        df = pd.read_csv('./car_data/dubizzle_cars_sold_out.csv', dtype=str)
-        features = ['Make', 'Model', 'Trim', 'Regional Specs']
-        df = df[features]
-
-        options = {column: sorted(df[column].dropna().unique().tolist()) for column in features}
-        options['Trim'] = ['Unknown'] + [trim for trim in options['Trim'] if trim != 'Unknown']
-
-        filtering_rules = {}
-        for make in options['Make']:
-            make_df = df[df['Make'] == make]
-            filtering_rules[make] = {
-                'Model': sorted(make_df['Model'].unique().tolist()),
-                'Trim': {},
-                'Regional Specs': sorted(make_df['Regional Specs'].unique().tolist())
-            }
-            for model in filtering_rules[make]['Model']:
-                model_df = make_df[make_df['Model'] == model]
-                trim_list = [str(trim) for trim in model_df['Trim'].unique().tolist()]
-                filtering_rules[make]['Trim'][model] = sorted(trim_list)
-
-        return options, filtering_rules
+        # Built once per sold-out snapshot and reused until the file changes
+        return datasets.snapshot('sold_out').derived('options', build_options)
     except Exception as e:
         app.logger.error(f"Error loading data: {e}")
         return {}, {}
 
-options, filtering_rules = load_data_and_options()
+# Warm the dataset store and load the model before the first request
+load_data_and_options()
+try:
+    models.current('valuation')
+except Exception as e:
+    app.logger.error(f"Error loading model: {e}")
 
 
-def validate_input(input_df, options):
+def validate_input(row, options):
     for column, valid_options in options.items():
-        if column in input_df.columns:
-            if input_df[column].iloc[0] not in valid_options:
-                input_df.at[0, column] = 'Unknown'
-    return input_df
+        if column in row:
+            if row[column] not in valid_options:
+                row[column] = 'Unknown'
+    return row
+
+
+def valuation_response(user_input, kilometers, year, options):
+    # The valuation both forms return: model price (a range over the trims when the trim is unknown) and the
+    # closest-mileage listings and sold cars of the same make, model and year
+
+    # Age and the derived features are computed on the scalars
+    row = feature_pipeline.row({**user_input, 'Kilometers': kilometers, 'Year': year})
+
+    # Validate input
+    row = validate_input(row, options)
+
+    # One model serves the whole valuation; its version is returned with the prices
+    loaded = models.current('valuation')
+
+    # Handle Unknown Trim
+    if row['Trim'] == 'Unknown':
+        # Look up the trims sold for the same make and model
+        trims = trim_index().trims_for(row['Make'], row['Model'])
+
+        if not trims:
+            return jsonify({"success": False, "error": "No data available for this make and model combination."})
+
+        trim_predictions, min_prediction, max_prediction = predict_trim_range(row, trims, loaded)
+        prediction = f"AED {round(min_prediction):,} - {round(max_prediction):,}"
+    else:
+        app.logger.info(f"Processed input data: {row}")
+
+        prediction = predict_rows([row], loaded)[0]
+        prediction = f"AED {round(prediction):,}"
+        trim_predictions = None
+
+    # Closest-mileage listings of the same make, model and year from the prebuilt indexes
+    similar_cars = comparables('cars_for_sale')
+    filtered_cars_list = similar_cars.lookup(user_input['Make'], user_input['Model'], year, kilometers,
+                                             SIMILAR_CARS_LIMIT)
+    app.logger.info(f"Found {similar_cars.count(user_input['Make'], user_input['Model'], year)} "
+                    f"similar cars for sale")
+
+    # Fetch similar sold-out cars
+    similar_sold_out = comparables('sold_out')
+    sold_out_list = similar_sold_out.lookup(user_input['Make'], user_input['Model'], year, kilometers,
+                                            SIMILAR_CARS_LIMIT)
+    app.logger.info(f"Found {similar_sold_out.count(user_input['Make'], user_input['Model'], year)} "
+                    f"similar sold-out cars")
+
+    response_data = {
+        "success": True,
+        "prediction": prediction,
+        "car_info": user_input,
+        "similar_cars": filtered_cars_list,
+        "sold_out_cars": sold_out_list,
+        "trim_predictions": trim_predictions,
+        "model_version": loaded.version
+    }
+
+    return jsonify(response_data)
 
 
 @app.route('/', methods=['GET', 'POST'])
 def home():
+    options, filtering_rules = load_data_and_options()
+
     if request.method == 'GET':
         year_range = generate_year_range()
         return render_template('index.html',
@@ -353,138 +471,11 @@ def home():
             for feature in features:
                 user_input[feature] = request.form.get(feature, '')
 
-            input_df = pd.DataFrame([user_input])
-
             # Convert numeric fields
-            input_df['Kilometers'] = pd.to_numeric(input_df['Kilometers'], errors='coerce')
-            input_df['Year'] = pd.to_numeric(input_df['Year'], errors='coerce').astype('int64')
-
-            # Calculate Age from Year
-            current_year = datetime.now().year
-            input_df['Age'] = current_year - input_df['Year']
-
-            # Calculate new features
-            input_df['Age_Kilometers'] = input_df['Age'] * input_df['Kilometers']
-            input_df['Kilometers_per_Year'] = input_df['Kilometers'] / input_df['Age'].replace(0, 1)
-
-            # Ensure all categorical variables are strings
-            categorical_columns = [col for col in features if col not in ['Kilometers', 'Year']]
-            for col in categorical_columns:
-                input_df[col] = input_df[col].astype(str)
-
-            # Validate input
-            input_df = validate_input(input_df, options)
-
-            # Handle Unknown Trim
-            if input_df['Trim'].iloc[0] == 'Unknown':
-                # Load sold out cars data
-                sold_out_df = pd.read_csv("./car_data/dubizzle_cars_sold_out.csv")
-
-                # Filter for the same make and model
-                relevant_cars = sold_out_df[
-                    (sold_out_df['Make'] == input_df['Make'].iloc[0]) &
-                    (sold_out_df['Model'] == input_df['Model'].iloc[0])
-                ]
-
-                if relevant_cars.empty:
-                    return jsonify({"success": False, "error": "No data available for this make and model combination."})
-
-                # Get unique trims
-                trims = relevant_cars['Trim'].unique()
-
-                trim_predictions = {}
-                predictions = []
-                for trim in trims:
-                    trim_input = input_df.copy()
-                    trim_input['Trim'] = trim
-
-                    # Select only the features required by the model
-                    model_features = ['Age', 'Kilometers', 'Make', 'Model', 'Trim', 'Regional Specs', 'Age_Kilometers', 'Kilometers_per_Year']
-                    trim_input_model = trim_input[model_features]
-
-                    trim_input_model = preprocess_dataframe(trim_input_model)
-
-                    prediction = model.predict(trim_input_model)[0]
-                    predictions.append(prediction)
-                    trim_predictions[trim] = f"AED {round(prediction):,}"
-
-                min_prediction = min(predictions)
-                max_prediction = max(predictions)
-                prediction = f"AED {round(min_prediction):,} - {round(max_prediction):,}"
-            else:
-                # Select only the features required by the model
-                model_features = ['Age', 'Kilometers', 'Make', 'Model', 'Trim', 'Regional Specs', 'Age_Kilometers', 'Kilometers_per_Year']
-                input_df_model = input_df[model_features]
-
-                input_df_model = preprocess_dataframe(input_df_model)
-                app.logger.info(f"Processed input data: {input_df_model.to_dict()}")
-
-                prediction = model.predict(input_df_model)[0]
-                prediction = f"AED {round(prediction):,}"
-                trim_predictions = None
-
-            # Fetch similar cars for sale
-            cars_for_sale_df = pd.read_csv("./car_data/cars_for_sale.csv", dtype=str)
-            cars_for_sale_df['Year'] = pd.to_numeric(cars_for_sale_df['Year'], errors='coerce').astype('int64')
-            cars_for_sale_df['Price'] = pd.to_numeric(cars_for_sale_df['Price'], errors='coerce')
-            cars_for_sale_df['Kilometers'] = pd.to_numeric(cars_for_sale_df['Kilometers'], errors='coerce')
-
-            filtered_cars = cars_for_sale_df[
-                (cars_for_sale_df['Make'] == user_input['Make']) &
-                (cars_for_sale_df['Model'] == user_input['Model']) &
-                (cars_for_sale_df['Year'] == input_df['Year'].iloc[0])
-            ]
-
-            app.logger.info(f"Found {len(filtered_cars)} similar cars for sale")
-
-            # Fetch similar sold-out cars
-            sold_out_df = pd.read_csv("./car_data/dubizzle_cars_sold_out.csv", dtype=str)
-            sold_out_df['Year'] = pd.to_numeric(sold_out_df['Year'], errors='coerce').astype('int64')
-            sold_out_df['Price'] = pd.to_numeric(sold_out_df['Price'], errors='coerce')
-            sold_out_df['Kilometers'] = pd.to_numeric(sold_out_df['Kilometers'], errors='coerce')
-
-            filtered_sold_out = sold_out_df[
-                (sold_out_df['Make'] == user_input['Make']) &
-                (sold_out_df['Model'] == user_input['Model']) &
-                (sold_out_df['Year'] == input_df['Year'].iloc[0])
-            ]
-
-            app.logger.info(f"Found {len(filtered_sold_out)} similar sold-out cars")
-
-            # Prepare filtered cars data
-            filtered_cars = preprocess_dataframe(filtered_cars)
-            filtered_cars_list = filtered_cars.to_dict('records')
-            for car in filtered_cars_list:
-                car['Price'] = int(float(car['Price'])) if car['Price'] else None
-                car['Kilometers'] = int(float(car['Kilometers'])) if car['Kilometers'] is not None else None
-                car['Year'] = int(car['Year']) if car['Year'] else None
-                car['Regional Specs'] = car.get('Regional Specs', 'N/A')
-                car['Seller Type'] = car.get('Seller Type', 'N/A')
-                car['Posted Date'] = car.get('Posted Datetime', 'N/A')
-                car['Source'] = car.get('Source', 'N/A')
-
-            # Prepare filtered sold-out cars data
-            filtered_sold_out = preprocess_dataframe(filtered_sold_out)
-            sold_out_list = filtered_sold_out.to_dict('records')
-            for car in sold_out_list:
-                car['Price'] = int(float(car['Price'])) if car['Price'] else None
-                car['Kilometers'] = int(float(car['Kilometers'])) if car['Kilometers'] is not None else None
-                car['Year'] = int(car['Year']) if car['Year'] else None
-                car['Regional Specs'] = car.get('Regional Specs', 'N/A')
-                car['Seller Type'] = car.get('Seller Type', 'N/A')
-                car['Posted Date'] = car.get('Posted Datetime', 'N/A')
-                car['Source'] = car.get('Source', 'N/A')
-
-            response_data = {
-                "success": True,
-                "prediction": prediction,
-                "car_info": user_input,
-                "similar_cars": filtered_cars_list,
-                "sold_out_cars": sold_out_list,
-                "trim_predictions": trim_predictions
-            }
-
-            return jsonify(response_data)
+            kilometers = pd.to_numeric(user_input['Kilometers'], errors='coerce')
+            year = np.int64(pd.to_numeric(user_input['Year'], errors='coerce'))
+
+            return valuation_response(user_input, kilometers, year, options)
 
         except Exception as e:
             app.logger.error(f"Prediction error: {str(e)}")
@@ -495,43 +486,98 @@ def home():
 @app.route('/get-cars-for-sale')
 def get_cars_for_sale():
     try:
-        cars_for_sale_df = pd.read_csv("./car_data/cars_for_sale.csv", dtype=str)
-        cars_for_sale_df = cars_for_sale_df.drop_duplicates(subset=['id'], keep='last', ignore_index=True)
-        cars_for_sale_df = cars_for_sale_df[['Make', 'Model', 'Year', 'Kilometers', 'Regional Specs',
-                                             'Price', 'Seller Type', 'Posted Datetime', 'Source', 'permalink']]
+        snapshot = datasets.snapshot('cars_for_sale')
+        table = snapshot.derived('listing_table', build_listing_table)
+
+        equals = {field: request.args[param] for param, field in LISTING_EQUALITY_PARAMS.items()
+                  if request.args.get(param)}
+        ranges = {field: (request.args.get(f'{param}_min', type=float), request.args.get(f'{param}_max', type=float))
+                  for param, field in LISTING_RANGE_PARAMS.items()}
+        sort = request.args.get('sort') or None
+        if sort is not None and sort not in table.SORT_FIELDS:
+            return jsonify({"success": False, "error": f"Unknown sort field: {sort}"}), 400
+        descending = request.args.get('order', 'asc') == 'desc'
+        page = max(request.args.get('page', 1, type=int), 1)
+        page_size = min(max(request.args.get('page_size', LISTING_PAGE_SIZE, type=int), 1), LISTING_MAX_PAGE_SIZE)
+
+        mask = table.select(equals, ranges)
+        total = int(mask.sum())
+        cars_list = preprocess_dataframe(table.page(mask, page, page_size, sort, descending)).to_dict('records')
+
+        response = {
+            "success": True,
+            "cars": cars_list,
+            "total": total,
+            "page": page,
+            "page_size": page_size,
+            "pages": math.ceil(total / page_size),
+            "facets": table.facets(mask),
+            "year_range": snapshot.derived('listing_year_range', build_listing_year_range)
+        }
+        # The filter form only needs the option lists once
+        if request.args.get('options'):
+            response["options"] = table.filter_options()
+        return jsonify(response)
+    except Exception as e:
+        app.logger.error(f"Error fetching cars for sale: {str(e)}")
+        return jsonify({"success": False, "error": f"Unable to fetch cars for sale: {str(e)}"}), 500
+
+
+@app.route('/get-comparables', methods=['GET'])
+def get_comparables():
+    try:
+        make = request.args.get('make')
+        model_name = request.args.get('model')
+        year = request.args.get('year', type=int)
+        kilometers = request.args.get('km', type=float)
+        if not make or not model_name or year is None or kilometers is None:
+            return jsonify({"success": False, "error": "make, model, year and km are required"}), 400
+        trim = request.args.get('trim') or None
+        k = min(max(request.args.get('k', COMPARABLES_K, type=int), 1), COMPARABLES_MAX_K)
+
+        response = {"success": True, "k": k}
+        for field, name in [('sold_out', 'sold_out'), ('for_sale', 'cars_for_sale')]:
+            # Closest listings of the make and model over every year, with their distance in years
+            nearest = nearest_comparables(name).nearest(make, model_name, year, kilometers, trim, k)
+            response[field] = [{**car, 'Distance': round(distance, 4)} for car, distance in nearest]
+        return jsonify(response)
+    except Exception as e:
+        app.logger.error(f"Error fetching comparables: {str(e)}")
+        return jsonify({"success": False, "error": f"Unable to fetch comparables: {str(e)}"}), 500
 
-        numeric_fields = ['Kilometers', 'Year', 'Price']
-        for field in numeric_fields:
-            cars_for_sale_df[field] = pd.to_numeric(cars_for_sale_df[field], errors='coerce')
 
-        cars_for_sale_df['Year'] = pd.to_numeric(cars_for_sale_df['Year'], errors='coerce').astype('int64')
+def admin_authorized():
+    # Constant-time comparison, so response times do not reveal how much of the token matched
+    token = request.headers.get('X-Admin-Token', '')
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode())
 
-        cars_for_sale_df = cars_for_sale_df[cars_for_sale_df['Price'] > 0]
-        cars_for_sale_df = preprocess_dataframe(cars_for_sale_df)
 
-        cars_list = cars_for_sale_df.to_dict('records')
-        year_range = generate_year_range(cars_for_sale_df)
+@app.route('/admin/models', methods=['GET'])
+def admin_models():
+    if not admin_authorized():
+        return jsonify({"success": False, "error": "Not authorized"}), 403
+    return jsonify({"success": True, "models": models.info()})
 
-        return jsonify({
-            "success": True,
-            "cars": cars_list,
-            "year_range": year_range
-        })
+
+@app.route('/admin/models/<name>/reload', methods=['POST'])
+def admin_reload_model(name):
+    if not admin_authorized():
+        return jsonify({"success": False, "error": "Not authorized"}), 403
+    try:
+        # Loads and warms up the model file now instead of on the next request, force=1 even when it is unchanged
+        loaded = models.reload(name, force=bool(request.args.get('force')))
+        return jsonify({"success": True, "model": loaded.info()})
+    except KeyError:
+        return jsonify({"success": False, "error": f"Unknown model: {name}"}), 404
     except Exception as e:
-        app.logger.error(f"Error fetching cars for sale: {str(e)}")
-        return jsonify({"success": False, "error": f"Unable to fetch cars for sale: {str(e)}"}), 500
+        app.logger.error(f"Error reloading model {name}: {str(e)}")
+        return jsonify({"success": False, "error": f"Unable to reload model: {str(e)}"}), 500
 
 
 @app.route('/start-price-monitoring', methods=['GET'])
 def start_price_monitoring():
     try:
-        cars_predicted_df = pd.read_csv("./car_data/cars_predicted.csv", dtype=str)
-        cars_predicted_df = cars_predicted_df.drop_duplicates(subset=['id'], keep='last', ignore_index=True)
-
-        cars_predicted_df['Year'] = pd.to_numeric(cars_predicted_df['Year'], errors='coerce').astype('int64')
-        numeric_fields = ['Kilometers', 'Price', 'Predicted_Price', 'price/expected_price']
-        for field in numeric_fields:
-            cars_predicted_df[field] = pd.to_numeric(cars_predicted_df[field], errors='coerce')
+        cars_predicted_df = datasets.unique('cars_predicted')
 
         underpriced_cars_df = cars_predicted_df[cars_predicted_df['Price'] > 0]
         undervalued_cars_df = underpriced_cars_df[
@@ -563,23 +609,18 @@ def get_auction_cars():
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"File not found: {file_path}")
 
-        auction_cars_df = pd.read_csv(file_path, dtype={'Id': str})
-        app.logger.info(f"Successfully read CSV file. Shape: {auction_cars_df.shape}")
+        snapshot = datasets.snapshot('auction_sold')
+        app.logger.info(f"Using auction snapshot {snapshot.version}. Shape: {snapshot.frame.shape}")
 
-        if 'Id' not in auction_cars_df.columns:
+        if 'Id' not in snapshot.frame.columns:
             raise KeyError("Column 'Id' not found in the CSV file")
 
-        auction_cars_df = auction_cars_df.drop_duplicates(subset=['Id'], keep='last', ignore_index=True)
+        auction_cars_df = snapshot.unique
         columns_to_keep = ['Make', 'Model', 'Year', 'Kilometers', 'Regional Specs', 'Primary Damage',
                            'Start Price', 'Final Price', 'Bid Difference',
                            'Bid Difference Percentage', 'Auction Date', 'Source']
         auction_cars_df = auction_cars_df[columns_to_keep]
 
-        auction_cars_df['Year'] = pd.to_numeric(auction_cars_df['Year'], errors='coerce').astype('int64')
-        numeric_fields = ['Kilometers', 'Start Price', 'Final Price', 'Bid Difference', 'Bid Difference Percentage']
-        for field in numeric_fields:
-            auction_cars_df[field] = pd.to_numeric(auction_cars_df[field], errors='coerce')
-
         auction_cars_df = auction_cars_df[auction_cars_df['Start Price'] > 0]
 
         # Convert DataFrame to dict, handling NaN values
@@ -591,121 +632,30 @@ def get_auction_cars():
         return jsonify({"success": False, "error": f"Unable to fetch auction cars: {str(e)}"}), 500
 
 
-@app.route('/get-data-analysis', methods=['GET'])
-def get_data_analysis():
-    try:
-        cars_for_sale_df = pd.read_csv("./car_data/cars_for_sale.csv", dtype=str)
-        cars_for_sale_df = cars_for_sale_df.drop_duplicates(subset=['id'], keep='last', ignore_index=True)
+def build_data_analysis(snapshot, current_year):
+    analysis = listing_stats.update(snapshot.unique, current_year, listing_analysis)
+    # Preprocess the analysis data to handle NaN and inf values
+    return json.loads(json.dumps(analysis, cls=NpEncoder))
 
-        cars_for_sale_df['Year'] = pd.to_numeric(cars_for_sale_df['Year'], errors='coerce').astype('int64')
-        for field in ['Kilometers', 'Price']:
-            cars_for_sale_df[field] = pd.to_numeric(cars_for_sale_df[field], errors='coerce')
 
-        cars_for_sale_df = cars_for_sale_df[cars_for_sale_df['Price'] > 0]
+def build_sold_out_data_analysis(snapshot, current_year):
+    analysis = sold_out_stats.update(snapshot.unique, current_year, sold_out_analysis)
+    # Preprocess the analysis data to handle NaN and inf values
+    return json.loads(json.dumps(analysis, cls=NpEncoder))
 
-        # Calculate age
-        current_year = datetime.now().year
-        cars_for_sale_df['Age'] = (current_year - cars_for_sale_df['Year']).astype(int)
-
-        # Remove negative ages
-        cars_for_sale_df = cars_for_sale_df[cars_for_sale_df['Age'] >= 0]
-        cars_for_sale_df = cars_for_sale_df[cars_for_sale_df['Year'] >= 1990]
-
-        # Create make-model distribution
-        make_model_distribution = cars_for_sale_df.groupby('Make').apply(
-            lambda x: {
-                'total': len(x),
-                'models': x['Model'].value_counts().to_dict()
-            }
-        ).to_dict()
-
-        # Calculate top make-model combinations by average price
-        top_make_model_by_avg_price = cars_for_sale_df.groupby(['Make', 'Model'])['Price'].mean().sort_values(
-            ascending=False).head(10)
-        top_make_model_by_avg_price = {f"{make} {model}": price for (make, model), price in
-                                       top_make_model_by_avg_price.items()}
-
-        # Calculate top make-model combinations by average kilometers
-        top_make_model_by_avg_kilometers = cars_for_sale_df.groupby(['Make', 'Model'])['Kilometers'].mean().sort_values(
-            ascending=False).head(10)
-        top_make_model_by_avg_kilometers = {f"{make} {model}": km for (make, model), km in
-                                            top_make_model_by_avg_kilometers.items()}
-
-        # Filter out "Unknown" seller type for seller type distribution
-        seller_type_distribution = cars_for_sale_df[cars_for_sale_df['Seller Type'] != 'Unknown'][
-            'Seller Type'].value_counts().sort_values(ascending=False).to_dict()
-
-        # Calculate average price by car age
-        avg_price_by_age = cars_for_sale_df.groupby('Age')['Price'].mean().sort_index().to_dict()
-
-        # Create price range column (0-500k AED)
-        bins = list(range(0, 500001, 50000)) + [float('inf')]
-        labels = [f'{bins[i] // 1000}k-{bins[i + 1] // 1000}k' for i in range(len(bins) - 1)]
-        labels[-1] = '500k+'
 
-        # Filter data for price range chart (0-500k AED)
-        price_range_df = cars_for_sale_df[cars_for_sale_df['Price'] <= 500000]
-        price_range_df['price_range'] = pd.cut(price_range_df['Price'], bins=bins, labels=labels, include_lowest=True)
+def analysis_response(snapshot, name, build):
+    # Aggregates are built and serialized once per data version and year; later requests only send the bytes
+    current_year = datetime.now().year
+    body = snapshot.derived((name, current_year), lambda snapshot: jsonify(
+        {"success": True, "analysis": build(snapshot, current_year)}).get_data())
+    return app.response_class(body, mimetype='application/json')
 
-        # Calculate price range distribution
-        price_range_distribution = price_range_df['price_range'].value_counts().sort_index().to_dict()
 
-        # Calculate Kilometers per Year
-        cars_for_sale_df['Kilometers_per_Year'] = cars_for_sale_df['Kilometers'] / cars_for_sale_df['Age'].replace(0, 1)
-
-        # Create bins for Kilometers per Year
-        bins = [0, 5000, 10000, 15000, 20000, 25000, 30000, 35000, 40000, 45000, 50000, float('inf')]
-        labels = ['0-5k', '5k-10k', '10k-15k', '15k-20k', '20k-25k', '25k-30k', '30k-35k', '35k-40k', '40k-45k',
-                  '45k-50k', '50k+']
-
-        cars_for_sale_df['km_per_year_range'] = pd.cut(cars_for_sale_df['Kilometers_per_Year'], bins=bins,
-                                                       labels=labels, include_lowest=True)
-
-        # Calculate Kilometers per Year distribution
-        km_per_year_distribution = cars_for_sale_df['km_per_year_range'].value_counts().sort_index().to_dict()
-
-        analysis = {
-            "top_makes": cars_for_sale_df['Make'].value_counts().sort_values(ascending=False).head(10).to_dict(),
-            "avg_price_by_make": cars_for_sale_df.groupby('Make')['Price'].mean().sort_values(ascending=False).head(
-                10).to_dict(),
-            "avg_kilometers_by_make": cars_for_sale_df.groupby('Make')['Kilometers'].mean().sort_values(
-                ascending=False).head(10).to_dict(),
-            "price_distribution": {
-                "min": cars_for_sale_df['Price'].min(),
-                "max": cars_for_sale_df['Price'].max(),
-                "mean": cars_for_sale_df['Price'].mean(),
-                "median": cars_for_sale_df['Price'].median(),
-                "percentiles": cars_for_sale_df['Price'].quantile([0.25, 0.5, 0.75]).to_dict()
-            },
-            "year_distribution": cars_for_sale_df['Year'].astype(int).value_counts().sort_index().to_dict(),
-            "regional_specs_distribution": cars_for_sale_df['Regional Specs'].value_counts().sort_values(
-                ascending=False).to_dict(),
-            "seller_type_distribution": seller_type_distribution,
-            "body_type_distribution": cars_for_sale_df['Body Type'].value_counts().sort_values(ascending=False).head(
-                10).to_dict(),
-            "fuel_type_distribution": cars_for_sale_df['Fuel Type'].value_counts().sort_values(
-                ascending=False).to_dict(),
-            "transmission_type_distribution": cars_for_sale_df['Transmission Type'].value_counts().sort_values(
-                ascending=False).to_dict(),
-            "age_distribution": cars_for_sale_df['Age'].value_counts().sort_index().to_dict(),
-            "price_by_age": cars_for_sale_df.groupby('Age')['Price'].mean().sort_index().to_dict(),
-            "kilometers_by_age": cars_for_sale_df.groupby('Age')['Kilometers'].mean().sort_index().to_dict(),
-            "make_model_distribution": make_model_distribution,
-            "top_make_model_by_avg_price": top_make_model_by_avg_price,
-            "top_make_model_by_avg_kilometers": top_make_model_by_avg_kilometers,
-            "avg_price_by_age": avg_price_by_age,
-            "price_range_distribution": price_range_distribution,
-            "km_per_year_distribution": km_per_year_distribution
-        }
-
-        # Add grouped_top_makes
-        analysis['grouped_top_makes'] = cars_for_sale_df.groupby('Source')['Make'].value_counts().unstack(
-            fill_value=0).head(10).to_dict()
-
-        # Preprocess the analysis data to handle NaN and inf values
-        analysis = json.loads(json.dumps(analysis, cls=NpEncoder))
-
-        return jsonify({"success": True, "analysis": analysis})
+@app.route('/get-data-analysis', methods=['GET'])
+def get_data_analysis():
+    try:
+        return analysis_response(datasets.snapshot('cars_for_sale'), 'data_analysis', build_data_analysis)
     except Exception as e:
         app.logger.error(f"Error in data analysis: {str(e)}")
         app.logger.error(traceback.format_exc())
@@ -715,115 +665,7 @@ def get_data_analysis():
 @app.route('/get-sold-out-data-analysis', methods=['GET'])
 def get_sold_out_data_analysis():
     try:
-        sold_out_df = pd.read_csv("./car_data/dubizzle_cars_sold_out.csv", dtype=str)
-        sold_out_df = sold_out_df.drop_duplicates(subset=['id'], keep='last', ignore_index=True)
-
-        sold_out_df['Year'] = pd.to_numeric(sold_out_df['Year'], errors='coerce').astype('int64')
-        for field in ['Kilometers', 'Price']:
-            sold_out_df[field] = pd.to_numeric(sold_out_df[field], errors='coerce')
-
-        sold_out_df = sold_out_df[sold_out_df['Price'] >= 0]
-        sold_out_df = sold_out_df[sold_out_df['Year'] >= 1990]
-
-        # Calculate age
-        current_year = datetime.now().year
-        sold_out_df['Age'] = (current_year - sold_out_df['Year']).astype(int)
-
-        # Remove negative ages
-        sold_out_df = sold_out_df[sold_out_df['Age'] >= 0]
-
-        # Create make-model distribution
-        make_model_distribution = sold_out_df.groupby('Make').apply(
-            lambda x: {
-                'total': len(x),
-                'models': x['Model'].value_counts().to_dict()
-            }
-        ).to_dict()
-
-        # Top make-model combinations by average price
-        top_make_model_by_avg_price = sold_out_df.groupby(['Make', 'Model'])['Price'].mean().round().astype(
-            int).sort_values(ascending=False).head(10)
-        top_make_model_by_avg_price = {f"{make} {model}": price for (make, model), price in
-                                       top_make_model_by_avg_price.items()}
-
-        # Top make-model combinations by average kilometers
-        top_make_model_by_avg_kilometers = sold_out_df.groupby(['Make', 'Model'])['Kilometers'].mean().round().astype(
-            int).sort_values(ascending=False).head(10)
-        top_make_model_by_avg_kilometers = {f"{make} {model}": km for (make, model), km in
-                                            top_make_model_by_avg_kilometers.items()}
-
-        # Filter out "Unknown" seller type for seller type distribution
-        seller_type_distribution = sold_out_df[sold_out_df['Seller Type'] != 'Unknown'][
-            'Seller Type'].value_counts().sort_values(ascending=False).to_dict()
-
-        # Calculate average price by car age
-        avg_price_by_age = sold_out_df.groupby('Age')['Price'].mean().sort_index().to_dict()
-
-        # Create price range column (0-500k AED)
-        bins = list(range(0, 500001, 50000)) + [float('inf')]
-        labels = [f'{bins[i] // 1000}k-{bins[i + 1] // 1000}k' for i in range(len(bins) - 1)]
-        labels[-1] = '500k+'
-
-        # Filter data for price range chart (0-500k AED)
-        price_range_df = sold_out_df[sold_out_df['Price'] <= 500000]
-        price_range_df['price_range'] = pd.cut(price_range_df['Price'], bins=bins, labels=labels,
-                                               include_lowest=True)
-
-        # Calculate price range distribution
-        price_range_distribution = price_range_df['price_range'].value_counts().sort_index().to_dict()
-
-        # Calculate Kilometers per Year
-        sold_out_df['Kilometers_per_Year'] = sold_out_df['Kilometers'] / sold_out_df['Age'].replace(0, 1)
-
-        # Create bins for Kilometers per Year
-        bins = [0, 5000, 10000, 15000, 20000, 25000, 30000, 35000, 40000, 45000, 50000, float('inf')]
-        labels = ['0-5k', '5k-10k', '10k-15k', '15k-20k', '20k-25k', '25k-30k', '30k-35k', '35k-40k', '40k-45k',
-                  '45k-50k', '50k+']
-
-        sold_out_df['km_per_year_range'] = pd.cut(sold_out_df['Kilometers_per_Year'], bins=bins,
-                                                  labels=labels, include_lowest=True)
-
-        # Calculate Kilometers per Year distribution
-        km_per_year_distribution = sold_out_df['km_per_year_range'].value_counts().sort_index().to_dict()
-
-        analysis = {
-            "top_makes": sold_out_df['Make'].value_counts().sort_values(ascending=False).head(10).to_dict(),
-            "avg_price_by_make": sold_out_df.groupby('Make')['Price'].mean().round().astype(int).sort_values(
-                ascending=False).head(10).to_dict(),
-            "avg_kilometers_by_make": sold_out_df.groupby('Make')['Kilometers'].mean().round().astype(int).sort_values(
-                ascending=False).head(10).to_dict(),
-            "price_distribution": {
-                "min": int(sold_out_df['Price'].min()),
-                "max": int(sold_out_df['Price'].max()),
-                "mean": int(sold_out_df['Price'].mean()),
-                "median": int(sold_out_df['Price'].median()),
-                "percentiles": sold_out_df['Price'].quantile([0.25, 0.5, 0.75]).round().astype(int).to_dict()
-            },
-            "year_distribution": sold_out_df['Year'].astype(int).value_counts().sort_index().to_dict(),
-            "regional_specs_distribution": sold_out_df['Regional Specs'].value_counts().sort_values(
-                ascending=False).to_dict(),
-            "seller_type_distribution": seller_type_distribution,
-            "body_type_distribution": sold_out_df['Body Type'].value_counts().sort_values(ascending=False).head(
-                10).to_dict(),
-            "fuel_type_distribution": sold_out_df['Fuel Type'].value_counts().sort_values(
-                ascending=False).to_dict(),
-            "transmission_type_distribution": sold_out_df['Transmission Type'].value_counts().sort_values(
-                ascending=False).to_dict(),
-            "age_distribution": sold_out_df['Age'].value_counts().sort_index().to_dict(),
-            "price_by_age": sold_out_df.groupby('Age')['Price'].mean().sort_index().to_dict(),
-            "kilometers_by_age": sold_out_df.groupby('Age')['Kilometers'].mean().sort_index().to_dict(),
-            "make_model_distribution": make_model_distribution,
-            "top_make_model_by_avg_price": top_make_model_by_avg_price,
-            "top_make_model_by_avg_kilometers": top_make_model_by_avg_kilometers,
-            "avg_price_by_age": avg_price_by_age,
-            "price_range_distribution": price_range_distribution,
-            "km_per_year_distribution": km_per_year_distribution
-        }
-
-        # Preprocess the analysis data to handle NaN and inf values
-        analysis = json.loads(json.dumps(analysis, cls=NpEncoder))
-
-        return jsonify({"success": True, "analysis": analysis})
+        return analysis_response(datasets.snapshot('sold_out'), 'sold_out_data_analysis', build_sold_out_data_analysis)
     except Exception as e:
         app.logger.error(f"Error in sold out data analysis: {str(e)}")
         app.logger.error(traceback.format_exc())
@@ -834,17 +676,12 @@ def get_sold_out_data_analysis():
 def get_auction_cars_analysis():
     app.logger.info("Auction cars analysis route called")
     try:
-        auction_cars_df = pd.read_csv("./car_data/auction_sold_cars.csv", dtype=str)
-        app.logger.info(f"Loaded {len(auction_cars_df)} rows from CSV")
+        snapshot = datasets.snapshot('auction_sold')
+        app.logger.info(f"Loaded {len(snapshot.frame)} rows from CSV")
 
-        auction_cars_df = auction_cars_df.drop_duplicates(subset=['Id'], keep='last', ignore_index=True)
+        auction_cars_df = snapshot.unique
         app.logger.info(f"After dropping duplicates: {len(auction_cars_df)} rows")
 
-        numeric_fields = ['Year', 'Kilometers', 'Start Price', 'Final Price', 'Bid Difference',
-                          'Bid Difference Percentage']
-        for field in numeric_fields:
-            auction_cars_df[field] = pd.to_numeric(auction_cars_df[field], errors='coerce')
-
         analysis = {
             "make_distribution": auction_cars_df['Make'].value_counts().head(10).to_dict(),
             "make_model_distribution": (auction_cars_df['Make'] + " " + auction_cars_df['Model']).value_counts().head(
@@ -0,0 +1,144 @@
+import io
+import json
+
+import numpy as np
+import pandas as pd
+
+from features import CATEGORICAL_FEATURES, MODEL_FEATURES
+
+RESULT_FIELDS = ['Predicted_Price', 'Predicted_Price_Min', 'Predicted_Price_Max', 'Model_Version', 'Error']
+
+
+def read_csv_chunks(stream, chunk_rows):
+    """DataFrames of at most chunk_rows rows from a CSV upload, every value kept as a string."""
+    yield from pd.read_csv(stream, dtype=str, chunksize=chunk_rows)
+
+
+def read_ndjson_chunks(stream, chunk_rows):
+    """DataFrames of at most chunk_rows rows from a JSON-lines upload; a line that is not an object becomes an error."""
+    records = []
+    for number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        if not isinstance(record, dict):
+            record = {'Error': f"Line {number} is not a JSON object"}
+        records.append(record)
+        if len(records) == chunk_rows:
+            yield pd.DataFrame(records, dtype=object)
+            records = []
+    if records:
+        yield pd.DataFrame(records, dtype=object)
+
+
+def write_ndjson(chunks):
+    for chunk in chunks:
+        lines = chunk.to_json(orient='records', lines=True)
+        # Older pandas versions leave out the final newline
+        yield lines if lines.endswith('\n') or not lines else lines + '\n'
+
+
+def write_csv(chunks):
+    # The first chunk fixes the columns; later chunks (JSON lines may differ in keys) are aligned to them
+    columns = None
+    for chunk in chunks:
+        buffer = io.StringIO()
+        if columns is None:
+            columns = list(chunk.columns)
+            chunk.to_csv(buffer, index=False)
+        else:
+            chunk.reindex(columns=columns).to_csv(buffer, index=False, header=False)
+        yield buffer.getvalue()
+
+
+class BatchValuation:
+    """Values uploaded cars chunk by chunk with the same features, input validation and trim fan-out as a single
+    valuation.
+
+    Every chunk is scored with one predict_frame call: rows of a known trim once, rows of an Unknown trim once per trim
+    recorded for their make and model (their price range is the min and max over those trims, and Predicted_Price its
+    midpoint, as auction lots are priced). Each input row comes back with its own columns plus RESULT_FIELDS, priced
+    rows tagged with model_version; rows that cannot be valued get an Error instead of a price.
+    """
+
+    def __init__(self, feature_pipeline, predict_frame, options, trims_for, model_version=None):
+        self.feature_pipeline = feature_pipeline
+        self.predict_frame = predict_frame
+        self.options = {column: set(values) for column, values in options.items()}
+        self.trims_for = trims_for
+        self.model_version = model_version
+
+    def features(self, chunk):
+        features = pd.DataFrame(index=chunk.index)
+        for column in CATEGORICAL_FEATURES:
+            values = chunk[column].astype(str) if column in chunk.columns else pd.Series('Unknown', index=chunk.index)
+            if column in self.options:
+                values = values.where(values.isin(self.options[column]), 'Unknown')
+            features[column] = values
+        # Whole years, as np.int64(year) gives a single valuation
+        features['Year'] = np.trunc(pd.to_numeric(chunk.get('Year'), errors='coerce'))
+        features['Kilometers'] = pd.to_numeric(chunk.get('Kilometers'), errors='coerce')
+        return self.feature_pipeline.transform(features)
+
+    def value(self, chunk):
+        chunk = chunk.reset_index(drop=True)
+        results = chunk.copy()
+        for field in RESULT_FIELDS:
+            if field not in results.columns:
+                results[field] = None
+        results[RESULT_FIELDS[:3]] = results[RESULT_FIELDS[:3]].astype(object)
+        features = self.features(chunk)
+
+        pending = results['Error'].isna().to_numpy()
+        missing = [field for field in ['Make', 'Model', 'Year', 'Kilometers'] if field not in chunk.columns]
+        if missing:
+            results.loc[pending, 'Error'] = f"Missing required field: {missing[0]}"
+            return results
+        invalid = pending & (features['Year'].isna() | features['Kilometers'].isna()).to_numpy()
+        results.loc[invalid, 'Error'] = "Invalid numeric input for Kilometers or Year"
+        pending &= ~invalid
+
+        # Unknown trims fan out to every trim of the make and model
+        fan_out = pending & (features['Trim'] == 'Unknown').to_numpy()
+        sources, trims = [], []
+        for position in np.flatnonzero(fan_out):
+            model_trims = self.trims_for(features.at[position, 'Make'], features.at[position, 'Model'])
+            if not model_trims:
+                results.at[position, 'Error'] = "No data available for this make and model combination."
+                pending[position] = False
+                continue
+            sources.extend([position] * len(model_trims))
+            trims.extend(model_trims)
+        single = np.flatnonzero(pending & ~fan_out)
+        sources = np.array(sources, dtype='int64')
+
+        frame = features.iloc[np.concatenate([single, sources])][MODEL_FEATURES].reset_index(drop=True)
+        if len(sources):
+            frame['Trim'] = frame['Trim'].astype(object)
+            frame.loc[len(single):, 'Trim'] = trims
+        if not len(frame):
+            return results
+        predictions = self.predict_frame(frame)
+        results.loc[np.concatenate([single, np.unique(sources)]), 'Model_Version'] = self.model_version
+
+        single_prices = [round(price) for price in predictions[:len(single)]]
+        results.loc[single, 'Predicted_Price'] = pd.Series(single_prices, index=single, dtype=object)
+        results.loc[single, 'Predicted_Price_Min'] = pd.Series(single_prices, index=single, dtype=object)
+        results.loc[single, 'Predicted_Price_Max'] = pd.Series(single_prices, index=single, dtype=object)
+        if len(sources):
+            ranges = pd.Series(predictions[len(single):]).groupby(sources).agg(['min', 'max'])
+            results.loc[ranges.index, 'Predicted_Price'] = pd.Series(
+                [round(price) for price in (ranges['min'] + ranges['max']) / 2], index=ranges.index, dtype=object)
+            results.loc[ranges.index, 'Predicted_Price_Min'] = pd.Series(
+                [round(price) for price in ranges['min']], index=ranges.index, dtype=object)
+            results.loc[ranges.index, 'Predicted_Price_Max'] = pd.Series(
+                [round(price) for price in ranges['max']], index=ranges.index, dtype=object)
+        return results
+
+    def run(self, chunks):
+        for chunk in chunks:
+            yield self.value(chunk)
@@ -0,0 +1,1030 @@
+import argparse
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+
+def timeit(func, repeat=5):
+    # Best-of-N wall time in milliseconds
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def valuation_pipeline():
+    # The pickled valuation pipeline, the reference the faster scoring paths are checked against
+    import joblib
+    from model_registry import MODEL_PATHS
+
+    return joblib.load(MODEL_PATHS['valuation'])
+
+
+def sample_input_df(make='Toyota', model='Land Cruiser', year=2020, kilometers=50000, specs='GCC Specs'):
+    input_df = pd.DataFrame([{'Make': make, 'Model': model, 'Kilometers': kilometers, 'Year': year,
+                              'Regional Specs': specs, 'Trim': 'Unknown'}])
+    input_df['Age'] = datetime.now().year - input_df['Year']
+    input_df['Age_Kilometers'] = input_df['Age'] * input_df['Kilometers']
+    input_df['Kilometers_per_Year'] = input_df['Kilometers'] / input_df['Age'].replace(0, 1)
+    return input_df
+
+
+def bench_comparables(rows=1_000_000, lookups=200, seed=0):
+    import json
+    import logging
+    import app
+    from comparables import ComparablesIndex
+
+    logging.disable(logging.INFO)
+    cars_for_sale_df = app.datasets.frame('cars_for_sale')
+    cars_for_sale_df = pd.concat([cars_for_sale_df] * max(rows // len(cars_for_sale_df), 1), ignore_index=True)
+    queries = cars_for_sale_df[['Make', 'Model', 'Year', 'Kilometers']].dropna().sample(
+        lookups, random_state=seed).to_numpy()
+
+    def full_scan(make, model, year):
+        # The pre-index lookup: boolean filters over the whole frame, then per-car fixups (with the
+        # missing-value handling of comparable_records, which the old loop raised on)
+        filtered_cars = cars_for_sale_df[(cars_for_sale_df['Make'] == make) & (cars_for_sale_df['Model'] == model) &
+                                         (cars_for_sale_df['Year'] == year)]
+        cars = app.preprocess_dataframe(filtered_cars).to_dict('records')
+        for car in cars:
+            car['Price'] = app.whole_number(car['Price']) if car['Price'] else None
+            car['Kilometers'] = app.whole_number(car['Kilometers'])
+            car['Year'] = app.whole_number(car['Year']) if car['Year'] else None
+            car['Posted Date'] = car.get('Posted Datetime', 'N/A')
+        return cars
+
+    start = time.perf_counter()
+    index = ComparablesIndex(cars_for_sale_df, app.comparable_records)
+    build_ms = (time.perf_counter() - start) * 1000
+    # Every returned car is one of the full scan's, in order of kilometer distance
+    parity = True
+    for make, model, year, kilometers in queries[:20]:
+        expected = full_scan(make, model, year)
+        expected_cars = {json.dumps(car, sort_keys=True, default=str) for car in expected}
+        found = index.lookup(make, model, year, kilometers, app.SIMILAR_CARS_LIMIT)
+        distances = [abs(car['Kilometers'] - kilometers) for car in found if car['Kilometers'] is not None]
+        parity &= all(json.dumps(car, sort_keys=True, default=str) in expected_cars for car in found)
+        parity &= distances == sorted(distances) and len(found) == min(len(expected), app.SIMILAR_CARS_LIMIT)
+
+    scan_ms = timeit(lambda: [full_scan(*query[:3]) for query in queries[:20]], repeat=1) / 20
+    lookup_ms = timeit(lambda: [index.lookup(*query, app.SIMILAR_CARS_LIMIT) for query in queries], repeat=3) / lookups
+    print(f"{len(cars_for_sale_df)} listings, index build {build_ms:.0f} ms")
+    print(f"full scan {scan_ms:.2f} ms, index lookup {lookup_ms:.3f} ms per valuation, "
+          f"{scan_ms / lookup_ms:.0f}x {'ok' if parity else 'MISMATCH'}")
+
+
+def bench_nearest_comparables(rows=1_000_000, lookups=200, k=10, seed=0):
+    import logging
+    import app
+    from comparables import KILOMETERS_PER_YEAR, TRIM_WEIGHT, ComparablesIndex, trim_distance
+
+    logging.disable(logging.INFO)
+    sold_out_df = app.datasets.frame('sold_out')
+    sold_out_df = pd.concat([sold_out_df] * max(rows // len(sold_out_df), 1), ignore_index=True)
+    rng = np.random.default_rng(seed)
+    queries = sold_out_df[['Make', 'Model', 'Year', 'Kilometers', 'Trim']].dropna().sample(
+        lookups, random_state=seed).to_numpy()
+    # Move the queries off the listings, and ask for some trims the listings do not have
+    queries[:, 3] = queries[:, 3] + rng.integers(-5000, 5000, lookups)
+    queries[::4, 4] = 'Unknown'
+    queries[1::4, 4] = [f"{trim} Sport" for trim in queries[1::4, 4]]
+
+    def brute_force(make, model, year, kilometers, trim):
+        # Distance to every listing of the make and model
+        cars = sold_out_df[(sold_out_df['Make'] == make) & (sold_out_df['Model'] == model) &
+                           sold_out_df['Year'].notna() & sold_out_df['Kilometers'].notna()]
+        if trim == 'Unknown':
+            penalties = np.zeros(len(cars))
+        else:
+            penalties = np.array([TRIM_WEIGHT * trim_distance(trim, other) for other in cars['Trim']])
+        distances = ((cars['Year'] - year).abs() + (cars['Kilometers'] - kilometers).abs() / KILOMETERS_PER_YEAR +
+                     penalties).to_numpy()
+        return np.sort(distances)[:k]
+
+    start = time.perf_counter()
+    index = ComparablesIndex(sold_out_df, app.comparable_records)
+    build_ms = (time.perf_counter() - start) * 1000
+    parity = all(np.allclose([distance for _, distance in index.nearest(*query, k=k)], brute_force(*query))
+                 for query in queries[:20])
+
+    scan_ms = timeit(lambda: [brute_force(*query) for query in queries[:20]], repeat=1) / 20
+    nearest_ms = timeit(lambda: [index.nearest(*query, k=k) for query in queries], repeat=3) / lookups
+    print(f"{len(sold_out_df)} listings, index build {build_ms:.0f} ms")
+    print(f"brute force {scan_ms:.2f} ms, top-{k} nearest {nearest_ms:.3f} ms per valuation, "
+          f"{scan_ms / nearest_ms:.0f}x {'ok' if parity else 'MISMATCH'}")
+
+
+def bench_features(requests=2000, batch_rows=1_000_000, seed=0):
+    from features import MODEL_FEATURES, FeaturePipeline
+
+    pipeline = FeaturePipeline()
+    form = {'Make': 'Toyota', 'Model': 'Land Cruiser', 'Kilometers': '50000', 'Year': '2020',
+            'Regional Specs': 'GCC Specs', 'Trim': 'VXR'}
+
+    def pandas_request():
+        # The per-request feature code that used to live in home() and value_your_car()
+        input_df = pd.DataFrame([form])
+        input_df['Kilometers'] = pd.to_numeric(input_df['Kilometers'], errors='coerce')
+        input_df['Year'] = pd.to_numeric(input_df['Year'], errors='coerce').astype('int64')
+        input_df['Age'] = datetime.now().year - input_df['Year']
+        input_df['Age_Kilometers'] = input_df['Age'] * input_df['Kilometers']
+        input_df['Kilometers_per_Year'] = input_df['Kilometers'] / input_df['Age'].replace(0, 1)
+        for col in ['Make', 'Model', 'Regional Specs', 'Trim']:
+            input_df[col] = input_df[col].astype(str)
+        return input_df
+
+    def pipeline_request():
+        kilometers = pd.to_numeric(form['Kilometers'], errors='coerce')
+        year = np.int64(pd.to_numeric(form['Year'], errors='coerce'))
+        return pipeline.row({**form, 'Kilometers': kilometers, 'Year': year})
+
+    expected = pandas_request()[MODEL_FEATURES].iloc[0].to_dict()
+    parity = expected == pipeline_request()
+    pandas_us = timeit(lambda: [pandas_request() for _ in range(requests)], repeat=3) * 1000 / requests
+    pipeline_us = timeit(lambda: [pipeline_request() for _ in range(requests)], repeat=3) * 1000 / requests
+    print(f"single request: pandas {pandas_us:.1f} us, pipeline {pipeline_us:.1f} us, "
+          f"{pandas_us / pipeline_us:.1f}x {'ok' if parity else 'MISMATCH'}")
+
+    rng = np.random.default_rng(seed)
+    batch = pd.DataFrame({'Year': rng.integers(1995, datetime.now().year + 1, size=batch_rows),
+                          'Kilometers': rng.integers(0, 400_000, size=batch_rows).astype('float64')})
+
+    def pandas_batch():
+        df = batch.copy()
+        df['Age'] = datetime.now().year - df['Year']
+        df['Age_Kilometers'] = df['Age'] * df['Kilometers']
+        df['Kilometers_per_Year'] = df['Kilometers'] / df['Age'].replace(0, 1)
+        return df
+
+    parity = pandas_batch().equals(pipeline.transform(batch.copy()))
+    pandas_ms = timeit(pandas_batch, repeat=3)
+    pipeline_ms = timeit(lambda: pipeline.transform(batch.copy()), repeat=3)
+    print(f"{batch_rows} rows: pandas {pandas_ms:.1f} ms, pipeline {pipeline_ms:.1f} ms, "
+          f"{pandas_ms / pipeline_ms:.1f}x {'ok' if parity else 'MISMATCH'}")
+
+
+def bench_inference(requests=2000, seed=0):
+    import logging
+    import app
+    from features import MODEL_FEATURES
+    from inference import RowPredictor
+
+    logging.disable(logging.INFO)
+    model = valuation_pipeline()
+    predictor = RowPredictor.from_model(model)
+    if predictor is None:
+        print("model layout not supported by RowPredictor")
+        return
+
+    # Requests drawn from sold listings, with fractional kilometers and unseen trims mixed in
+    sold_out_df = app.datasets.unique('sold_out').dropna(subset=['Make', 'Model', 'Year', 'Kilometers'])
+    records = sold_out_df.sample(min(requests, len(sold_out_df)), replace=True, random_state=seed).to_dict('records')
+    rows = []
+    for i, record in enumerate(records):
+        kilometers = pd.to_numeric(str(record['Kilometers'] + (0.37 if i % 3 == 0 else 0)), errors='coerce')
+        record = {**record, 'Kilometers': kilometers, 'Year': np.int64(record['Year']),
+                  'Trim': 'Unlisted' if i % 7 == 0 else record['Trim']}
+        rows.append(app.feature_pipeline.row(record))
+
+    def pandas_predict(row):
+        # The pre-existing path: one-row frame, preprocess_dataframe, Pipeline.predict
+        return model.predict(app.preprocess_dataframe(pd.DataFrame([row])[MODEL_FEATURES]))
+
+    def latencies(predict):
+        timings = []
+        for row in rows:
+            start = time.perf_counter()
+            predict(row)
+            timings.append((time.perf_counter() - start) * 1000)
+        return np.percentile(timings, [50, 99])
+
+    mismatches = sum(pandas_predict(row).tobytes() != predictor.predict([row]).tobytes() for row in rows)
+    print(f"{len(rows)} requests, {'bitwise identical' if not mismatches else f'{mismatches} MISMATCHES'}")
+    print(f"{'path':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    for name, predict in [('pandas', pandas_predict), ('row', lambda row: predictor.predict([row]))]:
+        p50, p99 = latencies(predict)
+        print(f"{name:>8} {p50:>8.3f} {p99:>8.3f}")
+
+
+def bench_batch_valuation(rows=100_000, single_sample=2000, seed=0):
+    import io
+    import logging
+    import app
+    from batch_valuation import BatchValuation, read_csv_chunks, write_ndjson
+
+    logging.disable(logging.INFO)
+    # An inventory upload drawn from sold listings, a fifth of it with an Unknown trim to fan out
+    sold_out_df = app.datasets.unique('sold_out').dropna(subset=['Make', 'Model', 'Year', 'Kilometers'])
+    inventory = sold_out_df.sample(rows, replace=True, random_state=seed)[
+        ['Make', 'Model', 'Year', 'Kilometers', 'Regional Specs', 'Trim']].astype(str).reset_index(drop=True)
+    inventory.loc[::5, 'Trim'] = 'Unknown'
+    upload = inventory.to_csv(index=False).encode()
+
+    options, _ = app.load_data_and_options()
+    valuation = BatchValuation(app.feature_pipeline, app.model_predict_frame, options, app.trim_index().trims_for)
+
+    def batch():
+        return list(write_ndjson(valuation.run(read_csv_chunks(io.BytesIO(upload), app.BATCH_CHUNK_ROWS))))
+
+    def single(record):
+        # One valuation of the single-car routes, without the prediction cache
+        row = app.validate_input(app.feature_pipeline.row(
+            {**record, 'Kilometers': pd.to_numeric(record['Kilometers']), 'Year': np.int64(float(record['Year']))}),
+            options)
+        if row['Trim'] == 'Unknown':
+            trims = app.trim_index().trims_for(row['Make'], row['Model'])
+            predictions = app.model_predict([{**row, 'Trim': trim} for trim in trims])
+            return round(min(predictions)), round(max(predictions))
+        prediction = round(app.model_predict([row])[0])
+        return prediction, prediction
+
+    results = pd.read_json(io.StringIO(''.join(batch())), lines=True)
+    records = inventory.to_dict('records')
+    sample = range(0, rows, max(rows // single_sample, 1))
+    parity = all(single(records[i]) == (results.at[i, 'Predicted_Price_Min'], results.at[i, 'Predicted_Price_Max'])
+                 for i in sample)
+
+    batch_ms = timeit(batch, repeat=1)
+    single_ms = timeit(lambda: [single(records[i]) for i in sample], repeat=1) / len(sample)
+    print(f"{rows} cars in chunks of {app.BATCH_CHUNK_ROWS}: batch {batch_ms / 1000:.2f} s "
+          f"({rows / batch_ms * 1000:.0f} cars/s), one by one {single_ms * rows / 1000:.2f} s "
+          f"({1000 / single_ms:.0f} cars/s) {'ok' if parity else 'MISMATCH'}")
+
+
+def bench_model_swap(requests=3000, distinct=300, seed=0):
+    import logging
+    import os
+    import shutil
+    import tempfile
+    from functools import partial
+    import app
+    from inference import PredictionCache
+    from model_registry import MODEL_PATHS, ModelRegistry
+
+    logging.disable(logging.INFO)
+    # Valuation traffic concentrated on a hot set of cars, as the prediction cache sees it
+    rng = np.random.default_rng(seed)
+    sold_out_df = app.datasets.unique('sold_out').dropna(subset=['Make', 'Model', 'Year', 'Kilometers'])
+    records = sold_out_df.sample(distinct, replace=True, random_state=seed).to_dict('records')
+    pool = [app.feature_pipeline.row({**record, 'Year': np.int64(record['Year'])}) for record in records]
+    stream = [pool[i] for i in rng.zipf(1.3, requests) % distinct]
+
+    with tempfile.TemporaryDirectory() as directory:
+        model_path = os.path.join(directory, os.path.basename(MODEL_PATHS['valuation']))
+        shutil.copy(MODEL_PATHS['valuation'], model_path)
+
+        def start_process():
+            # A fresh registry and cache, warmed up the way app.py does it
+            cache = PredictionCache()
+            registry = ModelRegistry(log=lambda message: None)
+
+            def warm_up(loaded):
+                rows = cache.recent_rows(app.PREDICTION_CACHE_WARM_ROWS)
+                if rows:
+                    cache.prime(rows, app.model_predict(rows, loaded), loaded.generation)
+            registry.register('valuation', model_path, warm_up)
+            return registry, cache
+
+        def serve(registry, cache):
+            timings, generations = [], []
+            for row in stream:
+                start = time.perf_counter()
+                loaded = registry.current('valuation')
+                cache.predict([row], partial(app.model_predict, loaded=loaded), loaded.generation)
+                timings.append((time.perf_counter() - start) * 1000)
+                generations.append(loaded.generation)
+            return np.array(timings), np.array(generations)
+
+        registry, cache = start_process()
+        serve(registry, cache)
+        steady, _ = serve(registry, cache)
+
+        # A retrain lands: the file is replaced while requests keep coming
+        shutil.copy(MODEL_PATHS['valuation'], model_path + '.new')
+        os.replace(model_path + '.new', model_path)
+        swap, generations = serve(registry, cache)
+        while registry.current('valuation').generation == 1:
+            time.sleep(0.01)
+        after_swap, _ = serve(registry, cache)
+
+        restart_registry, restart_cache = start_process()
+        restart, _ = serve(restart_registry, restart_cache)
+
+    def summary(timings):
+        return f"p50 {np.percentile(timings, 50):.3f} ms, p99 {np.percentile(timings, 99):.3f} ms, " \
+               f"max {timings.max():.1f} ms"
+
+    print(f"steady:          {summary(steady)}")
+    print(f"during hot swap: {summary(swap)} ({(generations == 1).sum()} requests on the old model)")
+    print(f"after hot swap:  {summary(after_swap)}")
+    print(f"cold restart:    {summary(restart)}")
+
+
+def bench_native_model(requests=2000, batch_rows=100_000, seed=0):
+    import logging
+    import os
+    import shutil
+    import subprocess
+    import sys
+    import tempfile
+    import joblib
+    import app
+    from features import MODEL_FEATURES
+    from inference import RowPredictor, export_native_model, load_native_model
+    from model_registry import MODEL_PATHS
+
+    logging.disable(logging.INFO)
+    model = valuation_pipeline()
+    with tempfile.TemporaryDirectory() as directory:
+        model_path = os.path.join(directory, os.path.basename(MODEL_PATHS['valuation']))
+        shutil.copy(MODEL_PATHS['valuation'], model_path)
+        export_native_model(joblib.load(model_path), model_path)
+
+        # Startup in a fresh interpreter: imports plus model load, as the app and the monitor pay it
+        def startup(load):
+            script = f"import inference, joblib; {load}"
+            return timeit(lambda: subprocess.run([sys.executable, '-c', script], check=True,
+                                                 cwd=os.path.dirname(os.path.abspath(__file__))), repeat=3)
+
+        pickle_ms = startup(f"inference.RowPredictor.from_model(joblib.load({model_path!r}))")
+        native_ms = startup(f"inference.load_native_model({model_path!r})")
+        pickle_load_ms = timeit(lambda: RowPredictor.from_model(joblib.load(model_path)))
+        native_load_ms = timeit(lambda: load_native_model(model_path))
+        native = load_native_model(model_path)
+
+    # Same encoding, scored through the sklearn XGBRegressor wrapper
+    pipeline = RowPredictor.from_table(native.table(), model.steps[-1][1])
+    sold_out_df = app.datasets.unique('sold_out').dropna(subset=['Make', 'Model', 'Year', 'Kilometers'])
+    records = sold_out_df.sample(requests, replace=True, random_state=seed).to_dict('records')
+    rows = [app.feature_pipeline.row({**record, 'Year': np.int64(record['Year'])}) for record in records]
+    frame = app.feature_pipeline.transform(sold_out_df.sample(batch_rows, replace=True, random_state=seed)[
+        ['Make', 'Model', 'Trim', 'Regional Specs', 'Year', 'Kilometers']].reset_index(drop=True))[MODEL_FEATURES]
+
+    parity = (model.predict(app.preprocess_dataframe(frame)).tobytes() == native.predict_frame(frame).tobytes() and
+              model.predict(frame).tobytes() == native.predict_frame(frame, round_floats=False).tobytes() and
+              all(pipeline.predict([row]).tobytes() == native.predict([row]).tobytes() for row in rows))
+
+    def per_call(predict, count=len(rows)):
+        return timeit(lambda: [predict([row]) for row in rows[:count]], repeat=3) / count
+
+    print(f"startup (fresh interpreter): pickle {pickle_ms:.0f} ms, native {native_ms:.0f} ms; "
+          f"model load alone: pickle {pickle_load_ms:.1f} ms, native {native_load_ms:.1f} ms")
+    pandas_ms = per_call(lambda rows: model.predict(app.preprocess_dataframe(pd.DataFrame(rows)[MODEL_FEATURES])),
+                         200)
+    print(f"per valuation: pipeline.predict {pandas_ms:.3f} ms, encoded + XGBRegressor.predict "
+          f"{per_call(pipeline.predict):.3f} ms, encoded + inplace_predict {per_call(native.predict):.3f} ms")
+    print(f"{batch_rows} rows: pipeline.predict {timeit(lambda: model.predict(frame), repeat=3):.0f} ms, "
+          f"inplace_predict {timeit(lambda: native.predict_frame(frame, round_floats=False), repeat=3):.0f} ms "
+          f"{'ok' if parity else 'MISMATCH'}")
+
+
+def bench_monitor_import():
+    import os
+    import subprocess
+    import sys
+
+    # Fresh interpreters, as every CLI run, worker process or test pays it
+    def import_ms(script):
+        return timeit(lambda: subprocess.run([sys.executable, '-c', script], check=True,
+                                             cwd=os.path.dirname(os.path.abspath(__file__))), repeat=3)
+
+    eager = ("import car_price_monitor, joblib, matplotlib.pyplot, sklearn.model_selection, sklearn.metrics, "
+             "model_registry")
+    loaded = ("import sys, car_price_monitor; "
+              "sys.exit(any(m in sys.modules for m in ('xgboost', 'sklearn', 'matplotlib', 'joblib')))")
+    print(f"import car_price_monitor: {import_ms(loaded):.0f} ms "
+          f"(with the model and analysis imports it defers: {import_ms(eager):.0f} ms)")
+
+
+def bench_prediction_cache(requests=5000, distinct=500, seed=0):
+    import logging
+    import app
+    from inference import PredictionCache
+
+    logging.disable(logging.INFO)
+    # A skewed request mix: a few popular cars valued over and over, a long tail of one-offs
+    sold_out_df = app.datasets.unique('sold_out').dropna(subset=['Make', 'Model', 'Year', 'Kilometers'])
+    records = sold_out_df.sample(min(distinct, len(sold_out_df)), random_state=seed).to_dict('records')
+    rows = [app.feature_pipeline.row({**record, 'Year': np.int64(record['Year'])}) for record in records]
+    rng = np.random.default_rng(seed)
+    picks = np.minimum(rng.zipf(1.3, size=requests) - 1, len(rows) - 1)
+
+    def run(predict):
+        start = time.perf_counter()
+        results = [predict([rows[i]])[0] for i in picks]
+        return results, (time.perf_counter() - start) * 1000 / requests
+
+    cache = PredictionCache()
+    expected, uncached_ms = run(app.model_predict)
+    cached, cached_ms = run(lambda batch: cache.predict(batch, app.model_predict))
+    parity = np.array(expected).tobytes() == np.array(cached).tobytes()
+    stats = cache.stats()
+    print(f"{requests} requests over {len(rows)} cars: hit rate {stats['hits'] / requests:.1%}, "
+          f"{uncached_ms:.3f} -> {cached_ms:.3f} ms per request {'ok' if parity else 'MISMATCH'}")
+
+
+def bench_listing_pages():
+    import json
+    import app
+    from listing_table import ListingTable
+
+    cars_for_sale_df = app.datasets.unique('cars_for_sale')
+    columns = ['Make', 'Model', 'Year', 'Kilometers', 'Regional Specs', 'Price', 'Seller Type', 'Posted Datetime',
+               'Source', 'permalink']
+    cars_for_sale_df = cars_for_sale_df[columns]
+    cars_for_sale_df = cars_for_sale_df[cars_for_sale_df['Price'] > 0]
+
+    def full_payload():
+        # The pre-pagination response: every listing serialized on every page view
+        return json.dumps(app.preprocess_dataframe(cars_for_sale_df).to_dict('records'), default=str)
+
+    build_ms = timeit(lambda: ListingTable(cars_for_sale_df), repeat=1)
+    table = ListingTable(cars_for_sale_df)
+    make = cars_for_sale_df['Make'].mode().iloc[0]
+    queries = {
+        'first page': ({}, {}, None),
+        'make + year': ({'Make': make}, {'Year': (2015, None)}, None),
+        'price sort': ({}, {'Kilometers': (None, 100000)}, 'Price'),
+    }
+
+    def page_payload(equals, ranges, sort):
+        mask = table.select(equals, ranges)
+        cars = app.preprocess_dataframe(table.page(mask, 1, 10, sort)).to_dict('records')
+        return json.dumps({'cars': cars, 'facets': table.facets(mask)}, default=str)
+
+    print(f"{len(cars_for_sale_df)} listings, table build {build_ms:.1f} ms")
+    full_ms = timeit(full_payload, repeat=1)
+    print(f"{'query':>12} {'full ms':>9} {'page ms':>9} {'full KB':>9} {'page KB':>9}")
+    for name, (equals, ranges, sort) in queries.items():
+        page_payload(equals, ranges, sort)
+        page_ms = timeit(lambda: page_payload(equals, ranges, sort))
+        print(f"{name:>12} {full_ms:>9.1f} {page_ms:>9.2f} {len(full_payload()) / 1024:>9.0f} "
+              f"{len(page_payload(equals, ranges, sort)) / 1024:>9.1f}")
+
+
+def bench_trim_fanout(trim_counts=(1, 5, 10, 25, 50, 100)):
+    import app
+
+    model = valuation_pipeline()
+    loaded = app.models.current('valuation')
+    model_features = ['Age', 'Kilometers', 'Make', 'Model', 'Trim', 'Regional Specs', 'Age_Kilometers',
+                      'Kilometers_per_Year']
+    input_df = sample_input_df()
+    row = input_df.iloc[0].to_dict()
+
+    def per_trim_loop(trims):
+        # The pre-batching implementation: one model call per trim
+        predictions = []
+        for trim in trims:
+            trim_input = input_df.copy()
+            trim_input['Trim'] = trim
+            trim_input_model = app.preprocess_dataframe(trim_input[model_features])
+            predictions.append(model.predict(trim_input_model)[0])
+        return predictions
+
+    print(f"{'trims':>6} {'loop ms':>10} {'batch ms':>10} {'speedup':>8}")
+    for count in trim_counts:
+        trims = [f"Trim {i}" for i in range(count)]
+        loop_ms = timeit(lambda: per_trim_loop(trims))
+        batch_ms = timeit(lambda: app.predict_trim_range(row, trims, loaded))
+        print(f"{count:>6} {loop_ms:>10.2f} {batch_ms:>10.2f} {loop_ms / batch_ms:>7.1f}x")
+
+
+def bench_carswitch(sizes=(10_000, 100_000, 1_000_000), reference_limit=100_000):
+    from normalization import normalize_carswitch_names, parse_carswitch_kilometers
+    from tests.helpers import carswitch_loop_reference, synthetic_carswitch_df
+
+    def vectorized(df):
+        df = df.copy()
+        df['Make'], df['Model'] = normalize_carswitch_names(df['Make'], df['Model'], df['title'])
+        df['Kilometers'] = parse_carswitch_kilometers(df['Kilometers'])
+        return df
+
+    # Parity with the loop is covered by tests/test_normalization.py
+    print(f"{'rows':>9} {'loop ms':>10} {'vector ms':>10} {'speedup':>8}")
+    for rows in sizes:
+        df = synthetic_carswitch_df(rows)
+        vector_ms = timeit(lambda: vectorized(df), repeat=1)
+        if rows > reference_limit:
+            print(f"{rows:>9} {'-':>10} {vector_ms:>10.1f} {'-':>8}")
+            continue
+        loop_ms = timeit(lambda: carswitch_loop_reference(df), repeat=1)
+        print(f"{rows:>9} {loop_ms:>10.1f} {vector_ms:>10.1f} {loop_ms / vector_ms:>7.1f}x")
+
+
+def bench_chunked_ingest(history=200, chunk_rows=20_000):
+    import filecmp
+    import os
+    import shutil
+    import subprocess
+    import sys
+    import tempfile
+    from source_adapters import LISTING_ADAPTERS
+
+    # Peak RSS of the process and its feed workers, from inside a fresh interpreter
+    script = ("import resource, sys, car_price_monitor; "
+              "car_price_monitor.check_new_listings(incremental=False, chunk_rows={chunk_rows}); "
+              "peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, "
+              "resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss); sys.stderr.write(f'{{peak}}\\n')")
+    package = os.path.dirname(os.path.abspath(__file__))
+
+    with tempfile.TemporaryDirectory() as directory:
+        # The raw feeds as they grow: every listing scraped history times, the last scrape winning
+        shutil.copytree('./car_data', os.path.join(directory, 'car_data'))
+        os.symlink(os.path.abspath('./models'), os.path.join(directory, 'models'))
+        raw_rows = 0
+        for path in sorted({path for adapter in LISTING_ADAPTERS for path in adapter.files}):
+            raw_df = pd.read_csv(path, dtype=str)
+            pd.concat([raw_df] * history).to_csv(os.path.join(directory, path), index=False)
+            raw_rows += len(raw_df) * history
+
+        def run(rows):
+            start = time.perf_counter()
+            result = subprocess.run([sys.executable, '-c', script.format(chunk_rows=rows)], cwd=directory,
+                                    env={**os.environ, 'PYTHONPATH': package}, check=True, capture_output=True,
+                                    text=True)
+            elapsed = time.perf_counter() - start
+            outputs = {}
+            for name in ('cars_for_sale.csv', 'cars_predicted.csv'):
+                outputs[name] = os.path.join(directory, f"{name}.{rows}")
+                shutil.copy(os.path.join(directory, 'car_data', name), outputs[name])
+            return elapsed, int(result.stderr.strip().splitlines()[-1]) / 1024, outputs
+
+        full_s, full_mb, full_outputs = run(None)
+        chunked_s, chunked_mb, chunked_outputs = run(chunk_rows)
+        parity = all(filecmp.cmp(full_outputs[name], chunked_outputs[name], shallow=False) for name in full_outputs)
+
+    print(f"{raw_rows} raw listing rows ({history} scrapes of each listing)")
+    print(f"full load:         {full_s:.1f} s, peak RSS {full_mb:.0f} MB")
+    print(f"{chunk_rows}-row chunks: {chunked_s:.1f} s, peak RSS {chunked_mb:.0f} MB {'ok' if parity else 'MISMATCH'}")
+
+
+def emirates_sold_lots_reference(details_df, updates_df):
+    # The original two drop_duplicates and three merges from check_auction_cars
+    emirates_auction_cars_details_df = details_df.copy()
+    emirates_auction_cars_details_df.drop_duplicates(subset=['Lot'], keep='last', ignore_index=True, inplace=True)
+    emirates_auction_cars_details_df.dropna(subset=['Lot', 'Odometer'], inplace=True)
+
+    emirates_auction_cars_df = updates_df.copy()
+    emirates_auction_cars_df.sort_values(by='UpdatedDatetime', inplace=True)
+    emirates_auction_cars_df['UpdatedDatetime'] = (pd.to_datetime(emirates_auction_cars_df['UpdatedDatetime'].
+                                                                  astype(float), unit='s', errors='coerce').
+                                                   dt.strftime('%Y-%m-%d'))
+    emirates_auction_cars_df['EndDate'] = (pd.to_datetime(emirates_auction_cars_df['EndDate'], errors='coerce').
+                                           dt.strftime('%Y-%m-%d'))
+
+    emirates_auction_end_cars_df = emirates_auction_cars_df.drop_duplicates(subset=['Lot'], keep='last', ignore_index=True)
+    emirates_auction_end_cars_df = emirates_auction_end_cars_df[emirates_auction_end_cars_df['UpdatedDatetime'] ==
+                                                                emirates_auction_end_cars_df['EndDate']]
+    emirates_auction_end_cars_df.dropna(subset=['Lot', 'Milage'], inplace=True)
+    emirates_auction_start_cars_df = emirates_auction_cars_df.drop_duplicates(subset=['Lot'], keep='first', ignore_index=True)
+    emirates_auction_start_cars_df = emirates_auction_start_cars_df[emirates_auction_start_cars_df['UpdatedDatetime'] !=
+                                                                    emirates_auction_start_cars_df['EndDate']]
+    emirates_auction_start_cars_df.dropna(subset=['Lot', 'Milage'], inplace=True)
+
+    merged_emirates_auction_end_cars_df = pd.merge(emirates_auction_end_cars_df, emirates_auction_cars_details_df,
+                                                   on='Lot', how='left')
+    merged_emirates_auction_end_cars_df.rename(columns={'CurrentPrice': 'Final Price'}, inplace=True)
+    merged_emirates_auction_start_cars_df = pd.merge(emirates_auction_start_cars_df, emirates_auction_cars_details_df,
+                                                     on='Lot', how='left')
+    merged_emirates_auction_start_cars_df.rename(columns={'CurrentPrice': 'Start Price'}, inplace=True)
+    return pd.merge(merged_emirates_auction_end_cars_df, merged_emirates_auction_start_cars_df[['Lot', 'Start Price']],
+                    on='Lot', how='inner')
+
+
+def synthetic_emirates_log(lots, updates_per_lot, seed=0):
+    # A price-update log as scraped: every lot polled a few times a day until its auction ends, scrapes interleaved
+    rng = np.random.default_rng(seed)
+    lot_ids = np.arange(100_000, 100_000 + lots)
+    end_dates = np.datetime64('2024-01-01T12:00') + rng.integers(0, 365, lots).astype('timedelta64[D]')
+    updates = rng.integers(1, 2 * updates_per_lot, lots)
+    lot_index = np.repeat(np.arange(lots), updates)
+    step = np.concatenate([np.arange(count) for count in updates])
+    remaining = np.repeat(updates, updates) - 1 - step
+    # Some lots stop being polled before their end date and never record a final price
+    finished = np.repeat(rng.random(lots) < 0.8, updates)
+    hours_before = remaining * 6 + np.where(finished, 0, 48)
+    updated = end_dates[lot_index] - hours_before.astype('timedelta64[h]')
+    prices = 20_000 + rng.integers(0, 100_000, lots)[lot_index] + step * 500
+
+    updates_df = pd.DataFrame({
+        'Lot': lot_ids[lot_index].astype(str),
+        'UpdatedDatetime': (updated.astype('datetime64[s]').astype('int64').astype('float64')).astype(str),
+        'EndDate': np.datetime_as_string(end_dates, unit='s')[lot_index],
+        'CurrentPrice': prices.astype(str),
+        'Milage': rng.integers(0, 300_000, lots).astype(str)[lot_index],
+    }).sample(frac=1, random_state=seed).reset_index(drop=True)
+    details_df = pd.DataFrame({
+        'Lot': lot_ids.astype(str), 'Odometer': rng.integers(0, 300_000, lots).astype(str),
+        'Make': rng.choice(['Toyota', 'Nissan', 'Lexus', 'GMC'], lots), 'Year': rng.integers(2005, 2024, lots).astype(str),
+    })
+    return details_df, updates_df
+
+
+def bench_emirates_lots(sizes=((100_000, 10), (300_000, 10)), seed=0):
+    from source_adapters import emirates_sold_lots
+
+    print(f"{'log rows':>10} {'lots':>8} {'sold':>8} {'merges ms':>10} {'grouped ms':>11} {'speedup':>8} parity")
+    for lots, updates_per_lot in sizes:
+        details_df, updates_df = synthetic_emirates_log(lots, updates_per_lot, seed)
+        expected = emirates_sold_lots_reference(details_df, updates_df)
+        result = emirates_sold_lots(details_df, updates_df)
+        # The reference's unstable sort orders lots whose last updates tie arbitrarily, so rows are compared by lot
+        parity = (expected.sort_values('Lot', ignore_index=True).equals(result.sort_values('Lot', ignore_index=True))
+                  and result['Lot'].is_unique)
+        reference_ms = timeit(lambda: emirates_sold_lots_reference(details_df, updates_df), repeat=1)
+        grouped_ms = timeit(lambda: emirates_sold_lots(details_df, updates_df), repeat=3)
+        print(f"{len(updates_df):>10} {lots:>8} {len(result):>8} {reference_ms:>10.0f} {grouped_ms:>11.0f} "
+              f"{reference_ms / grouped_ms:>7.1f}x {'ok' if parity else 'MISMATCH'}")
+
+
+def bench_marhaba_sold(rows=200_000, seed=0):
+    import ast
+    from source_adapters import expand_sold_column
+    from tests.helpers import synthetic_marhaba_lots
+
+    lots_df = synthetic_marhaba_lots(rows, seed)
+
+    def reference():
+        # The original per-row literal_eval and json_normalize
+        df = lots_df.copy()
+        df['sold'] = df['sold'].apply(ast.literal_eval)
+        return df.join(pd.json_normalize(df['sold']))
+
+    # Parity with literal_eval and json_normalize is covered by tests/test_source_adapters.py
+    reference_ms = timeit(reference, repeat=1)
+    fast_ms = timeit(lambda: expand_sold_column(lots_df), repeat=3)
+    print(f"{rows} lots: literal_eval + json_normalize {reference_ms:.0f} ms ({rows / reference_ms:.0f} lots/ms), "
+          f"parse_literal + columns {fast_ms:.0f} ms ({rows / fast_ms:.0f} lots/ms), {reference_ms / fast_ms:.1f}x")
+
+
+def bench_value_maps(rows=1_000_000, seed=0):
+    from normalization import normalize_values
+    from source_adapters import ADAPTERS
+
+    rng = np.random.default_rng(seed)
+    chains = [
+        ('Emirates Auction', 'Regional Specs', ['United Arab Emirates', 'Japan', 'China mainland', 'SOUTH KOREA',
+                                                'Germany', 'United Kingdom', 'United States', 'Belgium', None]),
+        ('Telegram', 'Regional Specs', ['GCC', 'USSpec', 'US', 'GCCGCC', 'MidEast', 'Notprovided', 'gcc', None]),
+        ('Carswitch', 'Regional Specs', ['GCC', 'America Specs', 'European', 'Canadia Specs', 'Japan', None]),
+    ]
+
+    print(f"{'source':>18} {'rules':>6} {'chained ms':>11} {'distinct ms':>12} {'speedup':>8} parity")
+    for name, column, raw_values in chains:
+        replacements = ADAPTERS[name].value_maps[column]
+        values = pd.Series(rng.choice(np.array(raw_values, dtype=object), size=rows), dtype=object)
+
+        def chained():
+            result = values
+            for old, new in replacements:
+                result = result.str.replace(old, new)
+            return result
+
+        expected = chained()
+        parity = expected.equals(normalize_values(values, replacements))
+        chained_ms = timeit(chained, repeat=1)
+        distinct_ms = timeit(lambda: normalize_values(values, replacements), repeat=3)
+        print(f"{name:>18} {len(replacements):>6} {chained_ms:>11.1f} {distinct_ms:>12.1f} "
+              f"{chained_ms / distinct_ms:>7.1f}x {'ok' if parity else 'MISMATCH'}")
+
+
+def bench_dataset_loads():
+    import os
+    from data_store import (AUCTION_SCHEMA, LISTING_SCHEMA, PREDICTED_SCHEMA, export_typed_parquet, parquet_path,
+                            read_typed_csv, read_typed_parquet)
+
+    datasets = [("./car_data/cars_for_sale.csv", LISTING_SCHEMA), ("./car_data/dubizzle_cars_sold_out.csv", LISTING_SCHEMA),
+                ("./car_data/cars_predicted.csv", PREDICTED_SCHEMA), ("./car_data/auction_sold_cars.csv", AUCTION_SCHEMA)]
+
+    print(f"{'dataset':>28} {'rows':>8} {'csv ms':>8} {'parquet ms':>11} {'speedup':>8} parity")
+    for path, schema in datasets:
+        if not os.path.exists(path):
+            print(f"{os.path.basename(path):>28} missing")
+            continue
+        if not os.path.exists(parquet_path(path)):
+            export_typed_parquet(pd.read_csv(path, dtype=str), path, **schema)
+
+        expected = read_typed_csv(path, schema['numeric_fields'], schema['int_fields'])
+        parity = expected.equals(read_typed_parquet(parquet_path(path)))
+        csv_ms = timeit(lambda: read_typed_csv(path, schema['numeric_fields'], schema['int_fields']))
+        parquet_ms = timeit(lambda: read_typed_parquet(parquet_path(path)))
+        print(f"{os.path.basename(path):>28} {len(expected):>8} {csv_ms:>8.1f} {parquet_ms:>11.1f} "
+              f"{csv_ms / parquet_ms:>7.1f}x {'ok' if parity else 'MISMATCH'}")
+
+
+def listing_analysis_reference(cars_for_sale_df, current_year):
+
+    cars_for_sale_df = cars_for_sale_df[cars_for_sale_df['Price'] > 0]
+
+    # Calculate age
+    cars_for_sale_df['Age'] = (current_year - cars_for_sale_df['Year']).astype(int)
+
+    # Remove negative ages
+    cars_for_sale_df = cars_for_sale_df[cars_for_sale_df['Age'] >= 0]
+    cars_for_sale_df = cars_for_sale_df[cars_for_sale_df['Year'] >= 1990]
+
+    # Create make-model distribution
+    make_model_distribution = cars_for_sale_df.groupby('Make').apply(
+        lambda x: {
+            'total': len(x),
+            'models': x['Model'].value_counts().to_dict()
+        }
+    ).to_dict()
+
+    # Calculate top make-model combinations by average price
+    top_make_model_by_avg_price = cars_for_sale_df.groupby(['Make', 'Model'])['Price'].mean().sort_values(
+        ascending=False).head(10)
+    top_make_model_by_avg_price = {f"{make} {model}": price for (make, model), price in
+                                   top_make_model_by_avg_price.items()}
+
+    # Calculate top make-model combinations by average kilometers
+    top_make_model_by_avg_kilometers = cars_for_sale_df.groupby(['Make', 'Model'])['Kilometers'].mean().sort_values(
+        ascending=False).head(10)
+    top_make_model_by_avg_kilometers = {f"{make} {model}": km for (make, model), km in
+                                        top_make_model_by_avg_kilometers.items()}
+
+    # Filter out "Unknown" seller type for seller type distribution
+    seller_type_distribution = cars_for_sale_df[cars_for_sale_df['Seller Type'] != 'Unknown'][
+        'Seller Type'].value_counts().sort_values(ascending=False).to_dict()
+
+    # Calculate average price by car age
+    avg_price_by_age = cars_for_sale_df.groupby('Age')['Price'].mean().sort_index().to_dict()
+
+    # Create price range column (0-500k AED)
+    bins = list(range(0, 500001, 50000)) + [float('inf')]
+    labels = [f'{bins[i] // 1000}k-{bins[i + 1] // 1000}k' for i in range(len(bins) - 1)]
+    labels[-1] = '500k+'
+
+    # Filter data for price range chart (0-500k AED)
+    price_range_df = cars_for_sale_df[cars_for_sale_df['Price'] <= 500000]
+    price_range_df['price_range'] = pd.cut(price_range_df['Price'], bins=bins, labels=labels, include_lowest=True)
+
+    # Calculate price range distribution
+    price_range_distribution = price_range_df['price_range'].value_counts().sort_index().to_dict()
+
+    # Calculate Kilometers per Year
+    cars_for_sale_df['Kilometers_per_Year'] = cars_for_sale_df['Kilometers'] / cars_for_sale_df['Age'].replace(0, 1)
+
+    # Create bins for Kilometers per Year
+    bins = [0, 5000, 10000, 15000, 20000, 25000, 30000, 35000, 40000, 45000, 50000, float('inf')]
+    labels = ['0-5k', '5k-10k', '10k-15k', '15k-20k', '20k-25k', '25k-30k', '30k-35k', '35k-40k', '40k-45k',
+              '45k-50k', '50k+']
+
+    cars_for_sale_df['km_per_year_range'] = pd.cut(cars_for_sale_df['Kilometers_per_Year'], bins=bins,
+                                                   labels=labels, include_lowest=True)
+
+    # Calculate Kilometers per Year distribution
+    km_per_year_distribution = cars_for_sale_df['km_per_year_range'].value_counts().sort_index().to_dict()
+
+    analysis = {
+        "top_makes": cars_for_sale_df['Make'].value_counts().sort_values(ascending=False).head(10).to_dict(),
+        "avg_price_by_make": cars_for_sale_df.groupby('Make')['Price'].mean().sort_values(ascending=False).head(
+            10).to_dict(),
+        "avg_kilometers_by_make": cars_for_sale_df.groupby('Make')['Kilometers'].mean().sort_values(
+            ascending=False).head(10).to_dict(),
+        "price_distribution": {
+            "min": cars_for_sale_df['Price'].min(),
+            "max": cars_for_sale_df['Price'].max(),
+            "mean": cars_for_sale_df['Price'].mean(),
+            "median": cars_for_sale_df['Price'].median(),
+            "percentiles": cars_for_sale_df['Price'].quantile([0.25, 0.5, 0.75]).to_dict()
+        },
+        "year_distribution": cars_for_sale_df['Year'].astype(int).value_counts().sort_index().to_dict(),
+        "regional_specs_distribution": cars_for_sale_df['Regional Specs'].value_counts().sort_values(
+            ascending=False).to_dict(),
+        "seller_type_distribution": seller_type_distribution,
+        "body_type_distribution": cars_for_sale_df['Body Type'].value_counts().sort_values(ascending=False).head(
+            10).to_dict(),
+        "fuel_type_distribution": cars_for_sale_df['Fuel Type'].value_counts().sort_values(
+            ascending=False).to_dict(),
+        "transmission_type_distribution": cars_for_sale_df['Transmission Type'].value_counts().sort_values(
+            ascending=False).to_dict(),
+        "age_distribution": cars_for_sale_df['Age'].value_counts().sort_index().to_dict(),
+        "price_by_age": cars_for_sale_df.groupby('Age')['Price'].mean().sort_index().to_dict(),
+        "kilometers_by_age": cars_for_sale_df.groupby('Age')['Kilometers'].mean().sort_index().to_dict(),
+        "make_model_distribution": make_model_distribution,
+        "top_make_model_by_avg_price": top_make_model_by_avg_price,
+        "top_make_model_by_avg_kilometers": top_make_model_by_avg_kilometers,
+        "avg_price_by_age": avg_price_by_age,
+        "price_range_distribution": price_range_distribution,
+        "km_per_year_distribution": km_per_year_distribution
+    }
+
+    # Add grouped_top_makes
+    analysis['grouped_top_makes'] = cars_for_sale_df.groupby('Source')['Make'].value_counts().unstack(
+        fill_value=0).head(10).to_dict()
+
+    return analysis
+
+
+def sold_out_analysis_reference(sold_out_df, current_year):
+
+    sold_out_df = sold_out_df[sold_out_df['Price'] >= 0]
+    sold_out_df = sold_out_df[sold_out_df['Year'] >= 1990]
+
+    # Calculate age
+    sold_out_df['Age'] = (current_year - sold_out_df['Year']).astype(int)
+
+    # Remove negative ages
+    sold_out_df = sold_out_df[sold_out_df['Age'] >= 0]
+
+    # Create make-model distribution
+    make_model_distribution = sold_out_df.groupby('Make').apply(
+        lambda x: {
+            'total': len(x),
+            'models': x['Model'].value_counts().to_dict()
+        }
+    ).to_dict()
+
+    # Top make-model combinations by average price
+    top_make_model_by_avg_price = sold_out_df.groupby(['Make', 'Model'])['Price'].mean().round().astype(
+        int).sort_values(ascending=False).head(10)
+    top_make_model_by_avg_price = {f"{make} {model}": price for (make, model), price in
+                                   top_make_model_by_avg_price.items()}
+
+    # Top make-model combinations by average kilometers
+    top_make_model_by_avg_kilometers = sold_out_df.groupby(['Make', 'Model'])['Kilometers'].mean().round().astype(
+        int).sort_values(ascending=False).head(10)
+    top_make_model_by_avg_kilometers = {f"{make} {model}": km for (make, model), km in
+                                        top_make_model_by_avg_kilometers.items()}
+
+    # Filter out "Unknown" seller type for seller type distribution
+    seller_type_distribution = sold_out_df[sold_out_df['Seller Type'] != 'Unknown'][
+        'Seller Type'].value_counts().sort_values(ascending=False).to_dict()
+
+    # Calculate average price by car age
+    avg_price_by_age = sold_out_df.groupby('Age')['Price'].mean().sort_index().to_dict()
+
+    # Create price range column (0-500k AED)
+    bins = list(range(0, 500001, 50000)) + [float('inf')]
+    labels = [f'{bins[i] // 1000}k-{bins[i + 1] // 1000}k' for i in range(len(bins) - 1)]
+    labels[-1] = '500k+'
+
+    # Filter data for price range chart (0-500k AED)
+    price_range_df = sold_out_df[sold_out_df['Price'] <= 500000]
+    price_range_df['price_range'] = pd.cut(price_range_df['Price'], bins=bins, labels=labels,
+                                           include_lowest=True)
+
+    # Calculate price range distribution
+    price_range_distribution = price_range_df['price_range'].value_counts().sort_index().to_dict()
+
+    # Calculate Kilometers per Year
+    sold_out_df['Kilometers_per_Year'] = sold_out_df['Kilometers'] / sold_out_df['Age'].replace(0, 1)
+
+    # Create bins for Kilometers per Year
+    bins = [0, 5000, 10000, 15000, 20000, 25000, 30000, 35000, 40000, 45000, 50000, float('inf')]
+    labels = ['0-5k', '5k-10k', '10k-15k', '15k-20k', '20k-25k', '25k-30k', '30k-35k', '35k-40k', '40k-45k',
+              '45k-50k', '50k+']
+
+    sold_out_df['km_per_year_range'] = pd.cut(sold_out_df['Kilometers_per_Year'], bins=bins,
+                                              labels=labels, include_lowest=True)
+
+    # Calculate Kilometers per Year distribution
+    km_per_year_distribution = sold_out_df['km_per_year_range'].value_counts().sort_index().to_dict()
+
+    analysis = {
+        "top_makes": sold_out_df['Make'].value_counts().sort_values(ascending=False).head(10).to_dict(),
+        "avg_price_by_make": sold_out_df.groupby('Make')['Price'].mean().round().astype(int).sort_values(
+            ascending=False).head(10).to_dict(),
+        "avg_kilometers_by_make": sold_out_df.groupby('Make')['Kilometers'].mean().round().astype(int).sort_values(
+            ascending=False).head(10).to_dict(),
+        "price_distribution": {
+            "min": int(sold_out_df['Price'].min()),
+            "max": int(sold_out_df['Price'].max()),
+            "mean": int(sold_out_df['Price'].mean()),
+            "median": int(sold_out_df['Price'].median()),
+            "percentiles": sold_out_df['Price'].quantile([0.25, 0.5, 0.75]).round().astype(int).to_dict()
+        },
+        "year_distribution": sold_out_df['Year'].astype(int).value_counts().sort_index().to_dict(),
+        "regional_specs_distribution": sold_out_df['Regional Specs'].value_counts().sort_values(
+            ascending=False).to_dict(),
+        "seller_type_distribution": seller_type_distribution,
+        "body_type_distribution": sold_out_df['Body Type'].value_counts().sort_values(ascending=False).head(
+            10).to_dict(),
+        "fuel_type_distribution": sold_out_df['Fuel Type'].value_counts().sort_values(
+            ascending=False).to_dict(),
+        "transmission_type_distribution": sold_out_df['Transmission Type'].value_counts().sort_values(
+            ascending=False).to_dict(),
+        "age_distribution": sold_out_df['Age'].value_counts().sort_index().to_dict(),
+        "price_by_age": sold_out_df.groupby('Age')['Price'].mean().sort_index().to_dict(),
+        "kilometers_by_age": sold_out_df.groupby('Age')['Kilometers'].mean().sort_index().to_dict(),
+        "make_model_distribution": make_model_distribution,
+        "top_make_model_by_avg_price": top_make_model_by_avg_price,
+        "top_make_model_by_avg_kilometers": top_make_model_by_avg_kilometers,
+        "avg_price_by_age": avg_price_by_age,
+        "price_range_distribution": price_range_distribution,
+        "km_per_year_distribution": km_per_year_distribution
+    }
+
+    return analysis
+
+def analysis_mismatches(expected, actual, relative_accuracy, path=''):
+    # Paths where two analysis dicts disagree beyond float noise, or beyond the sketch bound for the price quantiles
+    if isinstance(expected, dict):
+        keys = set(expected) | set(actual)
+        return [mismatch for key in keys for mismatch in
+                analysis_mismatches(expected.get(key), actual.get(key), relative_accuracy, f"{path}/{key}")]
+    if isinstance(expected, (int, float)) and isinstance(actual, (int, float)):
+        quantile = '/median' in path or '/percentiles' in path
+        # Integer outputs round the sketch value, which can add half a unit
+        tolerance = relative_accuracy * abs(expected) + 0.5 if quantile else 1e-9 * abs(expected)
+        if abs(expected - actual) <= tolerance or (expected != expected and actual != actual):
+            return []
+    elif expected == actual:
+        return []
+    return [f"{path}: {expected!r} != {actual!r}"]
+
+
+def bench_market_stats(rows=1_000_000, delta_fraction=0.01, seed=0):
+    import warnings
+    from data_store import LISTING_SCHEMA, read_typed_dataset
+    from market_stats import (RELATIVE_ACCURACY, IncrementalMarketStats, listing_analysis, prepare_listing_rows,
+                              prepare_sold_out_rows, sold_out_analysis)
+
+    warnings.simplefilter('ignore')
+    current_year = datetime.now().year
+    rng = np.random.default_rng(seed)
+    datasets = [('cars_for_sale', "./car_data/cars_for_sale.csv", prepare_listing_rows, listing_analysis,
+                 listing_analysis_reference),
+                ('sold_out', "./car_data/dubizzle_cars_sold_out.csv", prepare_sold_out_rows, sold_out_analysis,
+                 sold_out_analysis_reference)]
+
+    print(f"{'dataset':>14} {'rows':>8} {'pandas ms':>10} {'build ms':>9} {'delta ms':>9} {'speedup':>8} parity")
+    for name, path, prepare, analysis, reference in datasets:
+        df = read_typed_dataset(path, **LISTING_SCHEMA).drop_duplicates(subset=['id'], keep='last', ignore_index=True)
+        # Repeat the snapshot under fresh ids up to the benchmark size
+        copies = max(rows // len(df), 1)
+        df = pd.concat([df.assign(id=df['id'].astype(str) + f"-{copy}") for copy in range(copies)], ignore_index=True)
+
+        # Next version: drop and reprice delta_fraction / 2 of the rows each, append delta_fraction new ones
+        size = max(int(len(df) * delta_fraction / 2), 1)
+        picked = rng.permutation(len(df))
+        updated = df.drop(index=picked[:size]).copy()
+        repriced = picked[size:2 * size]
+        updated.loc[repriced, 'Price'] = (updated.loc[repriced, 'Price'] * 1.05).round().astype(updated['Price'].dtype)
+        added = df.iloc[rng.integers(len(df), size=2 * size)].copy()
+        added['id'] = [f"bench-{i}" for i in range(len(added))]
+        updated = pd.concat([updated, added], ignore_index=True)
+
+        tracker = IncrementalMarketStats(prepare)
+        build_ms = timeit(lambda: IncrementalMarketStats(prepare).update(df, current_year, lambda stats: None),
+                          repeat=1)
+        tracker.update(df, current_year, lambda stats: None)
+        start = time.perf_counter()
+        incremental = tracker.update(updated, current_year, analysis)
+        delta_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        expected = reference(updated, current_year)
+        pandas_ms = (time.perf_counter() - start) * 1000
+
+        mismatches = analysis_mismatches(expected, incremental, RELATIVE_ACCURACY)
+        print(f"{name:>14} {len(updated):>8} {pandas_ms:>10.1f} {build_ms:>9.1f} {delta_ms:>9.1f} "
+              f"{pandas_ms / delta_ms:>7.1f}x {'ok' if not mismatches else 'MISMATCH'}")
+        for mismatch in mismatches[:10]:
+            print(f"    {mismatch}")
+
+
+BENCHMARKS = {
+    'batch-valuation': bench_batch_valuation,
+    'carswitch': bench_carswitch,
+    'chunked-ingest': bench_chunked_ingest,
+    'comparables': bench_comparables,
+    'dataset-loads': bench_dataset_loads,
+    'emirates-lots': bench_emirates_lots,
+    'features': bench_features,
+    'inference': bench_inference,
+    'listing-pages': bench_listing_pages,
+    'marhaba-sold': bench_marhaba_sold,
+    'market-stats': bench_market_stats,
+    'model-swap': bench_model_swap,
+    'monitor-import': bench_monitor_import,
+    'native-model': bench_native_model,
+    'nearest-comparables': bench_nearest_comparables,
+    'prediction-cache': bench_prediction_cache,
+    'trim-fanout': bench_trim_fanout,
+    'value-maps': bench_value_maps,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run hot-path benchmarks against ./models and ./car_data")
+    parser.add_argument('names', nargs='*', metavar='name',
+                        help=f"benchmarks to run, any of {', '.join(sorted(BENCHMARKS))} (default: all)")
+    args = parser.parse_args(argv)
+    unknown = set(args.names) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(sorted(unknown))}")
+
+    for name in args.names or sorted(BENCHMARKS):
+        print(f"== {name}")
+        BENCHMARKS[name]()
+
+
+if __name__ == '__main__':
+    main()
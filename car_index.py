@@ -0,0 +1,62 @@
+import pandas as pd
+
+
+class TrimIndex:
+    """Make -> Model -> Trim hierarchy of the sold-out dataset, built in a single pass over the rows."""
+
+    def __init__(self, df):
+        self.models = {}
+        self.specs = {}
+        self.trims = {}
+
+        combos = df[['Make', 'Model', 'Trim', 'Regional Specs']].drop_duplicates()
+        # Lists keep first-appearance order, matching Series.unique()
+        for make, model, trim, specs in combos.itertuples(index=False, name=None):
+            models = self.models.setdefault(make, {})
+            models.setdefault(model, None)
+            make_specs = self.specs.setdefault(make, {})
+            make_specs.setdefault(specs, None)
+            model_trims = self.trims.setdefault((make, model), {})
+            model_trims.setdefault(trim, None)
+
+        self.models = {make: list(models) for make, models in self.models.items()}
+        self.specs = {make: list(specs) for make, specs in self.specs.items()}
+        self.trims = {key: list(trims) for key, trims in self.trims.items()}
+        self._known_trims = {}
+
+    def __contains__(self, key):
+        return key in self.trims
+
+    def trims_for(self, make, model):
+        # Every trim recorded for the make/model, including missing ones
+        return self.trims.get((make, model), [])
+
+    def known_trims_for(self, make, model):
+        # Trims usable for scoring: missing and literal 'None' trims are dropped
+        key = (make, model)
+        if key not in self._known_trims:
+            self._known_trims[key] = [str(trim) for trim in self.trims_for(make, model)
+                                      if not pd.isna(trim) and trim != 'None']
+        return self._known_trims[key]
+
+    def options(self):
+        options = {
+            'Make': sorted(make for make in self.models if not pd.isna(make)),
+            'Model': sorted({model for models in self.models.values() for model in models if not pd.isna(model)}),
+            'Trim': sorted({trim for trims in self.trims.values() for trim in trims if not pd.isna(trim)}),
+            'Regional Specs': sorted({specs for make_specs in self.specs.values() for specs in make_specs
+                                      if not pd.isna(specs)}),
+        }
+        options['Trim'] = ['Unknown'] + [trim for trim in options['Trim'] if trim != 'Unknown']
+        return options
+
+    def filtering_rules(self):
+        filtering_rules = {}
+        for make in sorted(make for make in self.models if not pd.isna(make)):
+            filtering_rules[make] = {
+                'Model': sorted(self.models[make]),
+                'Trim': {model: sorted(str(trim) for trim in self.trims[(make, model)])
+                         for model in sorted(self.models[make])},
+                'Regional Specs': sorted(self.specs[make])
+            }
+        return filtering_rules
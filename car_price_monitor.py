@@ -1,213 +1,156 @@
-import schedule
-import time
+import argparse
+import sys
 import pandas as pd
 import numpy as np
-import joblib
-import ast
-from datetime import datetime, timedelta
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import mean_squared_error, r2_score
-import matplotlib.pyplot as plt
+from datetime import datetime
 import io
 import base64
+import json
+from functools import partial
 
+from car_index import TrimIndex
+from data_store import (AUCTION_SCHEMA, LISTING_SCHEMA, PREDICTED_SCHEMA, DatasetWriter, atomic_write_csv,
+                        write_dataset)
+from features import MODEL_FEATURES, FeaturePipeline
+from source_adapters import (AUCTION_ADAPTERS, LISTING_ADAPTERS, LISTING_COLUMNS, SOLD_ADAPTER, TELEGRAM_ADAPTER,
+                             ingest_source, ingest_source_chunks, load_source, run_sources)
 
-def check_new_listings():
+# Created on first use, so importing this module does not load xgboost; then reloaded only when the model file
+# changes, between runs of the scheduled jobs
+_models = None
+
+
+def model_registry():
+    global _models
+    if _models is None:
+        from model_registry import ModelRegistry
+
+        _models = ModelRegistry(background=False)
+        _models.register('monitor')
+    return _models
+
+
+INGEST_STATE_PATH = "./car_data/ingest_state.csv"
+INGEST_META_PATH = "./car_data/ingest_state.json"
+
+
+def load_ingest_state(with_rows=True):
+    # Raw row hashes per (Source, id) from the previous run, or None when a full run is needed. The previous
+    # normalized rows are only loaded with_rows, for runs that reuse them instead of normalizing again.
+    try:
+        with open(INGEST_META_PATH) as f:
+            meta = json.load(f)
+        state_df = pd.read_csv(INGEST_STATE_PATH, dtype=str)
+        previous_cars_df = pd.read_csv("./car_data/cars_for_sale.csv", dtype=str) if with_rows else None
+        previous_predicted_df = pd.read_csv("./car_data/cars_predicted.csv", dtype=str,
+                                            usecols=['Source', 'id', 'Predicted_Price'])
+    except (OSError, ValueError) as e:
+        print(f"No usable ingest state, processing all listings: {e}")
+        return None
+
+    hashes = {source: source_df.set_index('id')['hash'] for source, source_df in state_df.groupby('Source')}
+    rows = {} if previous_cars_df is None else {
+        source: source_df.set_index('id', drop=False) for source, source_df in previous_cars_df.groupby('Source')}
+    predictions = pd.to_numeric(previous_predicted_df.set_index(['Source', 'id'])['Predicted_Price'], errors='coerce')
+    return {'meta': meta, 'hashes': hashes, 'rows': rows, 'predictions': predictions}
+
+
+def save_ingest_state(hashes, meta):
+    state_df = pd.concat([pd.DataFrame({'Source': source, 'id': source_hashes.index, 'hash': source_hashes.values})
+                          for source, source_hashes in hashes.items()], ignore_index=True)
+    atomic_write_csv(state_df, INGEST_STATE_PATH, index=False)
+    with open(INGEST_META_PATH, 'w') as f:
+        json.dump(meta, f)
+
+
+def assemble_listing_source(source, ids, changed, normalized_df, state):
+    # Reuse the previous normalized rows for listings whose raw content did not change
+    previous_rows = state['rows'].get(source) if state is not None else None
+    if previous_rows is None:
+        return normalized_df
+
+    normalized_df = normalized_df.set_index('id', drop=False)
+    source_df = pd.concat([previous_rows.loc[ids[~changed]], normalized_df])
+    # Keep the raw file order so the output matches a full run
+    source_df = source_df.loc[ids.values].reset_index(drop=True)
+    print(f"{source}: {changed.sum()} new or changed of {len(ids)} listings")
+    return source_df
+
+
+def previous_source_hashes(state, source):
+    # Hashes are only trusted for listings whose normalized row was kept
+    if state is None or source not in state['hashes'] or source not in state['rows']:
+        return None
+    hashes = state['hashes'][source]
+    return hashes[hashes.index.isin(state['rows'][source].index)]
+
+
+def load_price_model():
+    # The current model and a function scoring feature frames like the pipeline's predict
+    loaded = model_registry().current('monitor')
+    if loaded.predictor is None:
+        return loaded, loaded.pipeline.predict
+    # The pipeline is given the frames as they are, without preprocess_dataframe's rounding
+    return loaded, partial(loaded.predictor.predict_frame, round_floats=False)
+
+
+def score_listings(cars_df, predict, current_year, previous_predictions=None, changed_keys=()):
+    # Add the model features, Predicted_Price and price/expected_price; previous_predictions are reused for the
+    # listings not in changed_keys. Returns the number of listings scored.
+    numeric_fields = ['Kilometers', 'Year', 'Price']
+    for field in numeric_fields:
+        cars_df[field] = pd.to_numeric(cars_df[field], errors='coerce')
+
+    FeaturePipeline(current_year).transform(cars_df)
+    cars_df_model = cars_df[MODEL_FEATURES]
+
+    keys = pd.MultiIndex.from_arrays([cars_df['Source'], cars_df['id']])
+    predicted_price = np.zeros(len(cars_df), dtype=int)
+    to_score = np.ones(len(cars_df), dtype=bool)
+    if previous_predictions is not None:
+        reused_predictions = previous_predictions.reindex(keys).to_numpy()
+        to_score = np.isnan(reused_predictions) | keys.isin(changed_keys)
+        predicted_price[~to_score] = reused_predictions[~to_score].astype(int)
+    if to_score.any():
+        predicted_price[to_score] = predict(cars_df_model[to_score]).astype(int)
+
+    cars_df['Predicted_Price'] = predicted_price
+    cars_df['price/expected_price'] = cars_df['Price'] / cars_df['Predicted_Price'].replace(0, 1)
+    return int(to_score.sum())
+
+
+def check_new_listings(incremental=True, chunk_rows=None):
     try:
-        model = joblib.load(
-            "./models/['Age', 'Kilometers', 'Make', 'Model', 'Trim', 'Regional Specs', 'Age_Kilometers', 'Kilometers_per_Year']_best_xgb.joblib")
+        loaded, predict = load_price_model()
     except Exception as e:
         print(f"Error loading model: {e}")
-        return
-
-    col_to_select = ['id', 'Make', 'Model', 'Year', 'Kilometers', 'Trim', 'Regional Specs', 'Price', 'Seller Type',
-                     'Posted Datetime', 'Source', 'permalink', 'No of Doors', 'Body Type', 'Fuel Type', 'Interior Color',
-                     'Exterior Color', 'Transmission Type', 'Steering Side', 'Seating Capacity']
-
-    dubizzle_cars_df_1 = pd.read_csv("./car_data/dubizzle_cars_for_sale.csv", dtype=str)
-    dubizzle_cars_df_2 = pd.read_csv("./car_data/dubizzle_cars_on_sale.csv", dtype=str)
-    dubizzle_cars_df = pd.concat([dubizzle_cars_df_1, dubizzle_cars_df_2], ignore_index=True)
-    dubizzle_cars_df = dubizzle_cars_df.drop_duplicates(subset=['id'], keep='last', ignore_index=True)
-    dubizzle_cars_df.dropna(subset=['id'], inplace=True)
-    dubizzle_cars_df['Posted Datetime'] = pd.to_datetime(dubizzle_cars_df['added'], unit='s', errors='coerce').dt.strftime('%Y-%m-%dT%H:%M:%S')
-    dubizzle_cars_df['Seller Type'] = dubizzle_cars_df['Seller Type'].str.replace('Dealership/Certified Pre-Owned','Dealer')
-    dubizzle_cars_df['Source'] = 'Dubizzle'
-    dubizzle_cars_df = dubizzle_cars_df.rename(columns={'Doors': 'No of Doors'})
-    dubizzle_cars_df['No of Doors'] = dubizzle_cars_df['No of Doors'].str.strip(' doors')
-    dubizzle_cars_df['Seating Capacity'] = dubizzle_cars_df['Seating Capacity'].str.strip(' Seater')
-    dubizzle_cars_df = dubizzle_cars_df[col_to_select]
-
-    dubicars_df = pd.read_csv("./car_data/dubicars_for_sale.csv", dtype=str)
-    dubicars_df = dubicars_df.drop_duplicates(subset=['item_id'], keep='last', ignore_index=True)
-    dubicars_df.drop(dubicars_df[dubicars_df['item_id'] == '714672.0'].index, inplace=True)
-    dubicars_df.dropna(subset=['item_id'], inplace=True)
-    dubicars_df['No of Doors'] = None
-    dubicars_df['Interior Color'] = None
-    dubicars_df['Posted Datetime'] = 'Unknown'
-    dubicars_df['seller_type'] = dubicars_df['seller_type'].str.replace('Private', 'Owner')
-    dubicars_df['Source'] = 'Dubicars'
-    dubicars_df = dubicars_df.rename(columns={'item_id': 'id', 'car_make': 'Make', 'car_model': 'Model',
-                                              'car_year': 'Year', 'mileage': 'Kilometers', 'car_trim': 'Trim',
-                                              'regional_specs': 'Regional Specs', 'price': 'Price', 'item_link': 'permalink',
-                                              'seller_type': 'Seller Type', 'steering_side': 'Steering Side', 'body_type': 'Body Type',
-                                              'fuel_type': 'Fuel Type', 'seats': 'Seating Capacity', 'gearbox': 'Transmission Type',
-                                              'color': 'Exterior Color'})
-
-    dubicars_df['Steering Side'] = dubicars_df['Steering Side'].str.title()
-    dubicars_df['Body Type'] = (dubicars_df['Body Type'].str.replace('SUV/Crossover', 'SUV').str
-                                .replace('Truck', 'Utility Truck').str.replace('Station Wagon', 'Wagon'))
-    dubicars_df['Fuel Type'] = dubicars_df['Fuel Type'].str.replace('Gasoline', 'Petrol')
-    dubicars_df['Exterior Color'] = dubicars_df['Exterior Color'].str.title()
-    dubicars_df['Transmission Type'] = dubicars_df['Transmission Type'] + ' Transmission'
-    dubicars_df['Seating Capacity'] = dubicars_df['Seating Capacity'].str.replace('9+', '8+')
-    dubicars_df['Regional Specs'] = dubicars_df['Regional Specs'] + ' Specs'
-    dubicars_df['Regional Specs'] = dubicars_df['Regional Specs'].str.replace('Other Specs', 'Other')
-    dubicars_df = dubicars_df[col_to_select]
-
-    carswitch_df = pd.read_csv("./car_data/carswitch_cars_for_sale.csv", dtype=str)
-    carswitch_df = carswitch_df.drop_duplicates(subset=['id'], keep='last', ignore_index=True)
-    carswitch_df.dropna(subset=['id'], inplace=True)
-    carswitch_df['Trim'] = 'Unknown'
-    carswitch_df['Posted Datetime'] = 'Unknown'
-    carswitch_df['Seller Type'] = 'Unknown'
-    carswitch_df['Source'] = 'Carswitch'
-    carswitch_df['No of Doors'] = None
-    carswitch_df['Body Type'] = None
-    carswitch_df['Fuel Type'] = None
-    carswitch_df['Interior Color'] = None
-    carswitch_df['Exterior Color'] = None
-    carswitch_df['Transmission Type'] = None
-    carswitch_df['Steering Side'] = None
-    carswitch_df['Seating Capacity'] = None
-    carswitch_df = carswitch_df.rename(columns={'make': 'Make', 'model': 'Model', 'year': 'Year',
-                                                'mileage': 'Kilometers', 'specs': 'Regional Specs',
-                                                'price': 'Price', 'url': 'permalink'})
-
-    carswitch_df['Regional Specs'] = (carswitch_df['Regional Specs'].str.replace('America Specs', 'American Specs').
-                                      str.replace('Canadia Specs', 'Canadian Specs').
-                                      str.replace('Europea Specs', 'European Specs').str.replace('European', 'European Specs').
-                                      str.replace('American', 'American Specs').str.replace('GCC', 'GCC Specs').str.strip(' Specs') + ' Specs')
-    carswitch_df['Regional Specs'] = carswitch_df['Regional Specs'].str.replace('Japan Specs', 'Japanese Specs')
-    carswitch_df['Regional Specs'] = carswitch_df['Regional Specs'].str.replace('Non GCC Specs', 'Other')
-
-    for index, row in carswitch_df.iterrows():
-        title_list = row['title'].split()
-        for title in title_list:
-            if row['Make'] == title.lower():
-                row['Make'] = title
-            elif '-' in row['Make']:
-                row['Make'] = row['Make'].replace('-', ' ').title()
-            elif row['Model'] == title.lower():
-                carswitch_df.at[index, 'Model'] = title
-            elif '-' in row['Model']:
-                carswitch_df.at[index, 'Model'] = row['Model'].replace('-', ' ').title()
-
-        if isinstance(row['Kilometers'], str):
-            value_without_metric = row['Kilometers'].split()[0].replace(',', '').replace('KM', '').replace('Miles', '').strip()
-            if value_without_metric != 'KM':
-                if 'Miles' in row['Kilometers'] :
-                    if value_without_metric != '':
-                        carswitch_df.at[index, 'Kilometers'] = int(value_without_metric) * 1.6
-                    else:
-                        carswitch_df.at[index, 'Kilometers'] = None
-                elif 'KM' in row['Kilometers'] :
-                    if value_without_metric != '':
-                        carswitch_df.at[index, 'Kilometers'] = int(value_without_metric)
-                    else:
-                        carswitch_df.at[index, 'Kilometers'] = None
-            else:
-                carswitch_df.at[index, 'Kilometers'] = 0
-
-    carswitch_df = carswitch_df[col_to_select]
-
-    car24_df = pd.read_csv("./car_data/cars24_cars_for_sale.csv", dtype=str)
-    car24_df = car24_df.drop_duplicates(subset=['appointmentId'], keep='last', ignore_index=True)
-    car24_df.dropna(subset=['appointmentId'], inplace=True)
-    car24_df['Seller Type'] = ((car24_df['assortmentCategory'].str.replace('PRIME', 'Dealer').
-                                      str.replace('LITE', 'Dealer').str.replace('PRIVATE_SELLER_PRO', 'Owner')).
-                                      str.replace('PRIVATE_SELLER', 'Owner'))
-    car24_df['Posted Datetime'] = 'Unknown'
-    car24_df['Source'] = 'Cars24'
-    car24_df['Trim'] = car24_df['variant']
-    car24_df['No of Doors'] = None
-    car24_df['Body Type'] = None
-    car24_df['Interior Color'] = None
-    car24_df['Steering Side'] = None
-    car24_df['Seating Capacity'] = None
-    car24_df = car24_df.rename(columns={'appointmentId': 'id', 'make': 'Make', 'model': 'Model', 'year': 'Year',
-                                        'odometerReading': 'Kilometers', 'specs': 'Regional Specs', 'price': 'Price',
-                                        'url': 'permalink', 'carExteriorColor': 'Exterior Color', 'transmissionType': 'Transmission Type',
-                                        'fuelType': 'Fuel Type'})
-
-    car24_df['Exterior Color'] = car24_df['Exterior Color'].str.replace('Other', 'Other Color')
-    car24_df['Transmission Type'] = car24_df['Transmission Type'] + ' Transmission'
-    car24_df['Transmission Type'] = car24_df['Transmission Type'].apply(lambda x: None if x == 'None Transmission' else x)
-    car24_df['Regional Specs'] = car24_df['Regional Specs'].str.replace('GCC', 'GCC Specs')
-    car24_df['Make'] = car24_df['Make'].str.strip().str.title()
-    car24_df['Model'] = car24_df['Model'].str.strip().str.title()
-    car24_df = car24_df[col_to_select]
-
-    cars_df = pd.concat([dubizzle_cars_df, dubicars_df, carswitch_df, car24_df], ignore_index=True)
-
-    make_list = cars_df['Make'].unique()
-    model_list = cars_df['Model'].unique()
-
-    telegram_df = pd.read_csv("./car_data/telegram.csv", dtype=str)
-    telegram_df = telegram_df.drop_duplicates(subset=['id'], keep='last', ignore_index=True)
-
-    telegram_cars_df = pd.read_csv("./car_data/telegram_cars_gemini.csv", dtype=str)
-    telegram_cars_df = telegram_cars_df.drop_duplicates(subset=['Id'], keep='last', ignore_index=True)
-    telegram_cars_df = telegram_cars_df.rename(columns={'Id': 'id', 'Mileage': 'Kilometers', 'RegionalSpecs': 'Regional Specs',
-                                                        'Date': 'Posted Datetime'})
-
-    telegram_cars_df = pd.merge(telegram_cars_df, telegram_df, on='id', how='inner')
-    telegram_cars_df['permalink'] = 'https://t.me/' + telegram_cars_df['chat_username']
-
-    telegram_cars_df.dropna(subset=['Make', 'Model'], inplace=True)
-    telegram_cars_df = telegram_cars_df[telegram_cars_df['Make'].isin(make_list)]
-    telegram_cars_df = telegram_cars_df[telegram_cars_df['Model'].isin(model_list)]
-    telegram_cars_df = telegram_cars_df[telegram_cars_df['SellorBuy'] == 'Sell']
-
-    telegram_cars_df['Source'] = 'Telegram'
-    telegram_cars_df['Seller Type'] = 'Unknown'
-    telegram_cars_df['Trim'] = 'Unknown'
-    telegram_cars_df['No of Doors'] = None
-    telegram_cars_df['Body Type'] = None
-    telegram_cars_df['Fuel Type'] = None
-    telegram_cars_df['Interior Color'] = None
-    telegram_cars_df['Exterior Color'] = None
-    telegram_cars_df['Transmission Type'] = None
-    telegram_cars_df['Steering Side'] = None
-    telegram_cars_df['Seating Capacity'] = None
-    telegram_cars_df['Price'] = (telegram_cars_df['Price'].str.replace('AED', '').str.replace(',', '').
-                                 str.replace('迪', '').str.strip())
-
-    two_month_ago = datetime.now() - timedelta(days=60)
-    telegram_cars_df['Posted Datetime'] = pd.to_datetime(telegram_cars_df['Posted Datetime'], errors='coerce')
-    telegram_cars_df = telegram_cars_df[telegram_cars_df['Posted Datetime'] > two_month_ago]
-    telegram_cars_df['Regional Specs'] = (telegram_cars_df['Regional Specs'].str.replace('GCC', 'GCC Specs').
-                                          str.replace('American', 'American Specs').str.replace('MiddleEast', 'GCC Specs').
-                                          str.replace('Gcc', 'GCC Specs').str.replace('US-spec', 'American Specs').
-                                          str.replace('Canadian', 'Canadian Specs').str.replace('USSpec', 'American Specs').
-                                          str.replace('NorthAmerican', 'American Specs').str.replace('NorthAmerica', 'American Specs').
-                                          str.replace('US', 'American Specs').str.replace('Notprovided', 'Unknown').
-                                          str.replace('Domesticversion', 'GCC Specs').str.replace('RightFrontDamaged', 'Unknown').
-                                          str.replace('MidEast', 'GCC Specs').str.replace('GCC SpecsEdition', 'GCC Specs').
-                                          str.replace('GCC SpecsGCC Specs', 'GCC Specs').str.replace('gcc', 'GCC Specs').
-                                          str.replace('NotProvided', 'Unknown').str.replace('FullOption', 'Unknown').
-                                          str.replace('Overseasversion', 'Unknown'))
-    telegram_cars_df['Regional Specs'].fillna('Unknown', inplace=True)
-
-    telegram_cars_df = telegram_cars_df.dropna(subset=['Year', 'Kilometers', 'Price'])
-    telegram_cars_df['Year'] = telegram_cars_df['Year'].apply(lambda x: '20' + x if len(x) ==2 else x)
-    telegram_cars_df['Kilometers'] = telegram_cars_df['Kilometers'].apply(lambda x: x + '00000' if len(x) <= 2 else x)
-    telegram_cars_df['Price'] = (telegram_cars_df['Price'].str.replace('x', '').replace('NotProvided', '').str.strip().
-                                 apply(lambda x: x + '0000' if len(x) <= 2 else x))
-
-    telegram_cars_df =telegram_cars_df[col_to_select]
+        raise
+
+    if chunk_rows:
+        return stream_new_listings(loaded, predict, incremental, chunk_rows)
+    state = load_ingest_state() if incremental else None
+
+    jobs = [(ingest_source, adapter.name, previous_source_hashes(state, adapter.source)) for adapter in LISTING_ADAPTERS]
+    results = run_sources(jobs + [(load_source, TELEGRAM_ADAPTER.name)])
+
+    source_dfs = []
+    changed_keys = set()
+    source_hashes = {}
+    for adapter, (ids, hashes, changed, normalized_df) in zip(LISTING_ADAPTERS, results):
+        source_dfs.append(assemble_listing_source(adapter.source, ids, changed, normalized_df, state))
+        changed_keys.update((adapter.source, car_id) for car_id in ids[changed])
+        source_hashes[adapter.source] = hashes
+
+    dubizzle_cars_df = source_dfs[0]
+    cars_df = pd.concat(source_dfs, ignore_index=True)
+
+    # Telegram listings are only kept for makes and models the marketplaces know about
+    telegram_cars_df = results[-1]
+    telegram_cars_df = telegram_cars_df[telegram_cars_df['Make'].isin(cars_df['Make'].unique())]
+    telegram_cars_df = telegram_cars_df[telegram_cars_df['Model'].isin(cars_df['Model'].unique())]
 
     # cars_df = pd.concat([cars_df, telegram_cars_df], ignore_index=True)
-    cars_df.to_csv("./car_data/cars_for_sale.csv", index=False)
+    write_dataset(cars_df, "./car_data/cars_for_sale.csv", **LISTING_SCHEMA)
 
     make_to_predict_list = dubizzle_cars_df['Make'].unique()
     model_to_predict_list = dubizzle_cars_df['Model'].unique()
@@ -219,279 +162,196 @@ def check_new_listings():
     cars_df = cars_df[cars_df['Regional Specs'].isin(spec_to_predict_list)]
     cars_df = cars_df[cars_df['Trim'].isin(trim_to_predict_list)]
 
-    numeric_fields = ['Kilometers', 'Year', 'Price']
-    for field in numeric_fields:
-        cars_df[field] = pd.to_numeric(cars_df[field], errors='coerce')
-
+    # Previous predictions stay valid while the model file and the reference year are unchanged
     current_year = datetime.now().year
-    cars_df['Age'] = current_year - cars_df['Year']
-    cars_df['Age_Kilometers'] = cars_df['Age'] * cars_df['Kilometers']
-    cars_df['Kilometers_per_Year'] = cars_df['Kilometers'] / cars_df['Age'].replace(0, 1)
+    meta = {'year': current_year, 'model_version': loaded.version}
+    previous_predictions = state['predictions'] if state is not None and state['meta'] == meta else None
+    scored = score_listings(cars_df, predict, current_year, previous_predictions, changed_keys)
+    print(f"Scored {scored} of {len(cars_df)} listings")
 
-    model_features = ['Age', 'Kilometers', 'Make', 'Model', 'Trim', 'Regional Specs', 'Age_Kilometers',
-                      'Kilometers_per_Year']
-    cars_df_model = cars_df[model_features]
-
-    cars_df['Predicted_Price'] = model.predict(cars_df_model).astype(int)
-    cars_df['price/expected_price'] = cars_df['Price'] / cars_df['Predicted_Price'].replace(0, 1)
-    cars_df.to_csv("./car_data/cars_predicted.csv", index=False)
+    write_dataset(cars_df, "./car_data/cars_predicted.csv", **PREDICTED_SCHEMA)
+    save_ingest_state(source_hashes, meta)
     print("Price monitoring data saved to price_monitoring.csv", datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
     return cars_df
 
-def check_sold_cars():
+
+def stream_new_listings(loaded, predict, incremental, chunk_rows):
+    """check_new_listings in bounded memory: every feed is streamed chunk_rows raw rows at a time through
+    normalization and scoring, and both outputs are written as the chunks come.
+
+    The outputs equal a full run's except that numbers are formatted per chunk (a Year column with a missing value
+    is written as 2015.0 only in that chunk); the typed copies the app loads are identical. Feeds are read one after
+    the other in this process, and Telegram listings, which are not part of the outputs, are not read. Returns the
+    number of listings written to cars_predicted.csv.
+    """
+    state = load_ingest_state(with_rows=False) if incremental else None
+    current_year = datetime.now().year
+    meta = {'year': current_year, 'model_version': loaded.version}
+    previous_predictions = state['predictions'] if state is not None and state['meta'] == meta else None
+
+    # Listings are only scored for makes, models, specs and trims the first feed (Dubizzle) lists
+    reference_values = {'Make': set(), 'Model': set(), 'Regional Specs': set(), 'Trim': set()}
+    source_hashes = {}
+    scored = 0
+    listings_writer = DatasetWriter("./car_data/cars_for_sale.csv", columns=LISTING_COLUMNS, **LISTING_SCHEMA)
+    with listings_writer, DatasetWriter("./car_data/cars_predicted.csv", **PREDICTED_SCHEMA) as predicted_writer:
+        for position, adapter in enumerate(LISTING_ADAPTERS):
+            previous_hashes = state['hashes'].get(adapter.source) if state is not None else None
+            hashes, changed_count = [], 0
+            for ids, chunk_hashes, changed, cars_df in ingest_source_chunks(adapter.name, chunk_rows, previous_hashes):
+                hashes.append(chunk_hashes)
+                changed_count += changed.sum()
+                listings_writer.write(cars_df)
+                if position == 0:
+                    for field, values in reference_values.items():
+                        values.update(cars_df[field].unique())
+                for field, values in reference_values.items():
+                    cars_df = cars_df[cars_df[field].isin(values)]
+                changed_keys = [(adapter.source, car_id) for car_id in ids[changed]]
+                scored += score_listings(cars_df, predict, current_year, previous_predictions, changed_keys)
+                predicted_writer.write(cars_df)
+            source_hashes[adapter.source] = pd.concat(hashes) if hashes else pd.Series(dtype=str)
+            print(f"{adapter.source}: {changed_count} new or changed of {len(source_hashes[adapter.source])} listings")
+        print(f"Scored {scored} of {predicted_writer.rows} listings")
+
+    save_ingest_state(source_hashes, meta)
+    print("Price monitoring data saved to price_monitoring.csv", datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+    return predicted_writer.rows
+
+def check_sold_cars(chunk_rows=None):
     # Implement sold cars check
-    col_to_select = ['id', 'Make', 'Model', 'Year', 'Kilometers', 'Trim', 'Regional Specs', 'Price', 'Seller Type',
-                     'Posted Datetime', 'Source', 'permalink', 'No of Doors', 'Body Type', 'Fuel Type',
-                     'Interior Color',
-                     'Exterior Color', 'Transmission Type', 'Steering Side', 'Seating Capacity']
-
-    dubizzle_cars_df = pd.read_csv("./car_data/dubizzle_cars_sold_out.csv", dtype=str)
-    dubizzle_cars_df = dubizzle_cars_df.drop_duplicates(subset=['id'], keep='last', ignore_index=True)
-    dubizzle_cars_df.dropna(subset=['id'], inplace=True)
-    dubizzle_cars_df['Posted Datetime'] = pd.to_datetime(dubizzle_cars_df['added'], unit='s',
-                                                         errors='coerce').dt.strftime('%Y-%m-%dT%H:%M:%S')
-    dubizzle_cars_df['Seller Type'] = dubizzle_cars_df['Seller Type'].str.replace('Dealership/Certified Pre-Owned',
-                                                                                  'Dealer')
-    dubizzle_cars_df['Source'] = 'Dubizzle'
-    dubizzle_cars_df = dubizzle_cars_df.rename(columns={'Doors': 'No of Doors'})
-    dubizzle_cars_df['No of Doors'] = dubizzle_cars_df['No of Doors'].str.strip(' doors')
-    dubizzle_cars_df['Seating Capacity'] = dubizzle_cars_df['Seating Capacity'].str.strip(' Seater')
-    dubizzle_cars_df = dubizzle_cars_df[col_to_select]
-    dubizzle_cars_df.to_csv("./car_data/dubizzle_cars_sold_out.csv", index=False)
+    if chunk_rows:
+        with DatasetWriter("./car_data/dubizzle_cars_sold_out.csv", columns=LISTING_COLUMNS,
+                           **LISTING_SCHEMA) as writer:
+            for raw_df in SOLD_ADAPTER.read_chunks(chunk_rows):
+                writer.write(SOLD_ADAPTER.normalize(raw_df))
+        print("Sold cars data saved to dubizzle_cars_sold_out.csv", datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+        return writer.rows
+    dubizzle_cars_df = load_source(SOLD_ADAPTER.name)
+    write_dataset(dubizzle_cars_df, "./car_data/dubizzle_cars_sold_out.csv", **LISTING_SCHEMA)
     print("Sold cars data saved to dubizzle_cars_sold_out.csv", datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
     return dubizzle_cars_df
 
 
-def check_auction_cars():
+# Lots without these are not written to auction_sold_cars.csv
+AUCTION_REQUIRED_FIELDS = ['Make', 'Model', 'Year', 'Kilometers', 'Regional Specs', 'Final Price']
+
+
+def check_auction_cars(chunk_rows=None):
     # Implement auction cars check
-    marhaba_cars_df = pd.read_csv("./car_data/marhaba_auctions_cars_details.csv", dtype=str)
     pd.set_option('expand_frame_repr', False)
-    marhaba_cars_df = marhaba_cars_df.drop_duplicates(subset=['_id'], keep='last', ignore_index=True)
-    marhaba_cars_df.dropna(subset=['_id'], inplace=True)
-    marhaba_cars_df['sale_status'] = 0
-    marhaba_cars_df.loc[marhaba_cars_df['sold'] != '[]', 'sale_status'] = 1
-    marhaba_sold_cars_df = marhaba_cars_df[marhaba_cars_df['sold'] != '[]']
-    marhaba_sold_cars_df.reset_index(drop=True, inplace=True)
-    marhaba_sold_cars_df = expand_sold_column(marhaba_sold_cars_df)
-    marhaba_sold_cars_df = marhaba_sold_cars_df.join(pd.json_normalize(marhaba_sold_cars_df['sold']))
-    marhaba_sold_cars_df['odometer'] = marhaba_sold_cars_df['odometer'].str.replace(' ', '').str.replace('UNKNOWN', '')
-    marhaba_sold_cars_df['odometer'] = pd.to_numeric(marhaba_sold_cars_df['odometer'], errors='coerce')
-    marhaba_sold_cars_df['Kilometers'] = marhaba_sold_cars_df['odometer']
-    marhaba_sold_cars_df.loc[marhaba_sold_cars_df['odometer_type'] == 'Miles', 'kilometers'] = marhaba_sold_cars_df.loc[
-                                                                                                   marhaba_sold_cars_df[
-                                                                                                       'odometer_type']
-                                                                                                   == 'Miles', 'odometer'] * 1.6
-    marhaba_sold_cars_df['bid_starting'] = marhaba_sold_cars_df['bid_starting'].astype(int)
-    marhaba_sold_cars_df['Bid Difference'] = marhaba_sold_cars_df['bid_amount'] - marhaba_sold_cars_df['bid_starting']
-    marhaba_sold_cars_df['Bid Difference Percentage'] = (marhaba_sold_cars_df['Bid Difference'] / marhaba_sold_cars_df['bid_starting']) * 100
-    marhaba_sold_cars_df['Bid Difference Percentage'] = marhaba_sold_cars_df['Bid Difference Percentage'].round(2)
-    marhaba_sold_cars_df['Bid Difference Percentage'] = marhaba_sold_cars_df['Bid Difference Percentage'].replace([np.inf, -np.inf], np.nan)
-    marhaba_sold_cars_df.rename(columns={'_id': 'Id', 'make_title': 'Make', 'model_title': 'Model', 'bid_starting': 'Start Price',
-                                         'bid_amount': 'Final Price', 'body_type': 'Body Type', 'primary_damage': 'Primary Damage',
-                                         'secondary_damage': 'Secondary Damage', 'exterior_color': 'Exterior Color',
-                                         'interior_color': 'Interior Color', 'transmission': 'Transmission',
-                                         'specification': 'Regional Specs', 'cylinders': 'Cylinders',
-                                         'participation_count': 'Participation Count', 'engine_type': 'Engine Type',
-                                         'fuel': 'Fuel Type', 'year': 'Year', 'auction_date': 'Auction Date'},
-                                         inplace=True)
-    marhaba_sold_cars_df['Make'] = marhaba_sold_cars_df['Make'].str.title()
-    marhaba_sold_cars_df['Model'] = marhaba_sold_cars_df['Model'].str.title()
-    marhaba_sold_cars_df['Body Type'] = marhaba_sold_cars_df['Body Type'].str.title()
-    marhaba_sold_cars_df['Transmission'] = marhaba_sold_cars_df['Transmission'] + ' Transmission'
-    marhaba_sold_cars_df['Regional Specs'] = marhaba_sold_cars_df['Regional Specs'].str.title() + ' Specs'
-    marhaba_sold_cars_df['Fuel Type'] = marhaba_sold_cars_df['Fuel Type'].str.title().str.replace(' E/P', '')
-    marhaba_sold_cars_df['Interior Color'] = marhaba_sold_cars_df['Interior Color'].str.title().str.replace('And', '&')
-    marhaba_sold_cars_df['Exterior Color'] = marhaba_sold_cars_df['Exterior Color'].str.title().str.replace('And', '&')
-    marhaba_sold_cars_df['Seating Capacity'] = None
-    marhaba_sold_cars_df['No of Doors'] = None
-    marhaba_sold_cars_df['Source'] = 'Marhaba Auctions'
-
-    cols_to_keep = ['Id', 'Make', 'Model', 'Year', 'Kilometers', 'Regional Specs', 'Transmission', 'Body Type',
-                    'Engine Type', 'Cylinders', 'Fuel Type', 'Interior Color', 'Exterior Color', 'Seating Capacity',
-                    'No of Doors', 'Primary Damage', 'Secondary Damage', 'Auction Date', 'Start Price', 'Final Price',
-                    'Bid Difference', 'Bid Difference Percentage', 'Participation Count', 'Source']
-
-    marhaba_sold_cars_df = marhaba_sold_cars_df[cols_to_keep]
+    if chunk_rows:
+        return stream_auction_cars(chunk_rows)
+    marhaba_sold_cars_df, merged_emirates_auction_cars_df = run_sources(
+        [(load_source, adapter.name) for adapter in AUCTION_ADAPTERS])
     marhaba_sold_cars_df.to_csv("./car_data/marhaba_auctions_sold_cars.csv", index=False)
 
-    emirates_auction_cars_details_df = pd.read_csv("./car_data/emirates_auction_cars_details.csv", dtype=str)
-    emirates_auction_cars_details_df.drop_duplicates(subset=['Lot'], keep='last', ignore_index=True, inplace=True)
-    emirates_auction_cars_details_df.dropna(subset=['Lot', 'Odometer'], inplace=True)
-
-    emirates_auction_cars_df = pd.read_csv("./car_data/emirates_auction_cars.csv", dtype=str)
-    emirates_auction_cars_df.sort_values(by='UpdatedDatetime', inplace=True)
-    emirates_auction_cars_df['UpdatedDatetime'] = (pd.to_datetime(emirates_auction_cars_df['UpdatedDatetime'].
-                                                                 astype(float), unit= 's', errors='coerce').
-                                                   dt.strftime('%Y-%m-%d'))
-    emirates_auction_cars_df['EndDate'] = (pd.to_datetime(emirates_auction_cars_df['EndDate'], errors='coerce').
-                                           dt.strftime('%Y-%m-%d'))
-
-    emirates_auction_end_cars_df = emirates_auction_cars_df.drop_duplicates(subset=['Lot'], keep='last', ignore_index=True)
-    emirates_auction_end_cars_df = emirates_auction_end_cars_df[emirates_auction_end_cars_df['UpdatedDatetime'] ==
-                                                                emirates_auction_end_cars_df['EndDate']]
-    emirates_auction_end_cars_df.dropna(subset=['Lot', 'Milage'], inplace=True)
-    emirates_auction_start_cars_df = emirates_auction_cars_df.drop_duplicates(subset=['Lot'], keep='first', ignore_index=True)
-    emirates_auction_start_cars_df = emirates_auction_start_cars_df[emirates_auction_start_cars_df['UpdatedDatetime'] !=
-                                                                    emirates_auction_start_cars_df['EndDate']]
-    emirates_auction_start_cars_df.dropna(subset=['Lot', 'Milage'], inplace=True)
-
-    merged_emirates_auction_end_cars_df = pd.merge(emirates_auction_end_cars_df, emirates_auction_cars_details_df,
-                                                   on='Lot', how='left')
-    merged_emirates_auction_end_cars_df.rename(columns={'CurrentPrice': 'Final Price'}, inplace=True)
-    merged_emirates_auction_start_cars_df = pd.merge(emirates_auction_start_cars_df, emirates_auction_cars_details_df,
-                                                     on='Lot', how='left')
-    merged_emirates_auction_start_cars_df.rename(columns={'CurrentPrice': 'Start Price'}, inplace=True)
-    merged_emirates_auction_cars_df = pd.merge(merged_emirates_auction_end_cars_df, merged_emirates_auction_start_cars_df[
-                                               ['Lot', 'Start Price']], on='Lot', how='inner')
-
-    merged_emirates_auction_cars_df.rename(columns={'Lot': 'Id', 'BodyType': 'Body Type', 'Exterior': 'Exterior Color',
-                                                    'FuelType': 'Fuel Type', 'CountryOfMade': 'Regional Specs',
-                                                    'EndDate': 'Auction Date', 'Milage': 'Kilometers',
-                                                    'Interior': 'Interior Color', 'Seats': 'Seating Capacity',
-                                                    'Doors': 'No of Doors'}, inplace=True)
-
-    merged_emirates_auction_cars_df['Engine Type'] = None
-    merged_emirates_auction_cars_df['Cylinders'] = None
-    merged_emirates_auction_cars_df['Primary Damage'] = None
-    merged_emirates_auction_cars_df['Secondary Damage'] = None
-    merged_emirates_auction_cars_df['Participation Count'] = None
-    merged_emirates_auction_cars_df['Source'] = 'Emirates Auction'
-    merged_emirates_auction_cars_df['Start Price'] = merged_emirates_auction_cars_df['Start Price'].astype(int)
-    merged_emirates_auction_cars_df['Final Price'] = merged_emirates_auction_cars_df['Final Price'].astype(int)
-    merged_emirates_auction_cars_df['Bid Difference'] = merged_emirates_auction_cars_df['Final Price'] - merged_emirates_auction_cars_df['Start Price']
-    merged_emirates_auction_cars_df['Bid Difference Percentage'] = (merged_emirates_auction_cars_df['Bid Difference'] / merged_emirates_auction_cars_df['Start Price']) * 100
-    merged_emirates_auction_cars_df['Bid Difference Percentage'] = merged_emirates_auction_cars_df['Bid Difference Percentage'].round(2)
-    merged_emirates_auction_cars_df['Bid Difference Percentage'] = merged_emirates_auction_cars_df['Bid Difference Percentage'].replace([np.inf, -np.inf], np.nan)
-    merged_emirates_auction_cars_df['Transmission'] = merged_emirates_auction_cars_df['Transmission'] + ' Transmission'
-    merged_emirates_auction_cars_df['Make'] = (merged_emirates_auction_cars_df['Make'].str.title().str.
-                                               replace('Bmw', 'BMW')).str.replace('Gmc', 'GMC').str.replace('Mg', 'MG')
-    merged_emirates_auction_cars_df['Regional Specs'] = ((((((merged_emirates_auction_cars_df['Regional Specs'].
-                                                        str.replace('United Arab Emirates', 'GCC Specs')).
-                                                        str.replace('Japan', 'Japanese Specs')).
-                                                        str.replace('China mainland', 'Chinese Specs')).
-                                                        str.replace('SOUTH KOREA', 'Korean Specs')).
-                                                        str.replace('Canada', 'Canadian Specs')).
-                                                        str.replace('Thailand', 'Other').
-                                                        str.replace('South Africa', 'Other').
-                                                        str.replace('Australia', 'Other').
-                                                        str.replace('Mexico', 'Other').
-                                                        str.replace('Germany', 'European Specs').
-                                                        str.replace('Sweden', 'European Specs').
-                                                        str.replace('United Kingdo', 'European Specs').
-                                                        str.replace('India', 'Other').
-                                                        str.replace('Spain', 'European Specs').
-                                                        str.replace('Italy', 'European Specs').
-                                                        str.replace('Brazil', 'Other').
-                                                        str.replace('Afghanistan', 'Other').
-                                                        str.replace('Morocco', 'Other').
-                                                        str.replace('Turkey', 'Other').
-                                                        str.replace('Belgiu', 'European Specs').
-                                                        str.replace('Indonesia', 'Other').
-                                                        str.replace('Taiwan', 'Other').
-                                                        str.replace('Portugal', 'European Specs').
-                                                        str.replace('Netherlands', 'European Specs').
-                                                        str.replace('Slovakia', 'European Specs').
-                                                        str.replace('Hungary', 'European Specs').
-                                                        str.replace('France', 'European Specs').
-                                                        str.replace('Austria', 'European Specs').
-                                                        str.replace('Romania', 'European Specs').
-                                                        str.replace('United States', 'American Specs'))
-
-    merged_emirates_auction_cars_df = merged_emirates_auction_cars_df[cols_to_keep]
     merged_auction_cars_df = pd.concat([marhaba_sold_cars_df, merged_emirates_auction_cars_df], ignore_index=True)
-    merged_auction_cars_df.dropna(subset=['Make', 'Model', 'Year', 'Kilometers', 'Regional Specs', 'Final Price'], inplace=True)
-    merged_auction_cars_df.to_csv("./car_data/auction_sold_cars.csv", index=False)
-
-    merged_auction_cars_df['Year'] = pd.to_numeric(merged_auction_cars_df['Year'], errors='coerce').astype('int64')
-    numeric_fields = ['Kilometers', 'Start Price', 'Final Price', 'Bid Difference', 'Bid Difference Percentage']
-    for field in numeric_fields:
-        merged_auction_cars_df[field] = pd.to_numeric(merged_auction_cars_df[field], errors='coerce')
+    merged_auction_cars_df.dropna(subset=AUCTION_REQUIRED_FIELDS, inplace=True)
+    write_dataset(merged_auction_cars_df, "./car_data/auction_sold_cars.csv", **AUCTION_SCHEMA)
 
-    merged_auction_cars_df = merged_auction_cars_df[merged_auction_cars_df['Start Price'] > 0]
-
-    # Calculate Age
-    current_year = datetime.now().year
-    merged_auction_cars_df['Age'] = current_year - merged_auction_cars_df['Year']
+    predict, trim_index = load_auction_pricing()
+    merged_auction_cars_df = price_auction_lots(merged_auction_cars_df, predict, trim_index, datetime.now().year)
 
-    predicted_price = merged_auction_cars_df.apply(get_predicted_prices, axis=1)
-    print(predicted_price)
+    write_dataset(merged_auction_cars_df, "./car_data/auction_sold_cars.csv", **AUCTION_SCHEMA)
+    print("Auction cars data saved to auction_sold_cars.csv", datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
 
-    predicted_prices = merged_auction_cars_df.apply(get_predicted_prices, axis=1)
-    merged_auction_cars_df['Min_Predicted_Price'] = predicted_prices['Min_Predicted_Price']
-    merged_auction_cars_df['Max_Predicted_Price'] = predicted_prices['Max_Predicted_Price']
-    merged_auction_cars_df['Predicted Price'] = (merged_auction_cars_df['Min_Predicted_Price'] + merged_auction_cars_df['Max_Predicted_Price']) / 2
+    return merged_auction_cars_df
 
-    # Calculate ratios
-    merged_auction_cars_df['Min_Final_Price_Predicted_Ratio'] = merged_auction_cars_df['Final Price'] / merged_auction_cars_df[
-        'Max_Predicted_Price']
-    merged_auction_cars_df['Max_Final_Price_Predicted_Ratio'] = merged_auction_cars_df['Final Price'] / merged_auction_cars_df[
-        'Min_Predicted_Price']
 
-    merged_auction_cars_df['Final Price Predicted Ratio'] = merged_auction_cars_df['Final Price'] / merged_auction_cars_df['Predicted Price']
+def stream_auction_cars(chunk_rows):
+    """check_auction_cars in bounded memory: the sold lots of every feed are read chunk_rows at a time, priced and
+    written as the chunks come.
 
-    merged_auction_cars_df.to_csv("./car_data/auction_sold_cars.csv", index=False)
+    The outputs equal a full run's except that numbers are formatted per chunk, as in stream_new_listings. Emirates
+    Auction lots are only known to be sold once the whole update log is read, so that feed holds one or two updates
+    per lot. Returns the number of lots written to auction_sold_cars.csv.
+    """
+    predict, trim_index = load_auction_pricing()
+    current_year = datetime.now().year
+    marhaba_writer = DatasetWriter("./car_data/marhaba_auctions_sold_cars.csv", typed_copy=False)
+    with marhaba_writer, DatasetWriter("./car_data/auction_sold_cars.csv", **AUCTION_SCHEMA) as auction_writer:
+        for adapter in AUCTION_ADAPTERS:
+            for raw_df in adapter.read_chunks(chunk_rows):
+                auction_cars_df = adapter.normalize(raw_df)
+                if adapter.name == 'Marhaba Auctions':
+                    marhaba_writer.write(auction_cars_df)
+                auction_cars_df = auction_cars_df.dropna(subset=AUCTION_REQUIRED_FIELDS)
+                auction_writer.write(price_auction_lots(auction_cars_df, predict, trim_index, current_year))
     print("Auction cars data saved to auction_sold_cars.csv", datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
-
-    return merged_auction_cars_df
-
-def expand_sold_column(df):
-  df = df.copy()
-  df['sold'] = df['sold'].apply(ast.literal_eval)
-  return df
+    return auction_writer.rows
 
 
-def get_predicted_prices(row):
+def load_auction_pricing():
     try:
-        MODEL = joblib.load(
-            "./models/['Age', 'Kilometers', 'Make', 'Model', 'Trim', 'Regional Specs', 'Age_Kilometers', 'Kilometers_per_Year']_best_xgb.joblib")
+        _, predict = load_price_model()
     except Exception as e:
         print(f"Error loading model: {e}")
-        return
-    make = row['Make']
-    model = row['Model']
+        raise
 
     sold_out_df = pd.read_csv("./car_data/dubizzle_cars_sold_out.csv", dtype=str)
+    return predict, TrimIndex(sold_out_df)
+
+
+def price_auction_lots(auction_cars_df, predict, trim_index, current_year):
+    # Lots with a start price, their predicted price range and how the final price compares to it
+    auction_cars_df = auction_cars_df.copy()
+    auction_cars_df['Year'] = pd.to_numeric(auction_cars_df['Year'], errors='coerce').astype('int64')
+    numeric_fields = ['Kilometers', 'Start Price', 'Final Price', 'Bid Difference', 'Bid Difference Percentage']
+    for field in numeric_fields:
+        auction_cars_df[field] = pd.to_numeric(auction_cars_df[field], errors='coerce')
+
+    auction_cars_df = auction_cars_df[auction_cars_df['Start Price'] > 0]
+
+    # Calculate Age
+    auction_cars_df['Age'] = current_year - auction_cars_df['Year']
 
-    # Filter sold_out_df for the same make and model
-    relevant_cars = sold_out_df[(sold_out_df['Make'] == make) & (sold_out_df['Model'] == model)]
-    relevant_cars = relevant_cars.dropna(subset=['Trim'])
-    relevant_cars = relevant_cars[relevant_cars['Trim'] != 'None']
-    relevant_cars['Trim'] = relevant_cars['Trim'].astype(str)
+    predicted_prices = get_predicted_prices(auction_cars_df, predict, trim_index)
+    auction_cars_df['Min_Predicted_Price'] = predicted_prices['Min_Predicted_Price']
+    auction_cars_df['Max_Predicted_Price'] = predicted_prices['Max_Predicted_Price']
+    auction_cars_df['Predicted Price'] = (auction_cars_df['Min_Predicted_Price'] +
+                                          auction_cars_df['Max_Predicted_Price']) / 2
 
-    if relevant_cars.empty:
-        return pd.Series({'Min_Predicted_Price': None, 'Max_Predicted_Price': None})
+    # Calculate ratios
+    auction_cars_df['Min_Final_Price_Predicted_Ratio'] = auction_cars_df['Final Price'] / auction_cars_df[
+        'Max_Predicted_Price']
+    auction_cars_df['Max_Final_Price_Predicted_Ratio'] = auction_cars_df['Final Price'] / auction_cars_df[
+        'Min_Predicted_Price']
 
-    # Get unique trims
-    trims = relevant_cars['Trim'].unique()
+    auction_cars_df['Final Price Predicted Ratio'] = auction_cars_df['Final Price'] / auction_cars_df['Predicted Price']
+    return auction_cars_df
 
-    predicted_prices = []
-    for trim in trims:
-        input_data = pd.DataFrame({
-            'Age': [row['Age']],
-            'Kilometers': [row['Kilometers']],
-            'Make': [make],
-            'Model': [model],
-            'Trim': [trim],
-            'Regional Specs': [row['Regional Specs']],
-        })
+def get_predicted_prices(auction_cars_df, predict, trim_index):
+    # Expand each lot to one row per candidate trim of its make/model and score them all at once
+    lot_trims = [trim_index.known_trims_for(make, model)
+                 for make, model in zip(auction_cars_df['Make'], auction_cars_df['Model'])]
+    trim_counts = [len(trims) for trims in lot_trims]
 
-        # Calculate derived features
-        input_data['Age_Kilometers'] = input_data['Age'] * input_data['Kilometers']
-        input_data['Kilometers_per_Year'] = input_data['Kilometers'] / input_data['Age'].replace(0, 1)
+    input_data = auction_cars_df.loc[auction_cars_df.index.repeat(trim_counts),
+                                     ['Age', 'Kilometers', 'Make', 'Model', 'Regional Specs']]
+    input_data['Trim'] = np.concatenate(lot_trims) if sum(trim_counts) else []
 
-        # Make prediction
-        prediction = MODEL.predict(input_data)[0]
-        predicted_prices.append(prediction)
+    # Calculate derived features from the lot's Age
+    FeaturePipeline().transform(input_data)
 
-        print(f"Predicted price for {make} {model} ({trim}): {prediction}")
+    if len(input_data):
+        input_data['Predicted_Price'] = predict(input_data[MODEL_FEATURES]).astype('float64')
+    else:
+        input_data['Predicted_Price'] = pd.Series(dtype='float64')
 
-    return pd.Series({
-        'Min_Predicted_Price': min(predicted_prices),
-        'Max_Predicted_Price': max(predicted_prices)
-    })
+    # Lots whose make/model has no known trims keep empty predictions
+    predicted_prices = input_data.groupby(level=0, sort=False)['Predicted_Price'].agg(['min', 'max'])
+    predicted_prices = predicted_prices.rename(columns={'min': 'Min_Predicted_Price', 'max': 'Max_Predicted_Price'})
+    return predicted_prices.reindex(auction_cars_df.index)
 
 
 def analyze_model_performance():
+    import joblib
+    import matplotlib.pyplot as plt
+    from sklearn.model_selection import train_test_split
+    from sklearn.metrics import mean_squared_error, r2_score
+    from model_registry import MODEL_PATHS
+
     # Load the data
     df = pd.read_csv("D:\data_analysis\cars_data_scraping\data\dubizzle\dubizzle_cars_sold_out.csv")
 
@@ -510,10 +370,8 @@ def analyze_model_performance():
     df_filtered = df_filtered[df_filtered['Steering Side'] == 'Left Hand']
 
     # Feature Engineering
-    df_filtered['Age'] = 2024 - df_filtered['Year']
-    df_filtered['Age_Kilometers'] = df_filtered['Age'] * df_filtered['Kilometers']
-    df_filtered['Kilometers_per_Year'] = df_filtered['Kilometers'] / df_filtered['Age'].replace(0, 1)
-    features = ['Age', 'Kilometers', 'Make', 'Model', 'Trim', 'Regional Specs', 'Age_Kilometers', 'Kilometers_per_Year']
+    FeaturePipeline().transform(df_filtered)
+    features = MODEL_FEATURES
 
     # Drop any rows with missing values
     df_filtered = df_filtered.dropna(subset=features + ['Price'])
@@ -525,7 +383,7 @@ def analyze_model_performance():
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
 
     # Load the model
-    model = joblib.load("./models/['Age', 'Kilometers', 'Make', 'Model', 'Trim', 'Regional Specs', 'Age_Kilometers', 'Kilometers_per_Year']_best_xgb.joblib")
+    model = joblib.load(MODEL_PATHS['monitor'])
 
     print(model)
     # Make predictions
@@ -617,14 +475,55 @@ def send_alert(car):
 # analyze_model_performance()
 # check_auction_cars()
 
-check_new_listings()
-check_sold_cars()
-check_auction_cars()
-
-# Run the check every hour
-schedule.every().hour.do(check_new_listings)
-
-
-while True:
-    schedule.run_pending()
-    time.sleep(1)
\ No newline at end of file
+# Scheduled jobs: name -> (function, seconds between runs, job it runs after); None runs a job only when the schedule
+# starts. The auction job prices lots from the sold-out file the sold job writes, so it waits for that job
+JOBS = {
+    'listings': (check_new_listings, 60 * 60, None),
+    'sold': (check_sold_cars, None, None),
+    'auctions': (check_auction_cars, None, 'sold'),
+}
+
+
+def job_runner(chunk_rows=None):
+    # With chunk_rows the jobs stream their feeds in chunks of that many rows instead of loading them whole
+    from job_runner import JobRunner
+
+    runner = JobRunner()
+    for name, (func, interval, after) in JOBS.items():
+        runner.add(name, partial(func, chunk_rows=chunk_rows) if chunk_rows else func, interval, after)
+    return runner
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Refresh the car_data files once or on a schedule")
+    parser.add_argument('--chunk-rows', type=int, metavar='rows',
+                        help="stream the raw feeds in chunks of this many rows to bound memory use (the Emirates "
+                             "Auction update log is still held at one or two rows per lot)")
+    commands = parser.add_subparsers(dest='command', metavar='command')
+    for name, (func, _, _) in JOBS.items():
+        commands.add_parser(name, help=f"run {func.__name__} once")
+    commands.add_parser('all', help="run every job once, independent ones concurrently")
+    commands.add_parser('serve-schedule', help="run the jobs on their schedule until interrupted (the default)")
+    bench = commands.add_parser('bench', help="run benchmarks.py benchmarks")
+    bench.add_argument('names', nargs='*', metavar='name', help="benchmarks to run (default: all)")
+    args = parser.parse_args(argv)
+
+    if args.command == 'bench':
+        import benchmarks
+
+        benchmarks.main(args.names)
+        return 0
+    runner = job_runner(args.chunk_rows)
+    if args.command in (None, 'serve-schedule'):
+        try:
+            runner.serve()
+        except KeyboardInterrupt:
+            runner.stop()
+        return 0
+    results = runner.run_all(None if args.command == 'all' else [args.command])
+    return 0 if all(result.status == 'ok' for result in results) else 1
+
+
+# The listing and auction jobs read their feeds in worker processes, so only run them when started as a script
+if __name__ == '__main__':
+    sys.exit(main())
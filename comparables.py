@@ -0,0 +1,160 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+# Kilometers counted as one year of age difference in a nearest-comparables distance
+KILOMETERS_PER_YEAR = 20000
+# Distance added for a completely different trim, in years
+TRIM_WEIGHT = 1.0
+
+
+def trim_distance(trim, other):
+    """0 for the same trim, 1 for trims without a common word, the share of words not in common in between."""
+    if other is None or pd.isna(other):
+        return 1.0
+    words = set(re.findall(r'[a-z0-9]+', str(trim).lower()))
+    other_words = set(re.findall(r'[a-z0-9]+', str(other).lower()))
+    if words == other_words:
+        return 0.0
+    return 1 - len(words & other_words) / len(words | other_words)
+
+
+class ComparablesIndex:
+    """Listings of one snapshot grouped by (Make, Model, Year), each group sorted by Kilometers.
+
+    A lookup walks outwards from the query's kilometers, so it touches only the rows it returns. Response records
+    are built by format_records once per group, on the group's first lookup.
+
+    nearest ranks the listings of every year of a make and model by
+    |year difference| + |kilometer difference| / kilometers_per_year + trim_weight * trim_distance,
+    scanning only the years and kilometer ranges that can still beat the k-th best distance.
+    """
+
+    def __init__(self, df, format_records):
+        self.frame = df.reset_index(drop=True)
+        self.format_records = format_records
+        self.groups = {}
+        self.years = {}
+        self._records = {}
+
+        keys = self.frame[['Make', 'Model', 'Year']].dropna()
+        kilometers = pd.to_numeric(self.frame['Kilometers'], errors='coerce').to_numpy(dtype='float64')
+        trim_codes, self.trims = pd.factorize(self.frame['Trim']) if 'Trim' in self.frame.columns else (
+            np.full(len(self.frame), -1), np.array([]))
+        for key, positions in keys.groupby(['Make', 'Model', 'Year'], sort=False).indices.items():
+            positions = keys.index.to_numpy()[positions]
+            # Ascending kilometers with missing values last, file order among equal values
+            positions = positions[np.argsort(kilometers[positions], kind='stable')]
+            group_kilometers = kilometers[positions]
+            known = int(np.count_nonzero(~np.isnan(group_kilometers)))
+            self.groups[key] = (positions, group_kilometers, known, trim_codes[positions])
+            self.years.setdefault(key[:2], []).append(key[2])
+        # Trim codes that occur per make and model, the only ones a query has to compare its trim with
+        self._model_trims = {}
+        for (make, model), years in self.years.items():
+            codes = np.concatenate([self.groups[(make, model, year)][3] for year in years])
+            self._model_trims[(make, model)] = np.unique(codes[codes >= 0])
+
+    def count(self, make, model, year):
+        group = self.groups.get((make, model, year))
+        return 0 if group is None else len(group[0])
+
+    def records(self, key):
+        if key not in self._records:
+            self._records[key] = self.format_records(self.frame.iloc[self.groups[key][0]])
+        return self._records[key]
+
+    def lookup(self, make, model, year, kilometers, limit):
+        """Return up to limit records of the group, closest in kilometers first."""
+        key = (make, model, year)
+        group = self.groups.get(key)
+        if group is None:
+            return []
+        _, group_kilometers, known, _ = group
+        records = self.records(key)
+
+        if kilometers is None or pd.isna(kilometers):
+            return records[:limit]
+        # Merge outwards from the insertion point; ties go to the lower mileage
+        right = int(np.searchsorted(group_kilometers[:known], kilometers))
+        left = right - 1
+        chosen = []
+        while len(chosen) < limit and (left >= 0 or right < known):
+            take_left = right >= known or (
+                left >= 0 and kilometers - group_kilometers[left] <= group_kilometers[right] - kilometers)
+            if take_left:
+                # Listings with equal kilometers stay in file order on both sides
+                start = int(np.searchsorted(group_kilometers[:known], group_kilometers[left]))
+                chosen.extend(range(start, left + 1))
+                left = start - 1
+            else:
+                chosen.append(right)
+                right += 1
+        # Listings without kilometers come after every listing with them
+        chosen.extend(range(known, min(len(records), known + limit - len(chosen))))
+        return [records[i] for i in chosen[:limit]]
+
+    def trim_penalties(self, make, model, trim, trim_weight):
+        # Distance added per trim code, with the last entry (code -1) for listings without a trim
+        penalties = np.full(len(self.trims) + 1, float(trim_weight))
+        if trim is None or pd.isna(trim) or trim in ('', 'Unknown'):
+            penalties[:] = 0.0
+            return penalties
+        for code in self._model_trims.get((make, model), []):
+            penalties[code] = trim_weight * trim_distance(trim, self.trims[code])
+        return penalties
+
+    def nearest(self, make, model, year, kilometers, trim=None, k=10, kilometers_per_year=KILOMETERS_PER_YEAR,
+                trim_weight=TRIM_WEIGHT):
+        """Return the k listings of make and model closest to (year, kilometers, trim) as (record, distance) pairs.
+
+        Listings without kilometers are left out. A trim of None or 'Unknown' matches every trim.
+        """
+        years = self.years.get((make, model))
+        if years is None or k <= 0 or kilometers is None or pd.isna(kilometers):
+            return []
+        penalties = self.trim_penalties(make, model, trim, trim_weight)
+        years = sorted(years, key=lambda other: (abs(other - year), other))
+
+        def distances(key, start, stop):
+            _, group_kilometers, _, codes = self.groups[key]
+            return (abs(key[2] - year) + np.abs(group_kilometers[start:stop] - kilometers) / kilometers_per_year +
+                    penalties[codes[start:stop]])
+
+        # Any k listings bound the answer; the k closest in kilometers of the closest years are a tight start
+        bound = []
+        for other in years:
+            _, group_kilometers, known, _ = self.groups[(make, model, other)]
+            middle = int(np.searchsorted(group_kilometers[:known], kilometers))
+            bound.extend(distances((make, model, other), max(middle - k, 0), min(middle + k, known)))
+            if len(bound) >= k:
+                break
+        limit = np.partition(bound, k - 1)[k - 1] if len(bound) >= k else np.inf
+        # Slack for the rounding of the kilometer ranges below, so the bounding listings themselves stay in
+        limit += 1e-9 * (1 + limit)
+
+        # Every listing within the bound: years closer than it, and per year the kilometers it leaves room for
+        found = []
+        for rank, other in enumerate(years):
+            room = limit - abs(other - year)
+            if room < 0:
+                break
+            key = (make, model, other)
+            _, group_kilometers, known, _ = self.groups[key]
+            start, stop = 0, known
+            if np.isfinite(room):
+                start = int(np.searchsorted(group_kilometers[:known], kilometers - room * kilometers_per_year, 'left'))
+                stop = int(np.searchsorted(group_kilometers[:known], kilometers + room * kilometers_per_year, 'right'))
+            if start < stop:
+                found.append((distances(key, start, stop), rank, start))
+        if not found:
+            return []
+
+        found_distances = np.concatenate([group_distances for group_distances, _, _ in found])
+        ranks = np.concatenate([np.full(len(group_distances), rank) for group_distances, rank, _ in found])
+        offsets = np.concatenate([np.arange(start, start + len(group_distances))
+                                  for group_distances, _, start in found])
+        # Closest first; ties go to the closer year, then the lower kilometers
+        order = np.lexsort((offsets, ranks, found_distances))[:k]
+        return [(self.records((make, model, years[ranks[i]]))[offsets[i]], float(found_distances[i])) for i in order]
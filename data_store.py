@@ -0,0 +1,315 @@
+import os
+import threading
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+# The text read_csv reads as a missing value by default
+from pandas._libs.parsers import STR_NA_VALUES
+
+
+# Typed layout of the car_data outputs shared by car_price_monitor.py (writer) and app.py (reader)
+LISTING_SCHEMA = {'numeric_fields': ['Kilometers', 'Price'], 'int_fields': ['Year'],
+                  'category_fields': ['Make', 'Model', 'Trim', 'Source']}
+PREDICTED_SCHEMA = {'numeric_fields': ['Kilometers', 'Price', 'Predicted_Price', 'price/expected_price'],
+                    'int_fields': ['Year'], 'category_fields': ['Make', 'Model', 'Trim', 'Source']}
+AUCTION_SCHEMA = {'numeric_fields': ['Kilometers', 'Start Price', 'Final Price', 'Bid Difference',
+                                     'Bid Difference Percentage'],
+                  'int_fields': ['Year'], 'category_fields': ['Make', 'Model', 'Source']}
+
+
+def file_version(path):
+    # (mtime, size) changes whenever car_price_monitor.py replaces a file
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def atomic_write_csv(df, path, **kwargs):
+    # Write next to the target and rename over it so readers never see a half-written file
+    tmp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    try:
+        df.to_csv(tmp_path, **kwargs)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def parquet_path(path):
+    return os.path.splitext(path)[0] + '.parquet'
+
+
+def write_dataset(df, path, numeric_fields=(), int_fields=(), category_fields=()):
+    # The CSV stays the export format; the typed Parquet copy next to it is what the app loads
+    atomic_write_csv(df, path, index=False)
+    if pq is not None:
+        export_typed_parquet(df, path, numeric_fields, int_fields, category_fields)
+
+
+class DatasetWriter:
+    """Writes a dataset chunk by chunk, with the same result as write_dataset on the concatenated chunks.
+
+    Rows are appended to a temporary CSV that replaces path on close(), so readers never see a partial file; the
+    first chunk fixes the columns. The typed Parquet copy is written alongside, one row group per chunk, unless
+    typed_copy is False (a plain CSV export, as atomic_write_csv writes). Leaving a with block on an exception
+    discards the temporary files and keeps the previous dataset.
+    """
+
+    def __init__(self, path, numeric_fields=(), int_fields=(), category_fields=(), columns=None, typed_copy=True):
+        self.path = path
+        self.typed_copy = typed_copy and pq is not None
+        self.schema = {'numeric_fields': numeric_fields, 'int_fields': int_fields, 'category_fields': category_fields}
+        self.columns = columns
+        self.rows = 0
+        self._tmp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+        self._tmp_parquet_path = f"{parquet_path(path)}.tmp-{os.getpid()}-{threading.get_ident()}"
+        self._file = None
+        self._parquet = None
+        # Number fields read back as int64 so far (a single chunk with a missing or fractional value makes the whole
+        # column float64, as it does for read_typed_csv)
+        self._integral = {}
+
+    def write(self, df):
+        if self._file is None:
+            self._file = open(self._tmp_path, 'w', newline='', encoding='utf-8')
+            self.columns = list(df.columns)
+            df.to_csv(self._file, index=False)
+        else:
+            df = df[self.columns]
+            df.to_csv(self._file, index=False, header=False)
+        self.rows += len(df)
+        if self.typed_copy and len(df):
+            self._write_row_group(df)
+
+    def _write_row_group(self, df):
+        typed = typed_frame(df, **self.schema)
+        number_fields = [field for field in list(self.schema['numeric_fields']) + list(self.schema['int_fields'])
+                         if field in typed.columns]
+        if self._parquet is None:
+            category_fields = set(self.schema['category_fields'])
+            # Number fields are stored as float64 until close() knows their type over all chunks
+            arrow_schema = pa.schema([(column, pa.float64() if column in number_fields
+                                       else pa.dictionary(pa.int32(), pa.string()) if column in category_fields
+                                       else pa.string()) for column in typed.columns])
+            self._parquet = pq.ParquetWriter(self._tmp_parquet_path, arrow_schema)
+            self._integral = {field: True for field in number_fields}
+        for field in number_fields:
+            self._integral[field] &= typed[field].dtype == 'int64'
+        typed = typed.astype({field: 'float64' for field in number_fields})
+        self._parquet.write_table(pa.Table.from_pandas(typed, schema=self._parquet.schema, preserve_index=False))
+
+    def _finish_parquet(self):
+        if self._parquet is None:
+            # No rows: typed like the header-only CSV
+            export_typed_parquet(pd.DataFrame(columns=self.columns), self.path, **self.schema)
+            return
+        self._parquet.close()
+        integral = [field for field, is_integral in self._integral.items() if is_integral]
+        if integral:
+            # Rewrite row group by row group with those fields as int64, which needs no text parsing
+            parquet_file = pq.ParquetFile(self._tmp_parquet_path)
+            schema = parquet_file.schema_arrow
+            for field in integral:
+                schema = schema.set(schema.get_field_index(field), pa.field(field, pa.int64()))
+            cast_path = f"{self._tmp_parquet_path}.int"
+            try:
+                with pq.ParquetWriter(cast_path, schema) as writer:
+                    for row_group in range(parquet_file.num_row_groups):
+                        writer.write_table(parquet_file.read_row_group(row_group).cast(schema))
+                os.replace(cast_path, self._tmp_parquet_path)
+            finally:
+                if os.path.exists(cast_path):
+                    os.remove(cast_path)
+        os.replace(self._tmp_parquet_path, parquet_path(self.path))
+
+    def close(self):
+        if self._file is None:
+            # No chunks: a header-only file, as an empty frame gives
+            self.write(pd.DataFrame(columns=self.columns or []))
+        self._file.close()
+        # The CSV is replaced first so the Parquet copy is never older than it
+        os.replace(self._tmp_path, self.path)
+        if self.typed_copy:
+            self._finish_parquet()
+
+    def discard(self):
+        if self._file is not None:
+            self._file.close()
+        if self._parquet is not None:
+            self._parquet.close()
+        for tmp_path in (self._tmp_path, self._tmp_parquet_path):
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+
+def csv_text(values):
+    # A column as read_csv(dtype=str) reads back what to_csv wrote for it: str() of every value, and NaN for missing
+    # values and for text read_csv takes as missing
+    text = values if pd.api.types.infer_dtype(values, skipna=True) == 'string' else values.astype(str)
+    return text.where(values.notna().to_numpy() & ~text.isin(STR_NA_VALUES).to_numpy()).to_numpy(dtype=object)
+
+
+def typed_frame(df, numeric_fields=(), int_fields=(), category_fields=()):
+    # The frame read_typed_csv loads from df.to_csv(index=False), built without writing and parsing the text, with
+    # category_fields as categoricals. Number fields that are already ints keep their values; floats go through
+    # their text, which to_numeric does not always parse back to the same float.
+    number_fields = set(numeric_fields) | set(int_fields)
+    typed = pd.DataFrame({column: df[column].to_numpy()
+                          if column in number_fields and df[column].dtype.kind == 'i' else csv_text(df[column])
+                          for column in df.columns}, columns=list(df.columns))
+    typed = coerce_fields(typed, numeric_fields, int_fields)
+    for field in category_fields:
+        if field in typed.columns:
+            typed[field] = typed[field].astype('category')
+    return typed
+
+
+def export_typed_parquet(df, path, numeric_fields=(), int_fields=(), category_fields=()):
+    # Typed as the CSV written from df reads back, so both formats load to identical frames (missing markers,
+    # number formatting)
+    typed = typed_frame(df, numeric_fields, int_fields, category_fields)
+    tmp_path = f"{parquet_path(path)}.tmp-{os.getpid()}-{threading.get_ident()}"
+    try:
+        typed.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, parquet_path(path))
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class Snapshot:
+    """An immutable, typed view of one dataset file at a given version."""
+
+    def __init__(self, frame, version, unique_key=None):
+        self.frame = frame
+        self.version = version
+        if unique_key is not None and unique_key in frame.columns:
+            self.unique = frame.drop_duplicates(subset=[unique_key], keep='last', ignore_index=True)
+        else:
+            self.unique = frame
+        self._derived = {}
+        # Re-entrant so a derived value may be built from other derived values
+        self._lock = threading.RLock()
+
+    def derived(self, key, build):
+        # Memoize values computed from this snapshot; they are dropped together with it on reload
+        try:
+            return self._derived[key]
+        except KeyError:
+            pass
+        with self._lock:
+            if key not in self._derived:
+                self._derived[key] = build(self)
+            return self._derived[key]
+
+
+class Dataset:
+    def __init__(self, path, loader, unique_key=None, max_read_attempts=3):
+        self.path = path
+        self.loader = loader
+        self.unique_key = unique_key
+        self.max_read_attempts = max_read_attempts
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def source(self):
+        # The typed Parquet copy is used unless it is missing or older than the CSV
+        typed_path = parquet_path(self.path)
+        if pq is not None and os.path.exists(typed_path):
+            if not os.path.exists(self.path) or file_version(typed_path)[0] >= file_version(self.path)[0]:
+                return typed_path
+        return self.path
+
+    def version(self):
+        path = self.source()
+        return (path,) + file_version(path)
+
+    def snapshot(self):
+        version = self.version()
+        current = self._snapshot
+        if current is not None and current.version == version:
+            return current
+
+        with self._lock:
+            current = self._snapshot
+            if current is not None and current.version == self.version():
+                return current
+            self._snapshot = self._load()
+            return self._snapshot
+
+    def _load(self):
+        for _ in range(self.max_read_attempts):
+            before = self.version()
+            frame = self.loader(before[0])
+            # Retry if the file was replaced while it was being parsed
+            if self.version() == before:
+                return Snapshot(frame, before, self.unique_key)
+        raise IOError(f"{self.path} kept changing while it was being read")
+
+
+class DatasetStore:
+    """Process-wide registry of datasets, each reloaded only when its file changes."""
+
+    def __init__(self):
+        self._datasets = {}
+
+    def register(self, name, path, loader, unique_key=None):
+        self._datasets[name] = Dataset(path, loader, unique_key)
+
+    def snapshot(self, name):
+        return self._datasets[name].snapshot()
+
+    def frame(self, name):
+        return self.snapshot(name).frame
+
+    def unique(self, name):
+        return self.snapshot(name).unique
+
+
+def read_typed_csv(path, numeric_fields=(), int_fields=(), dtype=str, columns=None):
+    usecols = None if columns is None else (lambda column: column in columns)
+    return coerce_fields(pd.read_csv(path, dtype=dtype, usecols=usecols), numeric_fields, int_fields)
+
+
+def coerce_fields(df, numeric_fields=(), int_fields=()):
+    for field in list(numeric_fields) + list(int_fields):
+        if field in df.columns:
+            df[field] = pd.to_numeric(df[field], errors='coerce')
+    for field in int_fields:
+        if field in df.columns and df[field].notna().all():
+            df[field] = df[field].astype('int64')
+    return df
+
+
+def read_typed_parquet(path, columns=None):
+    schema = pq.read_schema(path)
+    names = [name for name in schema.names if columns is None or name in columns]
+    # Endpoints group and compare on text columns as plain strings with NaN for missing values, like the CSV;
+    # grouping on categoricals would also report categories that were filtered out. Decoding them as dictionaries
+    # keeps the missing markers in the codes, so the conversion is a single take per column.
+    text_columns = [name for name in names if pa.types.is_string(schema.field(name).type)
+                    or pa.types.is_dictionary(schema.field(name).type)]
+    df = pq.read_table(path, columns=names, read_dictionary=text_columns).to_pandas()
+    for column in text_columns:
+        df[column] = df[column].astype(object)
+    return df
+
+
+def read_typed_dataset(path, numeric_fields=(), int_fields=(), category_fields=(), columns=None):
+    # Loader for Dataset: Parquet copies are already typed, CSV files are parsed and coerced
+    if path.endswith('.parquet'):
+        return read_typed_parquet(path, columns)
+    return read_typed_csv(path, numeric_fields, int_fields, columns=columns)
@@ -0,0 +1,52 @@
+from datetime import datetime
+
+import numpy as np
+
+MODEL_FEATURES = ['Age', 'Kilometers', 'Make', 'Model', 'Trim', 'Regional Specs', 'Age_Kilometers',
+                  'Kilometers_per_Year']
+CATEGORICAL_FEATURES = ['Make', 'Model', 'Trim', 'Regional Specs']
+
+
+class FeaturePipeline:
+    """Derives the price model's features from Year (or an existing Age) and Kilometers, for one record or a frame.
+
+    Age is counted from current_year, or from the running year when it is None. Values match the pandas
+    expressions the model was trained with: Age * Kilometers and Kilometers / Age with an age of 0 counted as 1.
+    """
+
+    features = MODEL_FEATURES
+
+    def __init__(self, current_year=None):
+        self.current_year = current_year
+
+    def reference_year(self):
+        return self.current_year if self.current_year is not None else datetime.now().year
+
+    def derive(self, age, kilometers):
+        """Return (Age_Kilometers, Kilometers_per_Year) for scalars or arrays."""
+        if np.ndim(age) == 0 and np.ndim(kilometers) == 0:
+            return age * kilometers, kilometers / (age if age != 0 else 1)
+        age = np.asarray(age)
+        kilometers = np.asarray(kilometers)
+        return age * kilometers, kilometers / np.where(age == 0, 1, age)
+
+    def row(self, record):
+        """Model features of one record as a dict, without building a DataFrame."""
+        age = self.reference_year() - record['Year'] if 'Year' in record else record['Age']
+        kilometers = record['Kilometers']
+        age_kilometers, kilometers_per_year = self.derive(age, kilometers)
+        features = {'Age': age, 'Kilometers': kilometers}
+        for column in CATEGORICAL_FEATURES:
+            features[column] = str(record[column])
+        features['Age_Kilometers'] = age_kilometers
+        features['Kilometers_per_Year'] = kilometers_per_year
+        return features
+
+    def transform(self, df):
+        """Add Age (from Year when present), Age_Kilometers and Kilometers_per_Year to df in place and return it."""
+        if 'Year' in df.columns:
+            df['Age'] = self.reference_year() - df['Year']
+        age_kilometers, kilometers_per_year = self.derive(df['Age'].to_numpy(), df['Kilometers'].to_numpy())
+        df['Age_Kilometers'] = age_kilometers
+        df['Kilometers_per_Year'] = kilometers_per_year
+        return df
@@ -0,0 +1,337 @@
+import argparse
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+import xgboost
+
+from data_store import file_version
+from features import MODEL_FEATURES
+
+# Version of the encoding table written by export_native_model
+NATIVE_FORMAT = 1
+
+
+class RowPredictor:
+    """Scores feature dicts from FeaturePipeline.row with the fitted price model, without pandas.
+
+    The model must be a Pipeline of a ColumnTransformer (StandardScaler for the numeric features, OneHotEncoder for the
+    categorical ones, with no missing value among its categories) followed by the regressor. Rows are encoded
+    straight into the matrix the transformer would produce, so predictions are bitwise identical to
+    model.predict(preprocess_dataframe(df)):
+    - float64 inputs are rounded to two decimals, as preprocess_dataframe formats them as strings;
+    - categories map to one-hot columns through a precomputed dict, unknown ones to all zeros;
+    - when the transformer emits sparse output, unstored entries (zeros) are passed to the booster as missing.
+    An XGBoost regressor is called through its booster's inplace_predict (BoosterRegressor), skipping the sklearn
+    wrapper; the same encoding can be saved with the booster (export_native_model) and loaded without the pickle.
+    """
+
+    def __init__(self, numeric_columns, mean, scale, categorical_columns, categories, sparse, regressor):
+        self.numeric_columns = numeric_columns
+        self.mean = mean
+        self.scale = scale
+        self.sparse = sparse
+        self.regressor = regressor
+        # (column, first one-hot position, {category: offset}) per categorical feature
+        self.categorical = []
+        offset = len(numeric_columns)
+        for column, values in zip(categorical_columns, categories):
+            self.categorical.append((column, offset, {value: i for i, value in enumerate(values)}))
+            offset += len(values)
+        self.width = offset
+
+    @classmethod
+    def from_model(cls, model):
+        """Build a predictor for model, or return None when its layout is not the one described above."""
+        if not isinstance(model, Pipeline) or len(model.steps) != 2:
+            return None
+        preprocessor, regressor = model.steps[0][1], model.steps[1][1]
+        if not isinstance(preprocessor, ColumnTransformer) or not hasattr(preprocessor, 'transformers_'):
+            return None
+        transformers = [(transformer, columns) for _, transformer, columns in preprocessor.transformers_
+                        if not (transformer == 'drop' or len(columns) == 0)]
+        if len(transformers) != 2:
+            return None
+        (scaler, numeric_columns), (encoder, categorical_columns) = transformers
+        if not isinstance(scaler, StandardScaler) or not isinstance(encoder, OneHotEncoder):
+            return None
+        if encoder.handle_unknown != 'ignore' or encoder.drop is not None or \
+                getattr(encoder, 'infrequent_categories_', None) is not None:
+            return None
+        if has_missing_category(encoder.categories_):
+            return None
+        if isinstance(regressor, xgboost.XGBModel):
+            regressor = BoosterRegressor.from_regressor(regressor)
+        return cls(list(numeric_columns), scaler.mean_ if scaler.with_mean else None,
+                   scaler.scale_ if scaler.with_std else None, list(categorical_columns), encoder.categories_,
+                   preprocessor.sparse_output_, regressor)
+
+    def table(self):
+        """The encoding as plain JSON values, the inverse of from_table."""
+        return {
+            'numeric_columns': self.numeric_columns,
+            'mean': None if self.mean is None else [float(value) for value in self.mean],
+            'scale': None if self.scale is None else [float(value) for value in self.scale],
+            'categorical_columns': [column for column, _, _ in self.categorical],
+            'categories': [list(mapping) for _, _, mapping in self.categorical],
+            'sparse': bool(self.sparse),
+        }
+
+    @classmethod
+    def from_table(cls, table, regressor):
+        return cls(table['numeric_columns'], None if table['mean'] is None else np.array(table['mean']),
+                   None if table['scale'] is None else np.array(table['scale']), table['categorical_columns'],
+                   table['categories'], table['sparse'], regressor)
+
+    def encode(self, rows):
+        absent = np.nan if self.sparse else 0.0
+        matrix = np.full((len(rows), self.width), absent)
+        for position, column in enumerate(self.numeric_columns):
+            values = [row[column] for row in rows]
+            if any(isinstance(value, (float, np.floating)) for value in values):
+                # The column is float64 in a frame, which preprocess_dataframe sends as two-decimal strings
+                values = [float(f"{value:.2f}") if np.isfinite(value) else np.nan for value in values]
+            numbers = np.array(values, dtype='float64')
+            if self.mean is not None:
+                numbers -= self.mean[position]
+            if self.scale is not None:
+                numbers /= self.scale[position]
+            if self.sparse:
+                numbers[numbers == 0] = np.nan
+            matrix[:, position] = numbers
+        for column, offset, mapping in self.categorical:
+            for i, row in enumerate(rows):
+                category = mapping.get(row[column])
+                if category is not None:
+                    matrix[i, offset + category] = 1.0
+        return matrix
+
+    def encode_frame(self, df, round_floats=True):
+        """encode for the feature columns of a DataFrame, column by column instead of row by row.
+
+        round_floats=False encodes float columns as they are, as the pipeline sees a frame that did not go through
+        preprocess_dataframe.
+        """
+        absent = np.nan if self.sparse else 0.0
+        matrix = np.full((len(df), self.width), absent)
+        for position, column in enumerate(self.numeric_columns):
+            values = df[column].to_numpy()
+            if values.dtype.kind == 'f' and round_floats:
+                # Same two-decimal strings as preprocess_dataframe, parsed back
+                finite = np.isfinite(values)
+                numbers = np.full(len(values), np.nan)
+                numbers[finite] = np.char.mod('%.2f', values[finite]).astype('float64')
+            else:
+                numbers = values.astype('float64')
+            if self.mean is not None:
+                numbers -= self.mean[position]
+            if self.scale is not None:
+                numbers /= self.scale[position]
+            if self.sparse:
+                numbers[numbers == 0] = np.nan
+            matrix[:, position] = numbers
+        for column, offset, mapping in self.categorical:
+            codes = pd.Categorical(df[column], categories=list(mapping)).codes
+            known = np.flatnonzero(codes >= 0)
+            matrix[known, offset + codes[known]] = 1.0
+        return matrix
+
+    def predict(self, rows):
+        return self.regressor.predict(self.encode(rows))
+
+    def predict_frame(self, df, round_floats=True, max_cells=4_000_000):
+        # Scored in slices so the dense input matrix stays within max_cells values whatever the frame size
+        step = max(max_cells // self.width, 1)
+        if len(df) <= step:
+            return self.regressor.predict(self.encode_frame(df, round_floats))
+        return np.concatenate([self.regressor.predict(self.encode_frame(df.iloc[start:start + step], round_floats))
+                               for start in range(0, len(df), step)])
+
+
+def has_missing_category(categories):
+    # A missing value seen in training is a category of its own, with a one-hot column the pipeline sets for NaN rows;
+    # the category lookups here cannot match it, so such models are scored through the pipeline
+    return any(pd.isna(value) for values in categories for value in values)
+
+
+class BoosterRegressor:
+    """The trained XGBoost booster loaded from its native model file, predicting like XGBRegressor.predict does."""
+
+    def __init__(self, booster, iteration_range=(0, 0), missing=np.nan):
+        self.booster = booster
+        self.iteration_range = tuple(iteration_range)
+        self.missing = missing
+
+    @classmethod
+    def from_regressor(cls, regressor):
+        # The booster of a fitted XGBRegressor, limited to its best iteration as predict does
+        best_iteration = getattr(regressor, 'best_iteration', None)
+        missing = np.nan if regressor.missing is None else regressor.missing
+        return cls(regressor.get_booster(), (0, best_iteration + 1 if best_iteration is not None else 0), missing)
+
+    def predict(self, matrix):
+        return self.booster.inplace_predict(matrix, iteration_range=self.iteration_range, missing=self.missing)
+
+
+def native_model_paths(model_path):
+    # The booster and its encoding table sit next to the pickled pipeline
+    stem = model_path[:-len('.joblib')] if model_path.endswith('.joblib') else model_path
+    return f"{stem}.booster.ubj", f"{stem}.encoding.json"
+
+
+def export_native_model(model, model_path):
+    """Write the booster of a pickled pipeline as a native XGBoost model plus the encoding table RowPredictor needs."""
+    predictor = RowPredictor.from_model(model)
+    if predictor is None or not isinstance(predictor.regressor, BoosterRegressor):
+        raise ValueError(f"{model_path} is not a pipeline RowPredictor and XGBoost can score")
+    regressor = predictor.regressor
+    table = {
+        'format': NATIVE_FORMAT,
+        'source_version': list(file_version(model_path)),
+        'iteration_range': list(regressor.iteration_range),
+        'missing': None if np.isnan(regressor.missing) else float(regressor.missing),
+        **predictor.table(),
+    }
+    booster_path, table_path = native_model_paths(model_path)
+    regressor.booster.save_model(booster_path)
+    with open(table_path, 'w') as table_file:
+        json.dump(table, table_file)
+    return booster_path, table_path
+
+
+def load_native_model(model_path):
+    """RowPredictor over the native export of model_path, or None when there is none or the pickle is newer."""
+    booster_path, table_path = native_model_paths(model_path)
+    if not os.path.exists(booster_path) or not os.path.exists(table_path):
+        return None
+    with open(table_path) as table_file:
+        table = json.load(table_file)
+    if table.get('format') != NATIVE_FORMAT:
+        return None
+    if os.path.exists(model_path) and list(file_version(model_path)) != table['source_version']:
+        return None
+    if has_missing_category(table['categories']):
+        return None
+    missing = np.nan if table['missing'] is None else table['missing']
+    regressor = BoosterRegressor(xgboost.Booster(model_file=booster_path), table['iteration_range'], missing)
+    return RowPredictor.from_table(table, regressor)
+
+
+class PredictionCache:
+    """Bounded memo of model predictions keyed on the normalized feature tuple of a row.
+
+    Entries are evicted least recently used beyond max_entries and expire ttl seconds after they were stored. Passing
+    a newer version (e.g. the model's generation in the registry) drops every entry; calls still passing an older one
+    are scored without touching the cache. With kilometers_bucket set, rows whose Kilometers fall in the same bucket
+    share a key, so they reuse the first prediction made for that bucket.
+    """
+
+    def __init__(self, max_entries=10000, ttl=3600, kilometers_bucket=None, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.kilometers_bucket = kilometers_bucket
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+
+    def key(self, row):
+        if self.kilometers_bucket:
+            kilometers = row['Kilometers'] // self.kilometers_bucket
+            return (row['Age'], kilometers, row['Make'], row['Model'], row['Trim'], row['Regional Specs'])
+        return tuple(row[feature] for feature in MODEL_FEATURES)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def newer(self, version):
+        return version != self._version and (self._version is None or version is not None and version > self._version)
+
+    def recent_rows(self, limit):
+        """Feature rows of the most recently used entries, most recent first; none when keys are bucketed."""
+        if self.kilometers_bucket:
+            return []
+        with self._lock:
+            keys = list(reversed(self._entries))[:limit]
+        return [dict(zip(MODEL_FEATURES, key)) for key in keys]
+
+    def prime(self, rows, predictions, version):
+        # Store predictions made ahead of a version change, which takes effect now
+        keys = [self.key(row) for row in rows]
+        with self._lock:
+            if self.newer(version):
+                self._entries.clear()
+                self._version = version
+            if version != self._version:
+                return
+            expires = self.clock() + self.ttl
+            for key, prediction in zip(keys, predictions):
+                self._entries[key] = (prediction, expires)
+                self._entries.move_to_end(key)
+            self._evict()
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+    def predict(self, rows, predict, version=None):
+        """Return predictions for rows, calling predict once with the rows that are not cached."""
+        keys = [self.key(row) for row in rows]
+        results = [None] * len(rows)
+        missing = {}
+        with self._lock:
+            if self.newer(version):
+                self._entries.clear()
+                self._version = version
+            stale = version != self._version
+            now = self.clock()
+            for i, key in enumerate([] if stale else keys):
+                entry = self._entries.get(key)
+                if entry is not None and entry[1] > now:
+                    self._entries.move_to_end(key)
+                    results[i] = entry[0]
+                    self.hits += 1
+                else:
+                    missing.setdefault(key, []).append(i)
+                    self.misses += 1
+        if stale:
+            # Scored by a model that has been replaced in the meantime
+            return np.asarray(predict(rows))
+
+        if missing:
+            # The model runs outside the lock; one call scores every distinct missing row
+            predictions = predict([rows[positions[0]] for positions in missing.values()])
+            with self._lock:
+                expires = self.clock() + self.ttl
+                for (key, positions), prediction in zip(missing.items(), predictions):
+                    for i in positions:
+                        results[i] = prediction
+                    if self._version == version:
+                        self._entries[key] = (prediction, expires)
+                        self._entries.move_to_end(key)
+                self._evict()
+        return np.array(results)
+
+
+if __name__ == '__main__':
+    import joblib
+
+    parser = argparse.ArgumentParser(description="Export pickled price models as native XGBoost models")
+    parser.add_argument('model_paths', nargs='+', metavar='model_path')
+    for model_path in parser.parse_args().model_paths:
+        print(f"{model_path} -> {', '.join(export_native_model(joblib.load(model_path), model_path))}")
@@ -0,0 +1,131 @@
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+
+class JobResult:
+    """Outcome of one run of a job: status is 'ok', 'failed' or 'skipped' (the previous run was still going)."""
+
+    def __init__(self, name, status, started_at, duration, error=None):
+        self.name = name
+        self.status = status
+        self.started_at = started_at
+        self.duration = duration
+        self.error = error
+
+    def __str__(self):
+        started = datetime.fromtimestamp(self.started_at).strftime('%Y-%m-%d %H:%M:%S')
+        message = f"[jobs] {self.name} {self.status} (started {started}, {self.duration:.1f} s)"
+        return f"{message}: {self.error}" if self.error else message
+
+
+class Job:
+    def __init__(self, name, func, interval=None, after=None):
+        self.name = name
+        self.func = func
+        # Seconds between starts; None runs the job only when the runner starts
+        self.interval = interval
+        # Name of the job this one depends on: it then runs right after each successful run of that job, on the same
+        # worker, instead of on its own schedule
+        self.after = after
+        self.next_run = None
+        self.last_result = None
+        self._running = threading.Lock()
+
+
+class JobRunner:
+    """Runs named jobs on their own intervals, each on a worker thread so independent jobs overlap.
+
+    A job that is still running when it comes due again is skipped for that slot rather than started twice. Between
+    starts the scheduler sleeps until the next job is due (or stop() is called) instead of polling. Jobs added with
+    after=name depend on that job's output, so they only run once it has succeeded and never alongside it.
+    """
+
+    def __init__(self, max_workers=None, log=print, clock=time.monotonic):
+        self.max_workers = max_workers
+        self.log = log
+        self.clock = clock
+        self.jobs = {}
+        self._stop = threading.Event()
+
+    def add(self, name, func, interval=None, after=None):
+        if after is not None and after not in self.jobs:
+            raise ValueError(f"{name} runs after {after}, which has not been added")
+        self.jobs[name] = Job(name, func, interval, after)
+
+    def run(self, name):
+        """Run a job on the calling thread and return its JobResult."""
+        job = self.jobs[name]
+        started_at = time.time()
+        if not job._running.acquire(blocking=False):
+            result = JobResult(name, 'skipped', started_at, 0.0, "previous run still in progress")
+            self.log(str(result))
+            return result
+        start = time.perf_counter()
+        try:
+            job.func()
+            result = JobResult(name, 'ok', started_at, time.perf_counter() - start)
+        except Exception as e:
+            self.log(traceback.format_exc())
+            result = JobResult(name, 'failed', started_at, time.perf_counter() - start, f"{type(e).__name__}: {e}")
+        finally:
+            job._running.release()
+        job.last_result = result
+        self.log(str(result))
+        return result
+
+    def run_chain(self, name, names=None):
+        """Run a job, then the jobs that run after it (those in names, if given); return every JobResult."""
+        result = self.run(name)
+        results = [result]
+        for job in self.jobs.values():
+            if job.after != name or (names is not None and job.name not in names):
+                continue
+            if result.status == 'ok':
+                results.extend(self.run_chain(job.name, names))
+            else:
+                skipped = JobResult(job.name, 'skipped', time.time(), 0.0, f"{name} did not complete")
+                self.log(str(skipped))
+                results.append(skipped)
+        return results
+
+    def run_all(self, names=None):
+        """Run jobs once and return their results in the given order; only independent jobs run concurrently."""
+        names = list(names or self.jobs)
+        # A job whose dependency is also being run waits for it in that job's chain
+        first = [name for name in names if self.jobs[name].after not in names]
+        with ThreadPoolExecutor(max_workers=self.max_workers or len(first) or 1) as executor:
+            chains = executor.map(lambda name: self.run_chain(name, names), first)
+            results = {result.name: result for chain in chains for result in chain}
+        return [results[name] for name in names]
+
+    def serve(self):
+        """Start every job now, then each again whenever its interval has passed, until stop() is called.
+
+        Jobs added with after are not scheduled themselves; they follow each run of the job they depend on.
+        """
+        self._stop.clear()
+        now = self.clock()
+        scheduled = [job for job in self.jobs.values() if job.after is None]
+        for job in scheduled:
+            job.next_run = now
+        with ThreadPoolExecutor(max_workers=self.max_workers or len(scheduled) or 1) as executor:
+            while not self._stop.is_set():
+                now = self.clock()
+                for job in scheduled:
+                    if job.next_run is None or job.next_run > now:
+                        continue
+                    executor.submit(self.run_chain, job.name)
+                    # The next slot is counted from this one, so a slow run does not shift the schedule
+                    job.next_run = None if job.interval is None else max(job.next_run + job.interval, now)
+                due = [job.next_run for job in scheduled if job.next_run is not None]
+                if not due:
+                    # Only start-only jobs: leaving the pool waits for the ones still running
+                    self.log("[jobs] nothing left to schedule")
+                    break
+                self._stop.wait(max(min(due) - self.clock(), 0))
+
+    def stop(self):
+        self._stop.set()
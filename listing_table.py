@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+
+
+class ListingTable:
+    """Column arrays of one listings snapshot with per-value row indexes for filtering, sorting and paging."""
+
+    EQUALITY_FIELDS = ['Make', 'Model', 'Regional Specs', 'Source', 'Seller Type']
+    RANGE_FIELDS = ['Year', 'Kilometers', 'Price']
+    SORT_FIELDS = ['Make', 'Model', 'Year', 'Kilometers', 'Regional Specs', 'Price', 'Seller Type', 'Posted Datetime',
+                   'Source']
+
+    def __init__(self, df):
+        self.frame = df.reset_index(drop=True)
+        self.size = len(self.frame)
+
+        # Sorted distinct values per field; codes are positions into them, -1 for missing
+        self.values = {}
+        self.codes = {}
+        self.rows = {}
+        for field in self.EQUALITY_FIELDS:
+            codes, values = pd.factorize(self.frame[field], sort=True)
+            self.codes[field] = codes
+            self.values[field] = values
+            # Row positions per value, in table order
+            order = np.argsort(codes, kind='stable')
+            bounds = np.searchsorted(codes[order], np.arange(len(values) + 1))
+            self.rows[field] = {value: order[bounds[i]:bounds[i + 1]] for i, value in enumerate(values)}
+
+        self.numbers = {field: pd.to_numeric(self.frame[field], errors='coerce').to_numpy(dtype='float64')
+                        for field in self.RANGE_FIELDS}
+        # Filters and sorts count a missing number as 0, as the client-side table did
+        self.filled = {field: np.nan_to_num(numbers, nan=0.0) for field, numbers in self.numbers.items()}
+        self._orders = {}
+        self._filter_options = None
+
+    def _sort_key(self, field):
+        if field in self.filled:
+            return self.filled[field]
+        if field == 'Posted Datetime':
+            # Missing and unknown dates sort as the epoch
+            posted = pd.to_datetime(self.frame[field], errors='coerce')
+            return np.where(posted.isna(), 0, posted.values.astype('int64')).astype('float64')
+        codes = self.codes[field].astype('float64')
+        codes[codes < 0] = np.nan
+        return codes
+
+    def order(self, field, descending=False):
+        # Row permutation for a stable sort, missing text values last in both directions; built once per snapshot
+        key = (field, descending)
+        if key not in self._orders:
+            sort_key = self._sort_key(field)
+            self._orders[key] = np.argsort(-sort_key if descending else sort_key, kind='stable')
+        return self._orders[key]
+
+    def select(self, equals=None, ranges=None):
+        """Return a boolean row mask for equality filters {field: value} and ranges {field: (low, high)}."""
+        mask = np.ones(self.size, dtype=bool)
+        for field, value in (equals or {}).items():
+            rows = self.rows[field].get(value)
+            field_mask = np.zeros(self.size, dtype=bool)
+            if rows is not None:
+                field_mask[rows] = True
+            mask &= field_mask
+        for field, (low, high) in (ranges or {}).items():
+            numbers = self.filled[field]
+            if low is not None:
+                mask &= numbers >= low
+            if high is not None:
+                mask &= numbers <= high
+        return mask
+
+    def facets(self, mask, fields=EQUALITY_FIELDS):
+        facets = {}
+        for field in fields:
+            codes = self.codes[field][mask]
+            counts = np.bincount(codes[codes >= 0], minlength=len(self.values[field]))
+            facets[field] = {value: int(count) for value, count in zip(self.values[field], counts) if count}
+        return facets
+
+    def page(self, mask, page, page_size, sort=None, descending=False):
+        if sort is None:
+            positions = np.flatnonzero(mask)
+        else:
+            order = self.order(sort, descending)
+            positions = order[mask[order]]
+        start = (page - 1) * page_size
+        return self.frame.iloc[positions[start:start + page_size]]
+
+    def filter_options(self):
+        # Choices for the filter form: models per make and the distinct values of the other fields
+        if self._filter_options is not None:
+            return self._filter_options
+        models = {}
+        for make, rows in self.rows['Make'].items():
+            make_models = self.codes['Model'][rows]
+            models[make] = [self.values['Model'][code] for code in np.unique(make_models[make_models >= 0])]
+        options = {field: list(self.values[field]) for field in ['Regional Specs', 'Source', 'Seller Type']}
+        options['Model'] = models
+        options['Make'] = list(self.values['Make'])
+        for field in ['Kilometers', 'Price']:
+            numbers = self.numbers[field][~np.isnan(self.numbers[field])]
+            options[field] = {'min': float(numbers.min()) if len(numbers) else None,
+                              'max': float(numbers.max()) if len(numbers) else None}
+        self._filter_options = options
+        return options
@@ -0,0 +1,395 @@
+import math
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Relative error of the price percentiles and median (DDSketch bound): each reported quantile is within 1% of the
+# exact order statistic pandas interpolates from. Counts, histograms and means are exact up to float summation order.
+RELATIVE_ACCURACY = 0.01
+
+STATS_COLUMNS = ['Make', 'Model', 'Year', 'Kilometers', 'Price', 'Regional Specs', 'Seller Type', 'Body Type',
+                 'Fuel Type', 'Transmission Type', 'Source']
+COUNT_FIELDS = ['Make', 'Year', 'Age', 'Regional Specs', 'Seller Type', 'Body Type', 'Fuel Type', 'Transmission Type']
+PAIR_FIELDS = [('Make', 'Model'), ('Source', 'Make')]
+MEAN_GROUPS = [('Make',), ('Make', 'Model'), ('Age',)]
+MEAN_FIELDS = ['Price', 'Kilometers']
+
+PRICE_RANGE_BINS = list(range(0, 500001, 50000)) + [float('inf')]
+PRICE_RANGE_LABELS = [f'{PRICE_RANGE_BINS[i] // 1000}k-{PRICE_RANGE_BINS[i + 1] // 1000}k'
+                      for i in range(len(PRICE_RANGE_BINS) - 1)]
+PRICE_RANGE_LABELS[-1] = '500k+'
+KM_PER_YEAR_BINS = [0, 5000, 10000, 15000, 20000, 25000, 30000, 35000, 40000, 45000, 50000, float('inf')]
+KM_PER_YEAR_LABELS = ['0-5k', '5k-10k', '10k-15k', '15k-20k', '20k-25k', '25k-30k', '30k-35k', '35k-40k', '40k-45k',
+                      '45k-50k', '50k+']
+
+
+class QuantileSketch:
+    """Mergeable quantile sketch over non-negative values using logarithmic buckets (DDSketch).
+
+    Quantiles are within relative_accuracy of the exact values; min and max are exact until a removal empties the
+    extreme values of a bucket, after which they stay within the same bound.
+    """
+
+    def __init__(self, relative_accuracy=RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        # bucket key -> [count, smallest value seen, largest value seen]; zeros go to the -inf bucket
+        self.buckets = {}
+        self.count = 0
+
+    def _keys(self, values):
+        keys = np.full(len(values), -np.inf)
+        positive = values > 0
+        keys[positive] = np.ceil(np.log(values[positive]) / self._log_gamma)
+        return keys
+
+    def add(self, values, weight=1):
+        values = np.asarray(values, dtype='float64')
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return
+        if (values < 0).any():
+            raise ValueError("QuantileSketch only holds non-negative values")
+        grouped = pd.Series(values).groupby(self._keys(values)).agg(['size', 'min', 'max'])
+        for key, size, low, high in grouped.itertuples(name=None):
+            self._update(key, size * weight, low, high)
+        self.count += len(values) * weight
+
+    def remove(self, values):
+        self.add(values, weight=-1)
+
+    def merge(self, other):
+        for key, (count, low, high) in other.buckets.items():
+            self._update(key, count, low, high)
+        self.count += other.count
+
+    def _update(self, key, count, low, high):
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            if count < 0:
+                raise ValueError("Removing values that were never added to the sketch")
+            self.buckets[key] = [count, low, high]
+            return
+        bucket[0] += count
+        if count > 0:
+            bucket[1] = min(bucket[1], low)
+            bucket[2] = max(bucket[2], high)
+        if bucket[0] <= 0:
+            del self.buckets[key]
+
+    def quantile(self, q):
+        """Return the q-quantile with pandas' linear interpolation between neighbouring ranks."""
+        if self.count <= 0:
+            return float('nan')
+        keys = sorted(self.buckets)
+        cumulative = np.cumsum([self.buckets[key][0] for key in keys])
+        position = q * (self.count - 1)
+        lower = math.floor(position)
+        value = self._value_at(lower, keys, cumulative)
+        if position == lower:
+            return value
+        return value + (self._value_at(lower + 1, keys, cumulative) - value) * (position - lower)
+
+    def _value_at(self, rank, keys, cumulative):
+        key = keys[int(np.searchsorted(cumulative, rank, side='right'))]
+        count, low, high = self.buckets[key]
+        if rank == 0:
+            return low
+        if rank == self.count - 1:
+            return high
+        if key == -np.inf:
+            return 0.0
+        return min(max(2 * self.gamma ** key / (self.gamma + 1), low), high)
+
+
+def _histogram(values, bins):
+    # Counts per pd.cut(bins, include_lowest=True) interval; missing and out-of-range values are dropped
+    values = np.asarray(values, dtype='float64')
+    positions = np.searchsorted(bins, values, side='left') - 1
+    positions[values == bins[0]] = 0
+    valid = (positions >= 0) & (positions < len(bins) - 1)
+    return np.bincount(positions[valid], minlength=len(bins) - 1)
+
+
+def _add_counts(target, counts, weight):
+    for key, count in counts.items():
+        total = target.get(key, 0) + int(count) * weight
+        if total:
+            target[key] = total
+        else:
+            del target[key]
+
+
+class MarketStats:
+    """Additive aggregates behind the market-insights endpoints.
+
+    Every statistic is a count, a sum or a sketch, so rows can be added and removed in any order and two instances
+    can be merged. Keys keep first-seen order, which is the order pandas' value_counts breaks ties in.
+    """
+
+    def __init__(self, relative_accuracy=RELATIVE_ACCURACY):
+        self.rows = 0
+        self.counts = {field: {} for field in COUNT_FIELDS}
+        self.pair_counts = {fields: {} for fields in PAIR_FIELDS}
+        # group key -> [sum, non-missing count, rows]; rows keep all-missing groups that pandas reports as NaN
+        self.sums = {(group, field): {} for group in MEAN_GROUPS for field in MEAN_FIELDS}
+        self.price_ranges = np.zeros(len(PRICE_RANGE_LABELS), dtype='int64')
+        self.km_per_year_ranges = np.zeros(len(KM_PER_YEAR_LABELS), dtype='int64')
+        self.price = QuantileSketch(relative_accuracy)
+        self.price_sum = 0.0
+        self.price_is_integer = False
+
+    def add(self, df, weight=1):
+        """Add (weight=1) or remove (weight=-1) rows prepared by prepare_listing_rows or prepare_sold_out_rows."""
+        if df.empty:
+            return
+        self.rows += len(df) * weight
+        for field in COUNT_FIELDS:
+            values = df[field].astype(int) if field == 'Year' else df[field]
+            _add_counts(self.counts[field], values.value_counts(sort=False), weight)
+        for fields in PAIR_FIELDS:
+            _add_counts(self.pair_counts[fields], df.groupby(list(fields), sort=False).size(), weight)
+        for group in MEAN_GROUPS:
+            grouped = df.groupby(list(group), sort=False)
+            for field in MEAN_FIELDS:
+                target = self.sums[(group, field)]
+                for key, total, count, size in grouped[field].agg(['sum', 'count', 'size']).itertuples(name=None):
+                    entry = target.setdefault(key, [0.0, 0, 0])
+                    entry[0] += total * weight
+                    entry[1] += count * weight
+                    entry[2] += size * weight
+                    if entry[2] <= 0:
+                        del target[key]
+        prices = df['Price'].to_numpy(dtype='float64')
+        self.price_ranges += _histogram(prices[prices <= 500000], PRICE_RANGE_BINS) * weight
+        km_per_year = df['Kilometers'] / df['Age'].replace(0, 1)
+        self.km_per_year_ranges += _histogram(km_per_year, KM_PER_YEAR_BINS) * weight
+        self.price.add(prices, weight)
+        self.price_sum += float(np.nansum(prices)) * weight
+
+    def remove(self, df):
+        self.add(df, weight=-1)
+
+    def merge(self, other):
+        self.rows += other.rows
+        for field in COUNT_FIELDS:
+            _add_counts(self.counts[field], other.counts[field], 1)
+        for fields in PAIR_FIELDS:
+            _add_counts(self.pair_counts[fields], other.pair_counts[fields], 1)
+        for key, groups in other.sums.items():
+            target = self.sums[key]
+            for group_key, (total, count, size) in groups.items():
+                entry = target.setdefault(group_key, [0.0, 0, 0])
+                entry[0] += total
+                entry[1] += count
+                entry[2] += size
+        self.price_ranges += other.price_ranges
+        self.km_per_year_ranges += other.km_per_year_ranges
+        self.price.merge(other.price)
+        self.price_sum += other.price_sum
+
+    def value_counts(self, field):
+        """Series shaped like df[field].value_counts()."""
+        return pd.Series(self.counts[field], dtype='int64').sort_values(ascending=False)
+
+    def means(self, group, field):
+        """Series shaped like df.groupby(list(group))[field].mean()."""
+        entries = self.sums[(group, field)]
+        keys = sorted(entries)
+        values = [entries[key][0] / entries[key][1] if entries[key][1] else np.nan for key in keys]
+        if len(group) > 1:
+            index = pd.MultiIndex.from_tuples(keys, names=list(group))
+        else:
+            index = pd.Index(keys, name=group[0])
+        return pd.Series(values, index=index, dtype='float64', name=field)
+
+    def make_model_distribution(self):
+        models = {}
+        for (make, model), count in self.pair_counts[('Make', 'Model')].items():
+            models.setdefault(make, {})[model] = count
+        return {make: {'total': self.counts['Make'][make],
+                       'models': pd.Series(models.get(make, {}), dtype='int64').sort_values(ascending=False).to_dict()}
+                for make in sorted(self.counts['Make'])}
+
+    def source_make_counts(self):
+        """DataFrame shaped like df.groupby('Source')['Make'].value_counts().unstack(fill_value=0)."""
+        counts = self.pair_counts[('Source', 'Make')]
+        if not counts:
+            return pd.DataFrame(dtype='int64')
+        index = pd.MultiIndex.from_tuples(sorted(counts), names=['Source', 'Make'])
+        return pd.Series([counts[key] for key in index], index=index, dtype='int64').unstack(fill_value=0)
+
+    def price_min(self):
+        return self.price.quantile(0)
+
+    def price_max(self):
+        return self.price.quantile(1)
+
+    def price_mean(self):
+        return self.price_sum / self.price.count if self.price.count else float('nan')
+
+    def price_quantiles(self, quantiles):
+        return pd.Series([self.price.quantile(q) for q in quantiles], index=quantiles, dtype='float64')
+
+    def price_range_distribution(self):
+        return dict(zip(PRICE_RANGE_LABELS, self.price_ranges.tolist()))
+
+    def km_per_year_distribution(self):
+        return dict(zip(KM_PER_YEAR_LABELS, self.km_per_year_ranges.tolist()))
+
+
+def prepare_listing_rows(df, current_year):
+    df = df[df['Price'] > 0]
+    df = df.assign(Age=(current_year - df['Year']).astype(int))
+    df = df[df['Age'] >= 0]
+    return df[df['Year'] >= 1990]
+
+
+def prepare_sold_out_rows(df, current_year):
+    df = df[df['Price'] >= 0]
+    df = df[df['Year'] >= 1990]
+    df = df.assign(Age=(current_year - df['Year']).astype(int))
+    return df[df['Age'] >= 0]
+
+
+def _named_top(series, limit=10):
+    return {f"{make} {model}": value for (make, model), value in series.sort_values(ascending=False).head(limit).items()}
+
+
+def _price(stats, value):
+    return int(value) if stats.price_is_integer else value
+
+
+def listing_analysis(stats):
+    seller_types = stats.value_counts('Seller Type')
+    analysis = {
+        "top_makes": stats.value_counts('Make').sort_values(ascending=False).head(10).to_dict(),
+        "avg_price_by_make": stats.means(('Make',), 'Price').sort_values(ascending=False).head(10).to_dict(),
+        "avg_kilometers_by_make": stats.means(('Make',), 'Kilometers').sort_values(ascending=False).head(
+            10).to_dict(),
+        "price_distribution": {
+            "min": _price(stats, stats.price_min()),
+            "max": _price(stats, stats.price_max()),
+            "mean": stats.price_mean(),
+            "median": stats.price.quantile(0.5),
+            "percentiles": stats.price_quantiles([0.25, 0.5, 0.75]).to_dict()
+        },
+        "year_distribution": stats.value_counts('Year').sort_index().to_dict(),
+        "regional_specs_distribution": stats.value_counts('Regional Specs').sort_values(ascending=False).to_dict(),
+        "seller_type_distribution": seller_types[seller_types.index != 'Unknown'].sort_values(
+            ascending=False).to_dict(),
+        "body_type_distribution": stats.value_counts('Body Type').sort_values(ascending=False).head(10).to_dict(),
+        "fuel_type_distribution": stats.value_counts('Fuel Type').sort_values(ascending=False).to_dict(),
+        "transmission_type_distribution": stats.value_counts('Transmission Type').sort_values(
+            ascending=False).to_dict(),
+        "age_distribution": stats.value_counts('Age').sort_index().to_dict(),
+        "price_by_age": stats.means(('Age',), 'Price').sort_index().to_dict(),
+        "kilometers_by_age": stats.means(('Age',), 'Kilometers').sort_index().to_dict(),
+        "make_model_distribution": stats.make_model_distribution(),
+        "top_make_model_by_avg_price": _named_top(stats.means(('Make', 'Model'), 'Price')),
+        "top_make_model_by_avg_kilometers": _named_top(stats.means(('Make', 'Model'), 'Kilometers')),
+        "avg_price_by_age": stats.means(('Age',), 'Price').sort_index().to_dict(),
+        "price_range_distribution": stats.price_range_distribution(),
+        "km_per_year_distribution": stats.km_per_year_distribution(),
+        "grouped_top_makes": stats.source_make_counts().head(10).to_dict()
+    }
+    return analysis
+
+
+def sold_out_analysis(stats):
+    seller_types = stats.value_counts('Seller Type')
+    analysis = {
+        "top_makes": stats.value_counts('Make').sort_values(ascending=False).head(10).to_dict(),
+        "avg_price_by_make": stats.means(('Make',), 'Price').round().astype(int).sort_values(ascending=False).head(
+            10).to_dict(),
+        "avg_kilometers_by_make": stats.means(('Make',), 'Kilometers').round().astype(int).sort_values(
+            ascending=False).head(10).to_dict(),
+        "price_distribution": {
+            "min": int(stats.price_min()),
+            "max": int(stats.price_max()),
+            "mean": int(stats.price_mean()),
+            "median": int(stats.price.quantile(0.5)),
+            "percentiles": stats.price_quantiles([0.25, 0.5, 0.75]).round().astype(int).to_dict()
+        },
+        "year_distribution": stats.value_counts('Year').sort_index().to_dict(),
+        "regional_specs_distribution": stats.value_counts('Regional Specs').sort_values(ascending=False).to_dict(),
+        "seller_type_distribution": seller_types[seller_types.index != 'Unknown'].sort_values(
+            ascending=False).to_dict(),
+        "body_type_distribution": stats.value_counts('Body Type').sort_values(ascending=False).head(10).to_dict(),
+        "fuel_type_distribution": stats.value_counts('Fuel Type').sort_values(ascending=False).to_dict(),
+        "transmission_type_distribution": stats.value_counts('Transmission Type').sort_values(
+            ascending=False).to_dict(),
+        "age_distribution": stats.value_counts('Age').sort_index().to_dict(),
+        "price_by_age": stats.means(('Age',), 'Price').sort_index().to_dict(),
+        "kilometers_by_age": stats.means(('Age',), 'Kilometers').sort_index().to_dict(),
+        "make_model_distribution": stats.make_model_distribution(),
+        "top_make_model_by_avg_price": _named_top(stats.means(('Make', 'Model'), 'Price').round().astype(int)),
+        "top_make_model_by_avg_kilometers": _named_top(
+            stats.means(('Make', 'Model'), 'Kilometers').round().astype(int)),
+        "avg_price_by_age": stats.means(('Age',), 'Price').sort_index().to_dict(),
+        "price_range_distribution": stats.price_range_distribution(),
+        "km_per_year_distribution": stats.km_per_year_distribution()
+    }
+    return analysis
+
+
+class IncrementalMarketStats:
+    """MarketStats for successive versions of one dataset, updated from the rows that changed between versions.
+
+    Rows must be unique on key. Each row is hashed with its key and STATS_COLUMNS; rows whose hash disappeared are
+    removed and rows with a new hash are added, so an edited row is one removal plus one addition. A new calendar
+    year moves every row's age, so it triggers a full rebuild.
+    """
+
+    def __init__(self, prepare, key='id', relative_accuracy=RELATIVE_ACCURACY):
+        self.prepare = prepare
+        self.key = key
+        self.relative_accuracy = relative_accuracy
+        self._lock = threading.Lock()
+        self._frame = None
+        self._hashes = None
+        self._year = None
+        self._stats = None
+
+    def _row_hashes(self, df):
+        # Column hashes folded per row; the mostly distinct keys are hashed directly, the other columns via their
+        # distinct values
+        hashes = pd.util.hash_array(df[self.key].to_numpy(), categorize=False)
+        for column in STATS_COLUMNS:
+            if column in df.columns:
+                hashes = hashes * np.uint64(1000003) ^ pd.util.hash_array(df[column].to_numpy())
+        return hashes
+
+    def _rows(self, df, mask):
+        # Only the stats columns of the selected rows; avoids copying whole wide frames for a small delta
+        positions = np.flatnonzero(mask)
+        columns = [column for column in STATS_COLUMNS if column in df.columns]
+        return pd.DataFrame({column: df[column].to_numpy()[positions] for column in columns})
+
+    def update(self, df, current_year, summarize):
+        """Bring the aggregates to df's version and return summarize(stats).
+
+        summarize runs under the same lock, since the next update (another snapshot, or a year rollover) changes the
+        stats in place.
+        """
+        with self._lock:
+            hashes = self._row_hashes(df)
+            try:
+                if self._stats is None or self._year != current_year:
+                    stats = MarketStats(self.relative_accuracy)
+                    stats.add(self.prepare(df, current_year))
+                else:
+                    stats = self._stats
+                    removed = ~pd.Index(self._hashes).isin(hashes)
+                    added = ~pd.Index(hashes).isin(self._hashes)
+                    stats.remove(self.prepare(self._rows(self._frame, removed), current_year))
+                    stats.add(self.prepare(self._rows(df, added), current_year))
+            except Exception:
+                # A half-applied delta would poison every later version
+                self._stats = None
+                raise
+            stats.price_is_integer = pd.api.types.is_integer_dtype(df['Price'])
+            self._stats, self._frame, self._hashes, self._year = stats, df, hashes, current_year
+            return summarize(stats)
@@ -0,0 +1,160 @@
+import hashlib
+import os
+import threading
+import time
+
+import joblib
+
+from data_store import file_version
+from inference import RowPredictor, load_native_model, native_model_paths
+
+# Model file per role, named after the features they were trained on: the app values cars with the retrained model,
+# car_price_monitor.py scores listings and auction lots with the original one
+MODEL_PATHS = {
+    'valuation': "./models/['Age', 'Kilometers', 'Make', 'Model', 'Trim', 'Regional Specs', 'Age_Kilometers', "
+                 "'Kilometers_per_Year']_best_xgb_new.joblib",
+    'monitor': "./models/['Age', 'Kilometers', 'Make', 'Model', 'Trim', 'Regional Specs', 'Age_Kilometers', "
+               "'Kilometers_per_Year']_best_xgb.joblib",
+}
+
+
+def artifact_version(path):
+    # (path, mtime, size) of every file a model is loaded from: the pickle and its native export
+    return tuple((artifact,) + file_version(artifact)
+                 for artifact in (path,) + native_model_paths(path) if os.path.exists(artifact))
+
+
+def content_version(path):
+    # Short content hash, equal for copies of the same file; the booster stands in when only the export is deployed
+    if not os.path.exists(path):
+        path = native_model_paths(path)[0]
+    digest = hashlib.sha256()
+    with open(path, 'rb') as model_file:
+        for block in iter(lambda: model_file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+class LoadedModel:
+    """One load of a model: its RowPredictor (None for layouts it does not cover), the pickled pipeline when the native
+    export was not used, and the version its predictions are tagged with."""
+
+    def __init__(self, name, path, source_version, version, generation, predictor, pipeline):
+        self.name = name
+        self.path = path
+        self.source_version = source_version
+        self.version = version
+        # Increases with every load in this process
+        self.generation = generation
+        self.predictor = predictor
+        self.pipeline = pipeline
+        self.loaded_at = time.time()
+
+    def info(self):
+        return {'name': self.name, 'version': self.version, 'generation': self.generation,
+                'native': self.pipeline is None, 'loaded_at': self.loaded_at}
+
+
+class ModelSlot:
+    def __init__(self, name, path, warm_up=None, background=True, log=print, max_read_attempts=3):
+        self.name = name
+        self.path = path
+        self.warm_up = warm_up
+        self.background = background
+        self.log = log
+        self.max_read_attempts = max_read_attempts
+        self._current = None
+        self._generation = 0
+        self._failed_version = None
+        self._reloading = False
+        self._lock = threading.Lock()
+
+    def changed(self):
+        try:
+            version = artifact_version(self.path)
+        except OSError:
+            return False
+        return version != self._current.source_version and version != self._failed_version
+
+    def current(self):
+        current = self._current
+        if current is None:
+            return self.reload()
+        if self.changed():
+            if not self.background:
+                return self.reload()
+            if not self._reloading:
+                # Requests keep the current model until the new one is loaded and warmed up
+                self._reloading = True
+                threading.Thread(target=self._reload_in_background, daemon=True).start()
+        return current
+
+    def _reload_in_background(self):
+        try:
+            self.reload()
+        except Exception as e:
+            self.log(f"Error reloading model {self.name}: {e}")
+        finally:
+            self._reloading = False
+
+    def reload(self, force=False):
+        with self._lock:
+            current = self._current
+            if current is not None and not force and artifact_version(self.path) == current.source_version:
+                return current
+            try:
+                loaded = self._load()
+                if self.warm_up is not None:
+                    self.warm_up(loaded)
+            except Exception:
+                # A broken file is not retried until it changes again; the current model stays live
+                self._failed_version = artifact_version(self.path)
+                raise
+            # A single reference assignment: every request sees either the old model or the warmed-up new one
+            self._current = loaded
+            self._failed_version = None
+            self.log(f"Model {self.name} version {loaded.version} is live")
+            return loaded
+
+    def _load(self):
+        for _ in range(self.max_read_attempts):
+            before = artifact_version(self.path)
+            # The native export when it is current, else the pickle
+            predictor = load_native_model(self.path)
+            pipeline = None
+            if predictor is None:
+                pipeline = joblib.load(self.path)
+                predictor = RowPredictor.from_model(pipeline)
+            version = content_version(self.path)
+            # Retry if a file was replaced while it was being read
+            if artifact_version(self.path) == before:
+                self._generation += 1
+                return LoadedModel(self.name, self.path, before, version, self._generation, predictor, pipeline)
+        raise IOError(f"{self.path} kept changing while it was being read")
+
+
+class ModelRegistry:
+    """Process-wide registry of models by role, each swapped for a warmed-up reload when its files change.
+
+    With background=True a changed file is loaded and warmed up on a separate thread while requests keep using the
+    current model, which is then replaced in one step; reload() does the same synchronously (e.g. from an admin call).
+    Every process (gunicorn worker) has its own registry, so a swap reaches the others through the file change.
+    """
+
+    def __init__(self, background=True, log=print):
+        self.background = background
+        self.log = log
+        self._slots = {}
+
+    def register(self, name, path=None, warm_up=None):
+        self._slots[name] = ModelSlot(name, path or MODEL_PATHS[name], warm_up, self.background, self.log)
+
+    def current(self, name):
+        return self._slots[name].current()
+
+    def reload(self, name, force=False):
+        return self._slots[name].reload(force)
+
+    def info(self):
+        return {name: slot._current.info() if slot._current is not None else None
+                for name, slot in self._slots.items()}
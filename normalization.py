@@ -0,0 +1,141 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+
+
+def map_distinct(values, func):
+    # Apply a Python string function once per distinct value and broadcast the results back
+    codes, uniques = pd.factorize(values)
+    mapped = np.array([func(value) for value in uniques] + [np.nan], dtype=object)
+    return mapped[codes]
+
+
+def normalize_values(values, replacements):
+    """Apply an ordered chain of str.replace rules to a column, evaluating the chain once per distinct value.
+
+    The rules keep str.replace semantics (including their order), so the result equals the chained calls on the
+    whole column. Missing values are passed through unchanged.
+    """
+    codes, uniques = pd.factorize(values)
+    canonical = pd.Series(uniques, dtype=object)
+    for old, new in replacements:
+        canonical = canonical.str.replace(old, new)
+
+    normalized = canonical.to_numpy(dtype=object)[codes]
+    missing = codes == -1
+    if missing.any():
+        normalized[missing] = np.asarray(values, dtype=object)[missing]
+    return pd.Series(normalized, index=values.index, name=values.name)
+
+
+def _resolve_slug(tokens, slugs, counts):
+    # Replay the title scan for one slug per row over its title tokens, laid out row after row.
+    # Returns the resolved slug per row (None where it is unchanged) and the tokens the slug consumed.
+    #
+    # The scan, for each token of a row in turn (normalize_carswitch_names runs it for the make, then for the model
+    # over the tokens the make did not consume):
+    #   1. if slug == token.lower(): slug = token                    (the token is consumed)
+    #   2. elif '-' in slug: slug = slug.replace('-', ' ').title()   (the token is consumed)
+    #   3. else the token is left for the next field
+    # Once step 1 takes a token in another casing, or step 2 runs, the slug is no longer a lower-case slug and can
+    # only change again through step 2, i.e. when it still has a hyphen. The masks below find, per row, the token
+    # where that happens instead of walking the tokens. Arrays are per token; position is the index within its row.
+    starts = np.cumsum(counts) - counts
+    has_tokens = counts > 0
+    position = np.arange(len(tokens)) - np.repeat(starts, counts)
+    count = np.repeat(counts, counts)
+
+    token_slugs = np.repeat(slugs, counts)
+    # Step 1 applies to the token (while the slug is unchanged); exact tokens leave the slug as it is
+    matches = map_distinct(tokens, str.lower) == token_slugs
+    exact = tokens == token_slugs
+    # Step 2 can apply (NaN slugs compare False)
+    hyphenated = np.repeat(map_distinct(slugs, lambda slug: isinstance(slug, str) and '-' in slug), counts) == True
+
+    def first(mask, offset=0):
+        # Per token, the row's first position where mask holds, plus offset; inf when it never does
+        first_position = np.full(len(counts), np.inf)
+        first_position[has_tokens] = np.minimum.reduceat(np.where(mask, position + offset, np.inf), starts[has_tokens])
+        return np.repeat(first_position, counts)
+
+    # Hyphenated slug: exact tokens keep it a slug. Step 2 runs on the first token that does not match, or on the
+    # token right after the first match in another casing (that token's casing kept the hyphen). Either way the
+    # scan ends at run_end, after consuming every token up to it; with no such token (run_end >= count) it
+    # consumes them all and the slug is the last token.
+    run_end = np.minimum(first(~matches), first(~exact, 1))
+    title_cased = hyphenated & (run_end < count)
+    # Plain slug: step 1 consumes matching tokens (step 3 skips the others) up to and including the first match in
+    # another casing, which becomes the slug; later tokens can no longer match it
+    cased_match = first(matches & ~exact)
+    consumed = np.where(hyphenated, position <= run_end, matches & (position <= cased_match))
+
+    # One token per resolved row carries its value: any token (position 0) for a title-cased slug, else the token
+    # that replaced the slug. Rows where no token does keep None.
+    resolved_at = np.where(hyphenated, np.where(title_cased, position == 0, position == count - 1),
+                           position == cased_match)
+    title_cased_slugs = np.repeat(map_distinct(slugs, lambda slug: slug.replace('-', ' ').title()
+                                               if isinstance(slug, str) else slug), counts)
+    resolved = np.full(len(counts), None, dtype=object)
+    resolved[np.repeat(np.arange(len(counts)), counts)[resolved_at]] = np.where(title_cased, title_cased_slugs,
+                                                                                  tokens)[resolved_at]
+    return resolved, consumed
+
+
+def normalize_carswitch_names(makes, models, titles):
+    """Restore Carswitch make/model casing from the listing title in one vectorized pass.
+
+    Carswitch slugs are lower-case and hyphenated ('land-rover', 'range-rover'). Title tokens are matched
+    against the make first and the remaining tokens against the model, with the same outcome as the
+    original token-by-token loop: a matching token replaces the slug with its own casing, and a hyphenated
+    slug is title-cased with spaces as soon as a token does not match it.
+    """
+    title_tokens = [title.split() if isinstance(title, str) else [] for title in titles]
+    counts = np.fromiter((len(row_tokens) for row_tokens in title_tokens), dtype=np.int64, count=len(title_tokens))
+    tokens = np.fromiter(itertools.chain.from_iterable(title_tokens), dtype=object, count=counts.sum())
+
+    make_values = makes.to_numpy(dtype=object, copy=True)
+    resolved_makes, consumed = _resolve_slug(tokens, make_values, counts)
+    make_values = np.where(resolved_makes != None, resolved_makes, make_values)
+
+    # Tokens taken by the make are not seen by the model
+    model_counts = np.bincount(np.repeat(np.arange(len(counts)), counts)[~consumed], minlength=len(counts))
+    model_values = models.to_numpy(dtype=object, copy=True)
+    resolved_models, _ = _resolve_slug(tokens[~consumed], model_values, model_counts)
+    model_values = np.where(resolved_models != None, resolved_models, model_values)
+
+    return (pd.Series(make_values, index=makes.index, name=makes.name),
+            pd.Series(model_values, index=models.index, name=models.name))
+
+
+def parse_carswitch_kilometers(kilometers):
+    """Convert Carswitch mileage strings ('12,000 KM', '8,000 Miles') to kilometers.
+
+    Miles are multiplied by 1.6, an empty value next to a unit becomes None, a bare 'KM' becomes 0 and text
+    without a unit is left as it is.
+    """
+    is_text = kilometers.map(lambda value: isinstance(value, str)).to_numpy(dtype=bool)
+    if not is_text.any():
+        return kilometers.copy()
+
+    text = kilometers[is_text].astype(str)
+    value = (text.str.split().str[0].str.replace(',', '', regex=False).str.replace('KM', '', regex=False)
+             .str.replace('Miles', '', regex=False).str.strip())
+    is_bare_km = value == 'KM'
+    in_miles = ~is_bare_km & text.str.contains('Miles', regex=False)
+    in_km = ~is_bare_km & ~in_miles & text.str.contains('KM', regex=False)
+    is_empty = value == ''
+    number = pd.to_numeric(value.where(~is_empty & (in_miles | in_km)), errors='coerce')
+
+    parsed = np.full(len(text), None, dtype=object)
+    miles_values = (in_miles & ~is_empty).to_numpy()
+    parsed[miles_values] = (number[miles_values] * 1.6).tolist()
+    km_values = (in_km & number.notna()).to_numpy()
+    parsed[km_values] = number[km_values].astype('int64').tolist()
+    parsed[is_bare_km.to_numpy()] = 0
+    unchanged = (~(in_miles | in_km | is_bare_km)).to_numpy()
+    parsed[unchanged] = text[unchanged].tolist()
+
+    values = kilometers.to_numpy(dtype=object, copy=True)
+    values[is_text] = parsed
+    return pd.Series(values, index=kilometers.index, name=kilometers.name)
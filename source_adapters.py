@@ -0,0 +1,548 @@
+import ast
+import json
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from normalization import normalize_carswitch_names, normalize_values, parse_carswitch_kilometers
+
+
+LISTING_COLUMNS = ['id', 'Make', 'Model', 'Year', 'Kilometers', 'Trim', 'Regional Specs', 'Price', 'Seller Type',
+                   'Posted Datetime', 'Source', 'permalink', 'No of Doors', 'Body Type', 'Fuel Type', 'Interior Color',
+                   'Exterior Color', 'Transmission Type', 'Steering Side', 'Seating Capacity']
+
+AUCTION_COLUMNS = ['Id', 'Make', 'Model', 'Year', 'Kilometers', 'Regional Specs', 'Transmission', 'Body Type',
+                   'Engine Type', 'Cylinders', 'Fuel Type', 'Interior Color', 'Exterior Color', 'Seating Capacity',
+                   'No of Doors', 'Primary Damage', 'Secondary Damage', 'Auction Date', 'Start Price', 'Final Price',
+                   'Bid Difference', 'Bid Difference Percentage', 'Participation Count', 'Source']
+
+
+# Rows per chunk when a raw file is streamed to keep only some of its rows
+DETAILS_CHUNK_ROWS = 50_000
+# Fields of a Marhaba 'sold' payload the auction columns are built from
+MARHABA_SOLD_FIELDS = ['bid_amount', 'auction_date']
+
+
+def bid_difference_percentage(df):
+    percentage = ((df['Bid Difference'] / df['Start Price']) * 100).round(2)
+    return percentage.replace([np.inf, -np.inf], np.nan)
+
+
+class SourceAdapter:
+    """Declarative description of how one scraped feed is turned into the shared column layout.
+
+    normalize() renames columns, sets constant columns, applies the ordered value maps (str.replace rules per
+    column, evaluated once per distinct value) and then the derived fields in order. A derived field is (column or
+    list of columns, function of the frame), so later fields can build on earlier ones. Feeds that need more than a
+    deduplicated CSV read pass their own reader, and a chunk_reader when they can be streamed.
+    """
+
+    def __init__(self, name, id_column, columns, files=(), source=None, reader=None, chunk_reader=None, drop_ids=(),
+                 rename=None, constants=None, value_maps=None, derived=()):
+        self.name = name
+        self.source = source or name
+        self.id_column = id_column
+        self.columns = columns
+        self.files = list(files)
+        self.reader = reader
+        self.chunk_reader = chunk_reader
+        self.drop_ids = list(drop_ids)
+        self.rename = rename or {}
+        self.constants = constants or {}
+        self.value_maps = value_maps or {}
+        self.derived = list(derived)
+
+    def read(self):
+        if self.reader is not None:
+            return self.reader(self)
+        df = pd.concat([pd.read_csv(path, dtype=str) for path in self.files], ignore_index=True)
+        df = df.drop_duplicates(subset=[self.id_column], keep='last', ignore_index=True)
+        if self.drop_ids:
+            df = df[~df[self.id_column].isin(self.drop_ids)]
+        return df.dropna(subset=[self.id_column])
+
+    def read_chunks(self, chunk_rows):
+        """The rows of read(), in the same order, as frames of at most chunk_rows rows.
+
+        Feeds with a custom reader but no chunk_reader (Telegram) are still read whole and then sliced.
+        """
+        if self.reader is None:
+            yield from read_deduplicated_chunks(self.files, self.id_column, chunk_rows, self.drop_ids)
+            return
+        if self.chunk_reader is not None:
+            yield from self.chunk_reader(self, chunk_rows)
+            return
+        # Custom readers join or reshape whole files
+        df = self.reader(self)
+        for start in range(0, len(df), chunk_rows):
+            yield df.iloc[start:start + chunk_rows]
+
+    def normalize(self, df):
+        df = df.rename(columns=self.rename)
+        for column, value in self.constants.items():
+            df[column] = value
+        for column, replacements in self.value_maps.items():
+            df[column] = normalize_values(df[column], replacements)
+        for columns, derive in self.derived:
+            if isinstance(columns, str):
+                df[columns] = derive(df)
+            else:
+                values = derive(df)
+                for column, column_values in zip(columns, values):
+                    df[column] = column_values
+        return df[self.columns]
+
+
+def read_deduplicated_chunks(files, id_column, chunk_rows, drop_ids=()):
+    """Stream CSV files as string frames of at most chunk_rows rows, keeping the last row of every id.
+
+    Gives the rows of the concatenated files after drop_duplicates(keep='last') and without drop_ids and missing ids,
+    in the same order and with the same columns, while holding only the id column and one chunk at a time. Yields
+    at least one (possibly empty) frame.
+    """
+    # First pass over the ids alone: which row is the last of its id
+    file_ids = [pd.read_csv(path, dtype=str, usecols=[id_column])[id_column] for path in files]
+    # The second pass reads only the rows seen here, so rows appended to a feed in between cannot shift the mask
+    file_rows = [len(ids) for ids in file_ids]
+    ids = pd.concat(file_ids, ignore_index=True)
+    keep = (~ids.duplicated(keep='last') & ids.notna() & ~ids.isin(list(drop_ids))).to_numpy()
+    columns = list(pd.concat([pd.read_csv(path, dtype=str, nrows=0) for path in files]).columns)
+    del file_ids, ids
+
+    offset = 0
+    for path, rows in zip(files, file_rows):
+        if not rows:
+            continue
+        for chunk in pd.read_csv(path, dtype=str, chunksize=chunk_rows, nrows=rows):
+            chunk_keep = keep[offset:offset + len(chunk)]
+            offset += len(chunk)
+            if not chunk_keep.any():
+                continue
+            chunk = chunk[chunk_keep]
+            if list(chunk.columns) != columns:
+                # The concatenated frame's column order; columns of the other files are missing values here
+                missing = [column for column in columns if column not in chunk.columns]
+                chunk = chunk.reindex(columns=columns)
+                chunk[missing] = chunk[missing].astype(object)
+            yield chunk
+    if not keep.any():
+        # An empty frame rather than none, so callers can always concatenate
+        yield pd.DataFrame(columns=columns, dtype=object)
+
+
+# Quoted strings and the constants of a Python literal without escapes, the only tokens that differ from JSON
+PYTHON_LITERAL_TOKENS = re.compile(r"""'[^'\\]*'|"[^"\\]*"|\b(?:True|False|None)\b""")
+JSON_CONSTANTS = {'True': 'true', 'False': 'false', 'None': 'null'}
+# Backslashes not starting an escape that means the same in a Python string and in JSON (which joins surrogate pairs)
+NON_JSON_ESCAPE = re.compile(r'\\(?:[^\\ntrbfu]|u(?![0-9a-ce-fA-CE-F][0-9a-fA-F]{3}|[dD][0-7][0-9a-fA-F]{2}))')
+
+
+def json_token(match):
+    token = match.group()
+    if token[0] == "'":
+        return '"' + token[1:-1].replace('"', '\\"') + '"'
+    return JSON_CONSTANTS.get(token, token)
+
+
+def reject_constant(name):
+    # NaN and Infinity are JSON extensions that ast.literal_eval does not accept either
+    raise ValueError(f"unsupported constant {name}")
+
+
+JSON_DECODER = json.JSONDecoder(parse_constant=reject_constant)
+
+
+def parse_literal(text):
+    """ast.literal_eval for the repr() and JSON payloads of the scraped files, through the JSON decoder where possible.
+
+    Escapes that JSON reads differently go straight to ast.literal_eval. Otherwise a literal whose strings are all
+    single-quoted is JSON up to its quotes and True/False/None, so it is translated with plain replacements unless a
+    string contains one of those names (the common case); other literals are translated token by token. Anything the
+    decoder still rejects (tuples, sets, ...) goes through ast.literal_eval.
+    """
+    if '\\' in text and NON_JSON_ESCAPE.search(text):
+        return ast.literal_eval(text)
+    try:
+        if '"' not in text:
+            strings = ''.join(text.split("'")[1::2])
+            if not any(name in strings for name in JSON_CONSTANTS):
+                text_json = text.replace("'", '"')
+                for name, constant in JSON_CONSTANTS.items():
+                    text_json = text_json.replace(name, constant)
+                return JSON_DECODER.decode(text_json)
+        if '\\' in text:
+            return JSON_DECODER.decode(text)
+        return JSON_DECODER.decode(PYTHON_LITERAL_TOKENS.sub(json_token, text))
+    except (TypeError, ValueError):
+        return ast.literal_eval(text)
+
+
+def expand_sold_column(df):
+    """Parse the 'sold' payloads of Marhaba lots and add their fields as columns, as pd.json_normalize would."""
+    df = df.copy()
+    sold = [parse_literal(value) for value in df['sold']]
+    df['sold'] = sold
+    if not all(isinstance(record, dict) and not any(isinstance(value, dict) for value in record.values())
+               for record in sold):
+        # Nested fields or non-object payloads
+        return df.join(pd.json_normalize(df['sold']))
+
+    # Flat records: one column per field in order of first appearance, NaN where a record lacks it
+    fields = dict.fromkeys(field for record in sold for field in record)
+    columns = {field: [record.get(field, np.nan) for record in sold] for field in fields}
+    return df.join(pd.DataFrame(columns, index=df.index))
+
+
+def read_telegram_listings(adapter):
+    telegram_df = pd.read_csv("./car_data/telegram.csv", dtype=str)
+    telegram_df = telegram_df.drop_duplicates(subset=['id'], keep='last', ignore_index=True)
+
+    telegram_cars_df = pd.read_csv("./car_data/telegram_cars_gemini.csv", dtype=str)
+    telegram_cars_df = telegram_cars_df.drop_duplicates(subset=['Id'], keep='last', ignore_index=True)
+    telegram_cars_df = telegram_cars_df.rename(columns={'Id': 'id', 'Mileage': 'Kilometers',
+                                                        'RegionalSpecs': 'Regional Specs', 'Date': 'Posted Datetime'})
+    telegram_cars_df = pd.merge(telegram_cars_df, telegram_df, on='id', how='inner')
+
+    telegram_cars_df = telegram_cars_df.dropna(subset=['Make', 'Model'])
+    telegram_cars_df = telegram_cars_df[telegram_cars_df['SellorBuy'] == 'Sell']
+    two_month_ago = pd.Timestamp.now() - pd.Timedelta(days=60)
+    posted = pd.to_datetime(telegram_cars_df['Posted Datetime'], errors='coerce')
+    telegram_cars_df = telegram_cars_df[posted > two_month_ago]
+    return telegram_cars_df.dropna(subset=['Year', 'Kilometers', 'Price'])
+
+
+def read_marhaba_sold_lots(adapter):
+    # Only sold lots are kept, so the details file is streamed rather than loaded whole
+    chunks = read_deduplicated_chunks(["./car_data/marhaba_auctions_cars_details.csv"], '_id', DETAILS_CHUNK_ROWS)
+    marhaba_sold_cars_df = pd.concat([chunk[chunk['sold'] != '[]'] for chunk in chunks], ignore_index=True)
+    return expand_sold_column(marhaba_sold_cars_df)
+
+
+def read_marhaba_sold_chunks(adapter, chunk_rows):
+    # The sold lots of each chunk of the details file, expanded on their own; payload fields that no lot of a chunk
+    # has are missing values there
+    for chunk in read_deduplicated_chunks(["./car_data/marhaba_auctions_cars_details.csv"], '_id', chunk_rows):
+        chunk = expand_sold_column(chunk[chunk['sold'] != '[]'])
+        for field in MARHABA_SOLD_FIELDS:
+            if field not in chunk.columns:
+                chunk[field] = np.nan
+        yield chunk
+
+
+def reduced_emirates_updates(chunk_rows):
+    # The update log streamed down to the first and last price update of each lot
+    updates_df = pd.read_csv("./car_data/emirates_auction_cars.csv", dtype=str, nrows=0)
+    for chunk in pd.read_csv("./car_data/emirates_auction_cars.csv", dtype=str, chunksize=chunk_rows):
+        updates_df = first_and_last_updates(pd.concat([updates_df, chunk], ignore_index=True))
+    return updates_df
+
+
+def emirates_details(lots, chunk_rows):
+    # The last details row of each of lots, streamed from the details file
+    chunks = read_deduplicated_chunks(["./car_data/emirates_auction_cars_details.csv"], 'Lot', chunk_rows)
+    return pd.concat([chunk[chunk['Lot'].isin(lots)] for chunk in chunks], ignore_index=True)
+
+
+def read_emirates_sold_lots(adapter):
+    # Both files are streamed, keeping only the first and last price update of each lot and the details of those lots
+    updates_df = reduced_emirates_updates(DETAILS_CHUNK_ROWS)
+    details_df = emirates_details(updates_df['Lot'].unique(), DETAILS_CHUNK_ROWS)
+    return emirates_sold_lots(details_df, updates_df)
+
+
+def read_emirates_sold_chunks(adapter, chunk_rows):
+    # No lot is known to be sold before the whole update log is read, so the reduced log (one or two rows per lot)
+    # and the details of the sold lots are held while the sold lots are joined chunk_rows at a time
+    sold_df = emirates_sold_updates(reduced_emirates_updates(chunk_rows))
+    details_df = emirates_details(sold_df['Lot'].unique(), chunk_rows)
+    for start in range(0, len(sold_df) or 1, chunk_rows):
+        yield join_emirates_details(sold_df.iloc[start:start + chunk_rows], details_df)
+
+
+def auction_days(values, unit=None):
+    # Calendar days as datetime64[D], NaT where a value is missing or not a date: the days strftime('%Y-%m-%d') gives
+    days = pd.to_datetime(pd.Series(values), unit=unit, errors='coerce')
+    if days.dt.tz is not None:
+        days = days.dt.tz_localize(None)
+    return days.to_numpy().astype('datetime64[D]')
+
+
+def update_ranks(updates_df):
+    # Row positions in update order (epoch seconds, missing last), then every lot's first and last rank in it
+    updated = updates_df['UpdatedDatetime'].astype(float).to_numpy()
+    order = np.argsort(updated, kind='stable')
+    updates = pd.DataFrame({'Lot': updates_df['Lot'].to_numpy()[order], 'rank': np.arange(len(order))})
+    ranks = updates.groupby('Lot', sort=False)['rank'].agg(['first', 'last']).sort_values('last')
+    return updated, order[ranks['first'].to_numpy()], order[ranks['last'].to_numpy()]
+
+
+def first_and_last_updates(updates_df):
+    """The rows of an update log that are the first or last update of their lot, in file order.
+
+    emirates_sold_lots gives the same lots for these rows as for the whole log, so the log can be reduced chunk by
+    chunk: the rows kept so far followed by the next chunk.
+    """
+    _, first, last = update_ranks(updates_df)
+    return updates_df.iloc[np.union1d(first, last)].reset_index(drop=True)
+
+
+def emirates_sold_lots(details_df, updates_df):
+    """Sold lots from the Emirates Auction price-update log: the final price is the last update of a lot that ended
+    on its auction date, the start price its first update made before that date.
+
+    One grouped pass over the lots finds the first and last update of each; only those rows are parsed and joined
+    with the lot details. Lots come out in the order of their last update, lots updated at the same time in file
+    order.
+    """
+    return join_emirates_details(emirates_sold_updates(updates_df), details_df)
+
+
+def emirates_sold_updates(updates_df):
+    # The last update of every sold lot, with the lot's start price
+    updated, first, last = update_ranks(updates_df)
+    end_dates = updates_df['EndDate'].to_numpy()
+    end_updated, end_day = auction_days(updated[last], unit='s'), auction_days(end_dates[last])
+    start_updated, start_end_day = auction_days(updated[first], unit='s'), auction_days(end_dates[first])
+    milage = updates_df['Milage'].to_numpy()
+    sold = ((end_updated == end_day) & pd.notna(milage[last]) &
+            (start_updated != start_end_day) & pd.notna(milage[first]))
+
+    sold_df = updates_df.iloc[last[sold]].reset_index(drop=True)
+    sold_df['UpdatedDatetime'] = np.datetime_as_string(end_updated[sold], unit='D')
+    sold_df['EndDate'] = np.datetime_as_string(end_day[sold], unit='D')
+    sold_df['Start Price'] = updates_df['CurrentPrice'].to_numpy()[first[sold]]
+    return sold_df
+
+
+def join_emirates_details(sold_df, details_df):
+    # Lot details next to the sold updates, in their order; the start price stays the last column
+    details_df = details_df.drop_duplicates(subset=['Lot'], keep='last', ignore_index=True)
+    details_df = details_df.dropna(subset=['Lot', 'Odometer'])
+    joined_df = pd.merge(sold_df.drop(columns=['Start Price']), details_df, on='Lot', how='left')
+    joined_df.rename(columns={'CurrentPrice': 'Final Price'}, inplace=True)
+    joined_df['Start Price'] = sold_df['Start Price'].to_numpy()
+    return joined_df
+
+
+def dubizzle_adapter(name, files):
+    return SourceAdapter(
+        name, 'id', LISTING_COLUMNS, files=files, source='Dubizzle',
+        rename={'Doors': 'No of Doors'},
+        constants={'Source': 'Dubizzle'},
+        value_maps={'Seller Type': [('Dealership/Certified Pre-Owned', 'Dealer')]},
+        derived=[
+            ('Posted Datetime', lambda df: pd.to_datetime(df['added'], unit='s',
+                                                          errors='coerce').dt.strftime('%Y-%m-%dT%H:%M:%S')),
+            ('No of Doors', lambda df: df['No of Doors'].str.strip(' doors')),
+            ('Seating Capacity', lambda df: df['Seating Capacity'].str.strip(' Seater')),
+        ])
+
+
+# Listing feeds in the order they appear in cars_for_sale.csv
+LISTING_ADAPTERS = [
+    dubizzle_adapter('Dubizzle', ["./car_data/dubizzle_cars_for_sale.csv", "./car_data/dubizzle_cars_on_sale.csv"]),
+    SourceAdapter(
+        'Dubicars', 'item_id', LISTING_COLUMNS, files=["./car_data/dubicars_for_sale.csv"], drop_ids=['714672.0'],
+        rename={'item_id': 'id', 'car_make': 'Make', 'car_model': 'Model', 'car_year': 'Year', 'mileage': 'Kilometers',
+                'car_trim': 'Trim', 'regional_specs': 'Regional Specs', 'price': 'Price', 'item_link': 'permalink',
+                'seller_type': 'Seller Type', 'steering_side': 'Steering Side', 'body_type': 'Body Type',
+                'fuel_type': 'Fuel Type', 'seats': 'Seating Capacity', 'gearbox': 'Transmission Type',
+                'color': 'Exterior Color'},
+        constants={'No of Doors': None, 'Interior Color': None, 'Posted Datetime': 'Unknown', 'Source': 'Dubicars'},
+        value_maps={
+            'Seller Type': [('Private', 'Owner')],
+            'Body Type': [('SUV/Crossover', 'SUV'), ('Truck', 'Utility Truck'), ('Station Wagon', 'Wagon')],
+            'Fuel Type': [('Gasoline', 'Petrol')],
+            'Seating Capacity': [('9+', '8+')],
+        },
+        derived=[
+            ('Steering Side', lambda df: df['Steering Side'].str.title()),
+            ('Exterior Color', lambda df: df['Exterior Color'].str.title()),
+            ('Transmission Type', lambda df: df['Transmission Type'] + ' Transmission'),
+            ('Regional Specs', lambda df: normalize_values(df['Regional Specs'] + ' Specs',
+                                                         [('Other Specs', 'Other')])),
+        ]),
+    SourceAdapter(
+        'Carswitch', 'id', LISTING_COLUMNS, files=["./car_data/carswitch_cars_for_sale.csv"],
+        rename={'make': 'Make', 'model': 'Model', 'year': 'Year', 'mileage': 'Kilometers', 'specs': 'Regional Specs',
+                'price': 'Price', 'url': 'permalink'},
+        constants={'Trim': 'Unknown', 'Posted Datetime': 'Unknown', 'Seller Type': 'Unknown', 'Source': 'Carswitch',
+                   'No of Doors': None, 'Body Type': None, 'Fuel Type': None, 'Interior Color': None,
+                   'Exterior Color': None, 'Transmission Type': None, 'Steering Side': None, 'Seating Capacity': None},
+        value_maps={'Regional Specs': [('America Specs', 'American Specs'), ('Canadia Specs', 'Canadian Specs'),
+                                       ('Europea Specs', 'European Specs'), ('European', 'European Specs'),
+                                       ('American', 'American Specs'), ('GCC', 'GCC Specs')]},
+        derived=[
+            ('Regional Specs', lambda df: normalize_values(
+                df['Regional Specs'].str.strip(' Specs') + ' Specs',
+                [('Japan Specs', 'Japanese Specs'), ('Non GCC Specs', 'Other')])),
+            (['Make', 'Model'], lambda df: normalize_carswitch_names(df['Make'], df['Model'], df['title'])),
+            ('Kilometers', lambda df: parse_carswitch_kilometers(df['Kilometers'])),
+        ]),
+    SourceAdapter(
+        'Cars24', 'appointmentId', LISTING_COLUMNS, files=["./car_data/cars24_cars_for_sale.csv"],
+        rename={'appointmentId': 'id', 'make': 'Make', 'model': 'Model', 'year': 'Year',
+                'odometerReading': 'Kilometers', 'specs': 'Regional Specs', 'price': 'Price', 'url': 'permalink',
+                'carExteriorColor': 'Exterior Color', 'transmissionType': 'Transmission Type',
+                'fuelType': 'Fuel Type'},
+        constants={'Posted Datetime': 'Unknown', 'Source': 'Cars24', 'No of Doors': None, 'Body Type': None,
+                   'Interior Color': None, 'Steering Side': None, 'Seating Capacity': None},
+        value_maps={'Exterior Color': [('Other', 'Other Color')], 'Regional Specs': [('GCC', 'GCC Specs')]},
+        derived=[
+            ('Seller Type', lambda df: normalize_values(df['assortmentCategory'],
+                                                      [('PRIME', 'Dealer'), ('LITE', 'Dealer'),
+                                                       ('PRIVATE_SELLER_PRO', 'Owner'), ('PRIVATE_SELLER', 'Owner')])),
+            ('Trim', lambda df: df['variant']),
+            ('Transmission Type', lambda df: (df['Transmission Type'] + ' Transmission')
+             .apply(lambda x: None if x == 'None Transmission' else x)),
+            ('Make', lambda df: df['Make'].str.strip().str.title()),
+            ('Model', lambda df: df['Model'].str.strip().str.title()),
+        ]),
+]
+
+TELEGRAM_ADAPTER = SourceAdapter(
+    'Telegram', 'id', LISTING_COLUMNS, reader=read_telegram_listings,
+    constants={'Source': 'Telegram', 'Seller Type': 'Unknown', 'Trim': 'Unknown', 'No of Doors': None,
+               'Body Type': None, 'Fuel Type': None, 'Interior Color': None, 'Exterior Color': None,
+               'Transmission Type': None, 'Steering Side': None, 'Seating Capacity': None},
+    value_maps={
+        'Price': [('AED', ''), (',', ''), ('迪', '')],
+        'Regional Specs': [('GCC', 'GCC Specs'), ('American', 'American Specs'), ('MiddleEast', 'GCC Specs'),
+                           ('Gcc', 'GCC Specs'), ('US-spec', 'American Specs'), ('Canadian', 'Canadian Specs'),
+                           ('USSpec', 'American Specs'), ('NorthAmerican', 'American Specs'),
+                           ('NorthAmerica', 'American Specs'), ('US', 'American Specs'), ('Notprovided', 'Unknown'),
+                           ('Domesticversion', 'GCC Specs'), ('RightFrontDamaged', 'Unknown'), ('MidEast', 'GCC Specs'),
+                           ('GCC SpecsEdition', 'GCC Specs'), ('GCC SpecsGCC Specs', 'GCC Specs'), ('gcc', 'GCC Specs'),
+                           ('NotProvided', 'Unknown'), ('FullOption', 'Unknown'), ('Overseasversion', 'Unknown')],
+    },
+    derived=[
+        ('permalink', lambda df: 'https://t.me/' + df['chat_username']),
+        ('Posted Datetime', lambda df: pd.to_datetime(df['Posted Datetime'], errors='coerce')),
+        ('Regional Specs', lambda df: df['Regional Specs'].fillna('Unknown')),
+        ('Year', lambda df: df['Year'].apply(lambda x: '20' + x if len(x) == 2 else x)),
+        ('Kilometers', lambda df: df['Kilometers'].apply(lambda x: x + '00000' if len(x) <= 2 else x)),
+        ('Price', lambda df: (df['Price'].str.strip().str.replace('x', '').replace('NotProvided', '').str.strip()
+                              .apply(lambda x: x + '0000' if len(x) <= 2 else x))),
+    ])
+
+SOLD_ADAPTER = dubizzle_adapter('Dubizzle Sold', ["./car_data/dubizzle_cars_sold_out.csv"])
+
+AUCTION_ADAPTERS = [
+    SourceAdapter(
+        'Marhaba Auctions', '_id', AUCTION_COLUMNS, reader=read_marhaba_sold_lots,
+        chunk_reader=read_marhaba_sold_chunks,
+        rename={'_id': 'Id', 'make_title': 'Make', 'model_title': 'Model', 'bid_starting': 'Start Price',
+                'bid_amount': 'Final Price', 'body_type': 'Body Type', 'primary_damage': 'Primary Damage',
+                'secondary_damage': 'Secondary Damage', 'exterior_color': 'Exterior Color',
+                'interior_color': 'Interior Color', 'transmission': 'Transmission', 'specification': 'Regional Specs',
+                'cylinders': 'Cylinders', 'participation_count': 'Participation Count', 'engine_type': 'Engine Type',
+                'fuel': 'Fuel Type', 'year': 'Year', 'auction_date': 'Auction Date'},
+        constants={'Seating Capacity': None, 'No of Doors': None, 'Source': 'Marhaba Auctions'},
+        value_maps={'odometer': [(' ', ''), ('UNKNOWN', '')]},
+        derived=[
+            ('Kilometers', lambda df: pd.to_numeric(df['odometer'], errors='coerce')),
+            ('Start Price', lambda df: df['Start Price'].astype(int)),
+            ('Bid Difference', lambda df: df['Final Price'] - df['Start Price']),
+            ('Bid Difference Percentage', bid_difference_percentage),
+            ('Make', lambda df: df['Make'].str.title()),
+            ('Model', lambda df: df['Model'].str.title()),
+            ('Body Type', lambda df: df['Body Type'].str.title()),
+            ('Transmission', lambda df: df['Transmission'] + ' Transmission'),
+            ('Regional Specs', lambda df: df['Regional Specs'].str.title() + ' Specs'),
+            ('Fuel Type', lambda df: normalize_values(df['Fuel Type'].str.title(), [(' E/P', '')])),
+            ('Interior Color', lambda df: normalize_values(df['Interior Color'].str.title(), [('And', '&')])),
+            ('Exterior Color', lambda df: normalize_values(df['Exterior Color'].str.title(), [('And', '&')])),
+        ]),
+    SourceAdapter(
+        'Emirates Auction', 'Lot', AUCTION_COLUMNS, reader=read_emirates_sold_lots,
+        chunk_reader=read_emirates_sold_chunks,
+        rename={'Lot': 'Id', 'BodyType': 'Body Type', 'Exterior': 'Exterior Color', 'FuelType': 'Fuel Type',
+                'CountryOfMade': 'Regional Specs', 'EndDate': 'Auction Date', 'Milage': 'Kilometers',
+                'Interior': 'Interior Color', 'Seats': 'Seating Capacity', 'Doors': 'No of Doors'},
+        constants={'Engine Type': None, 'Cylinders': None, 'Primary Damage': None, 'Secondary Damage': None,
+                   'Participation Count': None, 'Source': 'Emirates Auction'},
+        value_maps={'Regional Specs': [
+            ('United Arab Emirates', 'GCC Specs'), ('Japan', 'Japanese Specs'), ('China mainland', 'Chinese Specs'),
+            ('SOUTH KOREA', 'Korean Specs'), ('Canada', 'Canadian Specs'), ('Thailand', 'Other'),
+            ('South Africa', 'Other'), ('Australia', 'Other'), ('Mexico', 'Other'), ('Germany', 'European Specs'),
+            ('Sweden', 'European Specs'), ('United Kingdo', 'European Specs'), ('India', 'Other'),
+            ('Spain', 'European Specs'), ('Italy', 'European Specs'), ('Brazil', 'Other'), ('Afghanistan', 'Other'),
+            ('Morocco', 'Other'), ('Turkey', 'Other'), ('Belgiu', 'European Specs'), ('Indonesia', 'Other'),
+            ('Taiwan', 'Other'), ('Portugal', 'European Specs'), ('Netherlands', 'European Specs'),
+            ('Slovakia', 'European Specs'), ('Hungary', 'European Specs'), ('France', 'European Specs'),
+            ('Austria', 'European Specs'), ('Romania', 'European Specs'), ('United States', 'American Specs')]},
+        derived=[
+            ('Start Price', lambda df: df['Start Price'].astype(int)),
+            ('Final Price', lambda df: df['Final Price'].astype(int)),
+            ('Bid Difference', lambda df: df['Final Price'] - df['Start Price']),
+            ('Bid Difference Percentage', bid_difference_percentage),
+            ('Transmission', lambda df: df['Transmission'] + ' Transmission'),
+            ('Make', lambda df: normalize_values(df['Make'].str.title(),
+                                                 [('Bmw', 'BMW'), ('Gmc', 'GMC'), ('Mg', 'MG')])),
+        ]),
+]
+
+ADAPTERS = {adapter.name: adapter for adapter in LISTING_ADAPTERS + [TELEGRAM_ADAPTER, SOLD_ADAPTER] + AUCTION_ADAPTERS}
+
+
+def row_hashes(raw_df, id_column):
+    return pd.Series(pd.util.hash_pandas_object(raw_df, index=False).astype(str).values,
+                     index=raw_df[id_column].values)
+
+
+def load_source(name):
+    adapter = ADAPTERS[name]
+    return adapter.normalize(adapter.read())
+
+
+def ingest_source(name, previous_hashes=None):
+    # Read a feed and normalize only the rows whose raw content differs from previous_hashes
+    adapter = ADAPTERS[name]
+    raw_df = adapter.read()
+    ids = raw_df[adapter.id_column]
+    hashes = row_hashes(raw_df, adapter.id_column)
+    if previous_hashes is None:
+        changed = np.ones(len(raw_df), dtype=bool)
+    else:
+        changed = hashes.ne(previous_hashes.reindex(hashes.index)).values
+    return ids, hashes, changed, adapter.normalize(raw_df[changed])
+
+
+def ingest_source_chunks(name, chunk_rows, previous_hashes=None):
+    """ingest_source one chunk at a time: (ids, hashes, changed, normalized chunk) per chunk of the feed.
+
+    Every row is normalized, so the chunks do not depend on the rows of a previous run.
+    """
+    adapter = ADAPTERS[name]
+    for raw_df in adapter.read_chunks(chunk_rows):
+        ids = raw_df[adapter.id_column]
+        hashes = row_hashes(raw_df, adapter.id_column)
+        if previous_hashes is None:
+            changed = np.ones(len(raw_df), dtype=bool)
+        else:
+            changed = hashes.ne(previous_hashes.reindex(hashes.index)).values
+        yield ids, hashes, changed, adapter.normalize(raw_df)
+
+
+def run_sources(jobs, max_workers=None):
+    """Run every (func, *args) job in its own worker process and return the results in job order."""
+    jobs = list(jobs)
+    if max_workers is None:
+        max_workers = min(len(jobs), os.cpu_count() or 1)
+    if max_workers <= 1:
+        return [func(*args) for func, *args in jobs]
+
+    # Not forked from the caller, which may be running other jobs on other threads (forking a multi-threaded process
+    # can deadlock the child): workers come from a fork server that has only imported this module, or are spawned
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload([__name__])
+    else:
+        context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as executor:
+        futures = [executor.submit(func, *args) for func, *args in jobs]
+        return [future.result() for future in futures]
@@ -6,17 +6,29 @@ document.addEventListener('DOMContentLoaded', function() {
     const totalRecordsElement = document.getElementById('sale-total-records');
     const paginationContainer = document.getElementById('carsPagination');
 
-    let allCars = [];
-    let filteredCars = [];
     let currentPage = 1;
     const itemsPerPage = 10;
     let filterData = {};
+    let activeFilters = {};
     let minYear, maxYear;
     let currentSortColumn = '';
     let currentSortOrder = 'asc';
 
-    // Fetch initial data and populate filters
-    fetchCarsForSale();
+    // Table header -> sort field of /get-cars-for-sale
+    const sortFields = {
+        'Make': 'Make',
+        'Model': 'Model',
+        'Year': 'Year',
+        'Kilometers': 'Kilometers',
+        'Regional Specs': 'Regional Specs',
+        'Price (AED)': 'Price',
+        'Seller Type': 'Seller Type',
+        'Posted Date': 'Posted Datetime',
+        'Source': 'Source'
+    };
+
+    // Fetch the first page together with the filter options
+    fetchCarsForSale(true);
 
     // Handle form submission
     filterForm.addEventListener('submit', function(e) {
@@ -33,19 +45,30 @@ document.addEventListener('DOMContentLoaded', function() {
         }, 0);
     });
 
-    function fetchCarsForSale() {
+    function fetchCarsForSale(withOptions = false) {
         showLoading();
         hideError();
 
-        fetch('/get-cars-for-sale')
+        const params = new URLSearchParams(activeFilters);
+        params.set('page', currentPage);
+        params.set('page_size', itemsPerPage);
+        if (sortFields[currentSortColumn]) {
+            params.set('sort', sortFields[currentSortColumn]);
+            params.set('order', currentSortOrder);
+        }
+        if (withOptions) {
+            params.set('options', '1');
+        }
+
+        fetch(`/get-cars-for-sale?${params.toString()}`)
             .then(response => response.json())
             .then(data => {
                 hideLoading();
                 if (data.success) {
-                    allCars = data.cars;
-                    filteredCars = allCars;
-                    populateFilters(data);
-                    displayCars();
+                    if (withOptions) {
+                        populateFilters(data);
+                    }
+                    displayCars(data.cars, data.total);
                 } else {
                     showError(data.error || 'An error occurred while fetching cars for sale.');
                 }
@@ -64,37 +87,23 @@ document.addEventListener('DOMContentLoaded', function() {
         const sourceFilter = document.getElementById('source-filter');
         const sellerTypeFilter = document.getElementById('seller-type-filter');
 
+        const options = data.options;
+
         // Populate make filter
-        const uniqueMakes = [...new Set(allCars.map(car => car.Make))].sort();
-        populateSelectOptions(makeFilter, uniqueMakes);
+        populateSelectOptions(makeFilter, options.Make);
 
         // Create filterData structure for make-model relationship
-        filterData = uniqueMakes.reduce((acc, make) => {
+        filterData = options.Make.reduce((acc, make) => {
             acc[make] = {
-                models: []
+                models: options.Model[make] || []
             };
             return acc;
         }, {});
 
-        allCars.forEach(car => {
-            if (!filterData[car.Make].models.includes(car.Model)) {
-                filterData[car.Make].models.push(car.Model);
-            }
-        });
-
-        // Sort the models alphabetically
-        for (let make in filterData) {
-            filterData[make].models.sort();
-        }
-
         // Populate other filters
-        const uniqueRegionalSpecs = [...new Set(allCars.map(car => car['Regional Specs']))].sort();
-        const uniqueSellerTypes = [...new Set(allCars.map(car => car['Seller Type']))].sort();
-        const uniqueSources = [...new Set(allCars.map(car => car.Source))].sort();
-
-        populateSelectOptions(regionalSpecsFilter, uniqueRegionalSpecs);
-        populateSelectOptions(sellerTypeFilter, uniqueSellerTypes);
-        populateSelectOptions(sourceFilter, uniqueSources);
+        populateSelectOptions(regionalSpecsFilter, options['Regional Specs']);
+        populateSelectOptions(sellerTypeFilter, options['Seller Type']);
+        populateSelectOptions(sourceFilter, options.Source);
 
         // Add event listener for make filter
         makeFilter.addEventListener('change', updateModelFilter);
@@ -103,8 +112,8 @@ document.addEventListener('DOMContentLoaded', function() {
         populateYearRangeFilters(data.year_range);
 
         // Set min and max values for kilometers and price inputs
-        setMinMaxValues('km', allCars.map(car => car.Kilometers));
-        setMinMaxValues('price', allCars.map(car => car.Price));
+        setMinMaxValues('km', options.Kilometers);
+        setMinMaxValues('price', options.Price);
     }
 
     function populateYearRangeFilters(yearRange) {
@@ -229,31 +238,28 @@ document.addEventListener('DOMContentLoaded', function() {
         const source = document.getElementById('source-filter').value;
         const sellerType = document.getElementById('seller-type-filter').value;
 
-        filteredCars = allCars.filter(car => {
-            return (
-                (make === '' || car.Make === make) &&
-                (model === '' || car.Model === model) &&
-                (yearMin === '' || car.Year >= parseInt(yearMin)) &&
-                (yearMax === '' || car.Year <= parseInt(yearMax)) &&
-                (kmMin === '' || car.Kilometers >= parseInt(kmMin)) &&
-                (kmMax === '' || car.Kilometers <= parseInt(kmMax)) &&
-                (priceMin === '' || car.Price >= parseInt(priceMin)) &&
-                (priceMax === '' || car.Price <= parseInt(priceMax)) &&
-                (regionalSpecs === '' || car['Regional Specs'] === regionalSpecs) &&
-                (source === '' || car.Source === source) &&
-                (sellerType === '' || car['Seller Type'] === sellerType)
-            );
-        });
+        const filters = {
+            make: make,
+            model: model,
+            year_min: yearMin,
+            year_max: yearMax,
+            km_min: kmMin,
+            km_max: kmMax,
+            price_min: priceMin,
+            price_max: priceMax,
+            regional_specs: regionalSpecs,
+            source: source,
+            seller_type: sellerType
+        };
+
+        // Only send the filters that are set
+        activeFilters = Object.fromEntries(Object.entries(filters).filter(([, value]) => value !== ''));
 
         currentPage = 1;
-        displayCars();
+        fetchCarsForSale();
     }
 
-    function displayCars() {
-        const startIndex = (currentPage - 1) * itemsPerPage;
-        const endIndex = startIndex + itemsPerPage;
-        const carsToDisplay = filteredCars.slice(startIndex, endIndex);
-
+    function displayCars(carsToDisplay, totalCars) {
         const table = document.getElementById('cars-for-sale-table');
         const thead = table.querySelector('thead');
         const tbody = table.querySelector('tbody');
@@ -302,13 +308,13 @@ document.addEventListener('DOMContentLoaded', function() {
             });
         });
 
-        totalRecordsElement.textContent = `Total Records: ${filteredCars.length}`;
+        totalRecordsElement.textContent = `Total Records: ${totalCars}`;
 
         paginationContainer.innerHTML = '';
-        if (filteredCars.length > 0) {
-            paginationContainer.appendChild(createPagination(filteredCars.length, itemsPerPage, currentPage, (page) => {
+        if (totalCars > 0) {
+            paginationContainer.appendChild(createPagination(totalCars, itemsPerPage, currentPage, (page) => {
                 currentPage = page;
-                displayCars();
+                fetchCarsForSale();
             }));
         }
     }
@@ -361,35 +367,13 @@ document.addEventListener('DOMContentLoaded', function() {
             currentSortOrder = 'asc';
         }
 
-        filteredCars.sort((a, b) => {
-            let valueA, valueB;
-
-            switch(column) {
-                case 'Year':
-                case 'Kilometers':
-                    valueA = parseFloat(a[column]) || 0;
-                    valueB = parseFloat(b[column]) || 0;
-                    break;
-                case 'Price (AED)':
-                    valueA = parseFloat(a.Price) || 0;
-                    valueB = parseFloat(b.Price) || 0;
-                    break;
-                case 'Posted Date':
-                    valueA = a['Posted Datetime'] && a['Posted Datetime'].toLowerCase() !== 'unknown' ? new Date(a['Posted Datetime']) : new Date(0);
-                    valueB = b['Posted Datetime'] && b['Posted Datetime'].toLowerCase() !== 'unknown' ? new Date(b['Posted Datetime']) : new Date(0);
-                    break;
-                default:
-                    valueA = a[column];
-                    valueB = b[column];
-            }
-
-            if (valueA < valueB) return currentSortOrder === 'asc' ? -1 : 1;
-            if (valueA > valueB) return currentSortOrder === 'asc' ? 1 : -1;
-            return 0;
-        });
+        // Links are not sortable
+        if (!sortFields[column]) {
+            return;
+        }
 
         currentPage = 1;
-        displayCars();
+        fetchCarsForSale();
     }
 
     function formatCurrency(value) {
@@ -402,13 +386,13 @@ document.addEventListener('DOMContentLoaded', function() {
         }).format(value);
     }
 
-    function setMinMaxValues(prefix, values) {
+    function setMinMaxValues(prefix, range) {
         const minElement = document.getElementById(`${prefix}-min`);
         const maxElement = document.getElementById(`${prefix}-max`);
-        const validValues = values.filter(v => v !== null && !isNaN(v));
-        const minValue = Math.min(...validValues);
-        const maxValue = Math.max(...validValues);
-        minElement.min = minElement.placeholder = minValue;
-        maxElement.max = maxElement.placeholder = maxValue;
+        if (range.min === null || range.max === null) {
+            return;
+        }
+        minElement.min = minElement.placeholder = range.min;
+        maxElement.max = maxElement.placeholder = range.max;
     }
 });
\ No newline at end of file
@@ -0,0 +1,36 @@
+import os
+import sys
+
+import pytest
+
+# The modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def app_env(tmp_path, monkeypatch):
+    """app.py serving a small model and listing files from a temporary working directory."""
+    from helpers import fit_pipeline, listing_frame, training_frame, write_model
+
+    import app
+    from data_store import DatasetStore
+    from inference import PredictionCache
+    from model_registry import MODEL_PATHS, ModelRegistry
+
+    (tmp_path / 'car_data').mkdir()
+    listing_frame(300, seed=1).to_csv(tmp_path / 'car_data' / 'dubizzle_cars_sold_out.csv', index=False)
+    listing_frame(400, seed=2).to_csv(tmp_path / 'car_data' / 'cars_for_sale.csv', index=False)
+    model = fit_pipeline(training_frame(500))
+    write_model(str(tmp_path / MODEL_PATHS['valuation']), model)
+    monkeypatch.chdir(tmp_path)
+
+    # Fresh module state for every test: nothing loaded from another test's files
+    datasets = DatasetStore()
+    for name, dataset in app.datasets._datasets.items():
+        datasets.register(name, dataset.path, dataset.loader, dataset.unique_key)
+    monkeypatch.setattr(app, 'datasets', datasets)
+    monkeypatch.setattr(app, 'prediction_cache', PredictionCache(app.PREDICTION_CACHE_SIZE, app.PREDICTION_CACHE_TTL))
+    models = ModelRegistry(background=False, log=lambda message: None)
+    models.register('valuation', warm_up=app.warm_up_valuation_model)
+    monkeypatch.setattr(app, 'models', models)
+    return app
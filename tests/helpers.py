@@ -0,0 +1,194 @@
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+import xgboost
+from sklearn.compose import ColumnTransformer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+from features import CATEGORICAL_FEATURES, MODEL_FEATURES, FeaturePipeline
+
+NUMERIC_FEATURES = [feature for feature in MODEL_FEATURES if feature not in CATEGORICAL_FEATURES]
+MAKE_MODELS = {'Toyota': ['Land Cruiser', 'Camry'], 'Nissan': ['Patrol', 'Sunny']}
+TRIMS = {'Land Cruiser': ['GXR', 'VXR', 'EXR'], 'Camry': ['LE', 'SE'], 'Patrol': ['LE', 'SE', 'Platinum'],
+         'Sunny': ['S']}
+SPECS = ['GCC Specs', 'American Specs']
+
+
+def training_frame(rows, seed=0, missing_trims=False):
+    rng = np.random.default_rng(seed)
+    makes = rng.choice(list(MAKE_MODELS), rows)
+    models = [rng.choice(MAKE_MODELS[make]) for make in makes]
+    df = pd.DataFrame({
+        'Year': rng.integers(2000, 2025, rows),
+        'Kilometers': rng.integers(0, 300_000, rows),
+        'Make': makes,
+        'Model': models,
+        'Trim': pd.Series([rng.choice(TRIMS[model]) for model in models], dtype=object),
+        'Regional Specs': rng.choice(SPECS, rows),
+    })
+    if missing_trims:
+        df.loc[::5, 'Trim'] = np.nan
+    FeaturePipeline(2025).transform(df)
+    return df[MODEL_FEATURES]
+
+
+def fit_pipeline(df, n_estimators=20):
+    preprocessor = ColumnTransformer([('numeric', StandardScaler(), NUMERIC_FEATURES),
+                                      ('categorical', OneHotEncoder(handle_unknown='ignore'), CATEGORICAL_FEATURES)])
+    model = Pipeline([('preprocessor', preprocessor),
+                      ('regressor', xgboost.XGBRegressor(n_estimators=n_estimators, max_depth=3))])
+    target = (50_000 + df['Kilometers'] * -0.1 + (df['Make'] == 'Toyota') * 20_000 +
+              df['Trim'].map({'VXR': 30_000, 'Platinum': 25_000, 'SE': 5_000}).fillna(0))
+    return model.fit(df, target)
+
+
+def listing_frame(rows, seed=0, id_prefix=''):
+    # Listings as car_price_monitor.py writes them, over the makes, models and trims the test models know
+    rng = np.random.default_rng(seed)
+    makes = rng.choice(list(MAKE_MODELS), rows)
+    models = [rng.choice(MAKE_MODELS[make]) for make in makes]
+    kilometers = rng.integers(0, 250_000, rows).astype('float64')
+    kilometers[rng.random(rows) < 0.05] = np.nan
+    return pd.DataFrame({
+        'id': [f"{id_prefix}{seed}-{i}" for i in range(rows)],
+        'Make': makes,
+        'Model': models,
+        'Trim': [rng.choice(TRIMS[model]) for model in models],
+        'Year': rng.integers(2005, 2025, rows),
+        'Kilometers': kilometers,
+        'Regional Specs': rng.choice(SPECS, rows),
+        'Price': rng.choice([0, 15_000, 45_000, 80_000, 120_000, 250_000], rows),
+        'Seller Type': rng.choice(['Dealer', 'Owner', None], rows),
+        'Posted Datetime': pd.Series(pd.Timestamp('2026-01-01') + pd.to_timedelta(rng.integers(0, 90, rows), unit='D'))
+        .dt.strftime('%Y-%m-%dT%H:%M:%S').where(rng.random(rows) > 0.05),
+        'Source': rng.choice(['Dubizzle', 'Dubicars', 'Cars24'], rows),
+        'permalink': [f"https://example.com/{seed}/{i}" for i in range(rows)],
+        'Body Type': rng.choice(['SUV', 'Sedan'], rows),
+        'Fuel Type': 'Petrol',
+        'Transmission Type': 'Automatic Transmission',
+    })
+
+
+def write_model(path, model):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    joblib.dump(model, path)
+
+
+def carswitch_loop_reference(carswitch_df):
+    # The original row-by-row Carswitch normalization from check_new_listings
+    carswitch_df = carswitch_df.copy()
+    for index, row in carswitch_df.iterrows():
+        title_list = row['title'].split()
+        for title in title_list:
+            if row['Make'] == title.lower():
+                row['Make'] = title
+            elif '-' in row['Make']:
+                row['Make'] = row['Make'].replace('-', ' ').title()
+            elif row['Model'] == title.lower():
+                carswitch_df.at[index, 'Model'] = title
+            elif '-' in row['Model']:
+                carswitch_df.at[index, 'Model'] = row['Model'].replace('-', ' ').title()
+
+        if isinstance(row['Kilometers'], str):
+            value_without_metric = row['Kilometers'].split()[0].replace(',', '').replace('KM', '').replace('Miles', '').strip()
+            if value_without_metric != 'KM':
+                if 'Miles' in row['Kilometers']:
+                    if value_without_metric != '':
+                        carswitch_df.at[index, 'Kilometers'] = int(value_without_metric) * 1.6
+                    else:
+                        carswitch_df.at[index, 'Kilometers'] = None
+                elif 'KM' in row['Kilometers']:
+                    if value_without_metric != '':
+                        carswitch_df.at[index, 'Kilometers'] = int(value_without_metric)
+                    else:
+                        carswitch_df.at[index, 'Kilometers'] = None
+            else:
+                carswitch_df.at[index, 'Kilometers'] = 0
+    return carswitch_df
+
+
+def synthetic_carswitch_df(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    cars = [('toyota', 'land-cruiser', 'Toyota Land Cruiser GXR'), ('toyota', 'camry', 'toyota Camry SE'),
+            ('mercedes-benz', 'c-class', 'Mercedes-Benz C-Class C 200'),
+            ('mercedes-benz', 'g-class', 'mercedes-benz G 63'),
+            ('land-rover', 'range-rover', 'Land Rover Range Rover Vogue'), ('bmw', 'x5', 'BMW X5 xDrive40i'),
+            ('bmw', '3-series', 'bmw bmw 3-Series 330i'), ('nissan', 'patrol', 'Nissan PATROL LE Platinum'),
+            ('rolls-royce', 'ghost', 'rolls-royce Rolls-Royce Ghost'), ('kia', 'k5', 'Kia')]
+    mileages = ['12,000 KM', '85000 KM', '8,000 Miles', 'KM', 'Miles', '45000', '120 000 KM', None]
+    picked = rng.integers(len(cars), size=rows)
+    return pd.DataFrame({
+        'Make': [cars[i][0] for i in picked],
+        'Model': [cars[i][1] for i in picked],
+        'title': [f"{2000 + i % 25} {cars[i][2]}" for i in picked],
+        'Kilometers': [mileages[i] for i in rng.integers(len(mileages), size=rows)],
+    })
+
+
+def synthetic_marhaba_lots(rows, seed=0):
+    # Sold lots as the scraper writes them: repr() of the winning bid, now and then with a missing or odd field
+    rng = np.random.default_rng(seed)
+    notes = [None, 'cash', 'relisted\nonce', "buyer's premium", 'paid "in full"', 'None given', 'nota\xa0bene']
+    note_choice = rng.choice(len(notes), rows, p=[0.8, 0.12, 0.02, 0.02, 0.02, 0.01, 0.01])
+    payloads = []
+    for i in range(rows):
+        sold = {'bid_amount': int(rng.integers(5_000, 400_000)),
+                'auction_date': f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}",
+                'bidder': f"u{i}", 'won': bool(rng.random() < 0.95), 'note': notes[note_choice[i]]}
+        if i % 97 == 0:
+            del sold['note']
+        if i % 101 == 0:
+            sold['bid_amount'] = None
+        payloads.append(repr(sold))
+    return pd.DataFrame({'_id': [str(i) for i in range(rows)], 'sold': payloads, 'year': '2020'})
+
+
+def emirates_update_log(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp('2026-01-01').timestamp()
+    # Few distinct times, so lots are often updated at the same second
+    updated = (start + rng.integers(0, 6, rows) * 43_200).astype(object)
+    updated[rng.random(rows) < 0.05] = np.nan
+    end_days = pd.Timestamp('2026-01-01') + pd.to_timedelta(rng.integers(0, 4, rows), unit='D')
+    lots = rng.integers(0, rows // 4, rows).astype(str).astype(object)
+    lots[rng.random(rows) < 0.02] = np.nan
+    return pd.DataFrame({
+        'Lot': lots,
+        'UpdatedDatetime': [value if pd.isna(value) else str(value) for value in updated],
+        'EndDate': end_days.strftime('%Y-%m-%dT12:00:00'),
+        'Milage': rng.choice(['12000', '0', np.nan], rows, p=[0.6, 0.3, 0.1]),
+        'CurrentPrice': rng.integers(1_000, 90_000, rows).astype(str),
+        'Make': rng.choice(['TOYOTA', 'NISSAN'], rows),
+    })
+
+
+def write_auction_feeds(car_data, lots, seed=0):
+    # Marhaba details with a sold lot now and then unsold, and an Emirates update log with the details of its lots,
+    # over the makes and models the test models know
+    rng = np.random.default_rng(seed)
+    makes = rng.choice(list(MAKE_MODELS), lots)
+    marhaba_df = synthetic_marhaba_lots(lots, seed).assign(
+        year=rng.integers(2005, 2025, lots).astype(str), make_title=[make.upper() for make in makes],
+        model_title=[rng.choice(MAKE_MODELS[make]).upper() for make in makes],
+        odometer=rng.choice(['12 000', '85000', 'UNKNOWN'], lots), odometer_type='Kilometers',
+        bid_starting=rng.integers(1_000, 50_000, lots).astype(str), body_type='suv', primary_damage='FRONT',
+        secondary_damage='REAR', exterior_color='black and white', interior_color='beige', transmission='Automatic',
+        specification=rng.choice(['gcc', 'american'], lots), cylinders='6',
+        participation_count=rng.integers(0, 20, lots).astype(str), engine_type='V6', fuel='petrol e/p')
+    marhaba_df.loc[rng.random(lots) < 0.3, 'sold'] = '[]'
+    marhaba_df.to_csv(os.path.join(car_data, 'marhaba_auctions_cars_details.csv'), index=False)
+
+    updates_df = emirates_update_log(lots * 4, seed).drop(columns=['Make'])
+    updates_df.to_csv(os.path.join(car_data, 'emirates_auction_cars.csv'), index=False)
+    lot_ids = updates_df['Lot'].dropna().unique()
+    makes = rng.choice(list(MAKE_MODELS), len(lot_ids))
+    pd.DataFrame({
+        'Lot': lot_ids, 'Odometer': rng.integers(0, 250_000, len(lot_ids)).astype(str),
+        'Make': [make.upper() for make in makes], 'Model': [rng.choice(MAKE_MODELS[make]) for make in makes],
+        'Year': rng.integers(2005, 2025, len(lot_ids)).astype(str), 'BodyType': 'SUV', 'Exterior': 'White',
+        'FuelType': 'Petrol', 'CountryOfMade': rng.choice(['United Arab Emirates', 'Japan', 'Mexico'], len(lot_ids)),
+        'Interior': 'Black', 'Seats': '5', 'Doors': '4', 'Transmission': 'Automatic',
+    }).to_csv(os.path.join(car_data, 'emirates_auction_cars_details.csv'), index=False)
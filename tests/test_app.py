@@ -0,0 +1,64 @@
+import pandas as pd
+import pytest
+
+from features import MODEL_FEATURES
+
+
+def pipeline_price(loaded, row):
+    # The pipeline scored one row at a time, as the valuation views did before the fan-out was batched
+    return float(loaded.pipeline.predict(pd.DataFrame([row])[MODEL_FEATURES])[0])
+
+
+def test_trim_range_matches_per_trim_predictions(app_env):
+    loaded = app_env.models.current('valuation')
+    row = app_env.feature_pipeline.row({'Make': 'Nissan', 'Model': 'Patrol', 'Trim': 'Unknown',
+                                        'Regional Specs': 'GCC Specs', 'Year': 2018, 'Kilometers': 90_000})
+    trims = ['LE', 'SE', 'Platinum']
+    calls = []
+    predict = loaded.predictor.predict
+
+    def counting_predict(rows):
+        calls.append(len(rows))
+        return predict(rows)
+
+    loaded.predictor.predict = counting_predict
+    trim_predictions, low, high = app_env.predict_trim_range(row, trims, loaded)
+
+    prices = [pipeline_price(loaded, {**row, 'Trim': trim}) for trim in trims]
+    assert calls == [len(trims)]
+    assert trim_predictions == {trim: f"AED {round(price):,}" for trim, price in zip(trims, prices)}
+    assert (low, high) == (pytest.approx(min(prices)), pytest.approx(max(prices)))
+    assert low < high
+
+
+def test_unknown_trim_valuation_returns_the_trim_range(app_env):
+    client = app_env.app.test_client()
+    form = {'Make': 'Toyota', 'Model': 'Land Cruiser', 'Trim': 'Unknown', 'Regional Specs': 'GCC Specs',
+            'Year': '2018', 'Kilometers': '90000'}
+    for path in ('/', '/value-your-car'):
+        body = client.post(path, data=form).get_json()
+        assert body['success'], body
+        trims = app_env.trim_index().trims_for('Toyota', 'Land Cruiser')
+        assert sorted(body['trim_predictions']) == sorted(trims)
+        prices = [int(price[4:].replace(',', '')) for price in body['trim_predictions'].values()]
+        assert body['prediction'] == f"AED {min(prices):,} - {max(prices):,}"
+
+
+def test_both_valuation_forms_return_the_same_valuation(app_env):
+    client = app_env.app.test_client()
+    form = {'Make': 'Nissan', 'Model': 'Patrol', 'Trim': 'SE', 'Regional Specs': 'GCC Specs', 'Year': '2016',
+            'Kilometers': '120000'}
+    home, value_your_car = (client.post(path, data=form).get_json() for path in ('/', '/value-your-car'))
+    assert home == value_your_car
+    assert home['success'] and home['trim_predictions'] is None
+    row = app_env.feature_pipeline.row({**form, 'Kilometers': 120_000, 'Year': 2016})
+    assert home['prediction'] == f"AED {round(pipeline_price(app_env.models.current('valuation'), row)):,}"
+    assert home['similar_cars'] and all(car['Model'] == 'Patrol' and car['Year'] == 2016
+                                        for car in home['similar_cars'])
+
+
+def test_value_your_car_rejects_missing_and_invalid_fields(app_env):
+    client = app_env.app.test_client()
+    form = {'Make': 'Nissan', 'Model': 'Patrol', 'Trim': 'SE', 'Regional Specs': 'GCC Specs', 'Year': '2016'}
+    assert client.post('/value-your-car', data=form).status_code == 400
+    assert client.post('/value-your-car', data={**form, 'Kilometers': 'many'}).status_code == 400
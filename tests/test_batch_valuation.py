@@ -0,0 +1,96 @@
+import io
+import json
+
+import pandas as pd
+import pytest
+
+from batch_valuation import RESULT_FIELDS
+
+
+def upload_records():
+    records = [{'Make': make, 'Model': model, 'Trim': trim, 'Regional Specs': 'GCC Specs', 'Year': str(year),
+                'Kilometers': str(kilometers), 'Ref': f"r{i}"}
+               for i, (make, model, trim, year, kilometers) in enumerate(
+                   [('Toyota', 'Camry', 'SE', 2016, 90_000), ('Nissan', 'Patrol', 'Unknown', 2020, 30_000),
+                    ('Toyota', 'Land Cruiser', 'VXR', 2012, 210_000), ('Nissan', 'Sunny', 'S', 2024, 0)] * 6)]
+    # Bad rows among the good ones
+    records[3]['Kilometers'] = 'many'
+    records[8]['Year'] = ''
+    records[13]['Make'], records[13]['Model'], records[13]['Trim'] = 'Kia', 'K5', 'Unknown'
+    return records
+
+
+def single_valuation(app_env, record):
+    # What the valuation form returns for the same car: a price, or the range over the trims
+    row = app_env.feature_pipeline.row({**record, 'Year': int(record['Year']), 'Kilometers': int(record['Kilometers'])})
+    loaded = app_env.models.current('valuation')
+    if record['Trim'] == 'Unknown':
+        trims = app_env.trim_index().trims_for(record['Make'], record['Model'])
+        _, low, high = app_env.predict_trim_range(row, trims, loaded)
+        return round(low), round(high)
+    price = round(app_env.predict_rows([row], loaded)[0])
+    return price, price
+
+
+def check_results(app_env, records, results):
+    assert [result['Ref'] for result in results] == [record['Ref'] for record in records]
+    version = app_env.models.current('valuation').version
+    for position, (record, result) in enumerate(zip(records, results)):
+        if position in (3, 8):
+            assert result['Error'] == "Invalid numeric input for Kilometers or Year"
+            assert result['Predicted_Price'] is None and result['Model_Version'] is None
+        elif position == 13:
+            assert result['Error'] == "No data available for this make and model combination."
+        else:
+            low, high = single_valuation(app_env, record)
+            assert (int(result['Predicted_Price_Min']), int(result['Predicted_Price_Max'])) == (low, high)
+            # Unknown trims are priced at the middle of their range
+            assert abs(int(result['Predicted_Price']) - (low + high) / 2) <= 1
+            assert result['Model_Version'] == version and result['Error'] is None
+
+
+def streamed_lines(response):
+    assert response.is_streamed
+    parts = list(response.response)
+    # Written chunk by chunk: 24 rows in chunks of 5
+    assert len(parts) == 5
+    return ''.join(part.decode() if isinstance(part, bytes) else part for part in parts)
+
+
+def test_ndjson_upload_is_streamed_with_an_error_per_bad_row(app_env, monkeypatch):
+    monkeypatch.setattr(app_env, 'BATCH_CHUNK_ROWS', 5)
+    records = upload_records()
+    body = ''.join(json.dumps(record) + '\n' for record in records)
+    response = app_env.app.test_client().post('/api/valuations/batch', data=body,
+                                              content_type='application/x-ndjson', buffered=False)
+    assert response.mimetype == 'application/x-ndjson'
+    results = [json.loads(line) for line in streamed_lines(response).splitlines()]
+    check_results(app_env, records, results)
+
+
+def test_csv_upload_is_streamed_with_an_error_per_bad_row(app_env, monkeypatch):
+    monkeypatch.setattr(app_env, 'BATCH_CHUNK_ROWS', 5)
+    records = upload_records()
+    upload = io.BytesIO(pd.DataFrame(records).to_csv(index=False).encode())
+    response = app_env.app.test_client().post('/api/valuations/batch?format=csv',
+                                              data={'file': (upload, 'cars.csv', 'text/csv')}, buffered=False)
+    assert response.mimetype == 'text/csv'
+    results = pd.read_csv(io.StringIO(streamed_lines(response)), dtype=str)
+    assert list(results.columns) == list(records[0]) + RESULT_FIELDS
+    results = results.astype(object).where(results.notna(), None).to_dict('records')
+    check_results(app_env, records, results)
+
+
+def test_lines_that_are_not_objects_are_errors(app_env):
+    body = '{"Make": "Toyota"}\nnot json\n[1, 2]\n'
+    response = app_env.app.test_client().post('/api/valuations/batch', data=body,
+                                              content_type='application/x-ndjson')
+    results = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [result['Error'] for result in results] == ["Missing required field: Model", "Line 2 is not a JSON object",
+                                                       "Line 3 is not a JSON object"]
+
+
+@pytest.mark.parametrize('query', ['input=xml', 'format=xlsx'])
+def test_unknown_formats_are_rejected(app_env, query):
+    response = app_env.app.test_client().post(f'/api/valuations/batch?{query}', data='')
+    assert response.status_code == 400
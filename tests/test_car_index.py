@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+
+from car_index import TrimIndex
+from helpers import listing_frame
+
+FEATURES = ['Make', 'Model', 'Trim', 'Regional Specs']
+
+
+def sold_out_frame():
+    df = listing_frame(500, seed=4)[FEATURES].astype(object)
+    df.loc[::9, 'Trim'] = np.nan
+    df.loc[3::11, 'Trim'] = 'None'
+    df.loc[5::13, 'Trim'] = 'Unknown'
+    return df
+
+
+def options_reference(df):
+    # The per-make and per-model DataFrame filtering TrimIndex replaced
+    options = {column: sorted(df[column].dropna().unique().tolist()) for column in FEATURES}
+    options['Trim'] = ['Unknown'] + [trim for trim in options['Trim'] if trim != 'Unknown']
+
+    filtering_rules = {}
+    for make in options['Make']:
+        make_df = df[df['Make'] == make]
+        filtering_rules[make] = {
+            'Model': sorted(make_df['Model'].unique().tolist()),
+            'Trim': {},
+            'Regional Specs': sorted(make_df['Regional Specs'].unique().tolist())
+        }
+        for model in filtering_rules[make]['Model']:
+            model_df = make_df[make_df['Model'] == model]
+            filtering_rules[make]['Trim'][model] = sorted(str(trim) for trim in model_df['Trim'].unique().tolist())
+    return options, filtering_rules
+
+
+def test_options_and_filtering_rules_match_the_dataframe_filters():
+    df = sold_out_frame()
+    index = TrimIndex(df)
+    options, filtering_rules = options_reference(df)
+    assert index.options() == options
+    assert index.filtering_rules() == filtering_rules
+
+
+def test_trims_keep_first_appearance_order():
+    df = sold_out_frame()
+    index = TrimIndex(df)
+    for (make, model), group in df.groupby(['Make', 'Model']):
+        expected = group['Trim'].unique().tolist()
+        trims = index.trims_for(make, model)
+        assert [str(trim) for trim in trims] == [str(trim) for trim in expected]
+        assert index.known_trims_for(make, model) == [trim for trim in expected if not pd.isna(trim) and trim != 'None']
+        assert (make, model) in index
+    assert index.trims_for('Lexus', 'LX') == [] and index.known_trims_for('Lexus', 'LX') == []
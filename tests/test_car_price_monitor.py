@@ -0,0 +1,134 @@
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+import car_price_monitor
+from car_index import TrimIndex
+from car_price_monitor import get_predicted_prices, load_ingest_state, save_ingest_state, score_listings
+from data_store import AUCTION_SCHEMA, parquet_path, read_typed_dataset
+from helpers import fit_pipeline, listing_frame, training_frame, write_auction_feeds, write_model
+from model_registry import MODEL_PATHS
+from source_adapters import run_sources
+
+
+def predicted_prices_reference(row, sold_out_df, model):
+    # The per-lot loop get_predicted_prices replaced: one model call per unique trim of the lot's make and model
+    relevant_cars = sold_out_df[(sold_out_df['Make'] == row['Make']) & (sold_out_df['Model'] == row['Model'])]
+    relevant_cars = relevant_cars.dropna(subset=['Trim'])
+    relevant_cars = relevant_cars[relevant_cars['Trim'] != 'None']
+    if relevant_cars.empty:
+        return pd.Series({'Min_Predicted_Price': None, 'Max_Predicted_Price': None})
+
+    predicted_prices = []
+    for trim in relevant_cars['Trim'].astype(str).unique():
+        input_data = pd.DataFrame({'Age': [row['Age']], 'Kilometers': [row['Kilometers']], 'Make': [row['Make']],
+                                   'Model': [row['Model']], 'Trim': [trim], 'Regional Specs': [row['Regional Specs']]})
+        input_data['Age_Kilometers'] = input_data['Age'] * input_data['Kilometers']
+        input_data['Kilometers_per_Year'] = input_data['Kilometers'] / input_data['Age'].replace(0, 1)
+        predicted_prices.append(model.predict(input_data)[0])
+    return pd.Series({'Min_Predicted_Price': min(predicted_prices), 'Max_Predicted_Price': max(predicted_prices)})
+
+
+def test_predicted_prices_match_the_per_lot_loop():
+    model = fit_pipeline(training_frame(500))
+    sold_out_df = listing_frame(300, seed=1).astype({'Year': str, 'Kilometers': str})
+    sold_out_df.loc[::7, 'Trim'] = np.nan
+    sold_out_df.loc[1::7, 'Trim'] = 'None'
+
+    rng = np.random.default_rng(2)
+    lots = listing_frame(60, seed=3)[['Make', 'Model', 'Kilometers', 'Regional Specs']]
+    lots['Age'] = rng.integers(0, 15, len(lots))
+    # A make and model with no sold-out trims, and an index that is not a range
+    lots.loc[5, ['Make', 'Model']] = ['Lexus', 'LX']
+    lots.index = lots.index * 3 + 10
+
+    expected = lots.apply(predicted_prices_reference, axis=1, sold_out_df=sold_out_df, model=model)
+    result = get_predicted_prices(lots, model.predict, TrimIndex(sold_out_df))
+    assert result[['Min_Predicted_Price', 'Max_Predicted_Price']].isna().sum().tolist() == [1, 1]
+    pd.testing.assert_frame_equal(result, expected.astype('float64'), check_names=False, rtol=1e-6)
+
+
+def test_predicted_prices_of_no_lots():
+    sold_out_df = listing_frame(20, seed=1)
+    lots = listing_frame(0)[['Make', 'Model', 'Kilometers', 'Regional Specs']].assign(Age=[])
+    result = get_predicted_prices(lots, lambda df: np.zeros(len(df)), TrimIndex(sold_out_df))
+    assert result.empty and list(result.columns) == ['Min_Predicted_Price', 'Max_Predicted_Price']
+
+
+def counting_predict(calls):
+    def predict(df):
+        calls.append(df['Make'].index.tolist())
+        return 10_000 + df['Kilometers'].fillna(0).to_numpy() / 10
+    return predict
+
+
+def test_score_listings_rescores_only_new_and_changed_rows():
+    cars_df = listing_frame(50, seed=5)
+    first_calls = []
+    first = cars_df.copy()
+    assert score_listings(first, counting_predict(first_calls), 2026) == len(first)
+    previous_predictions = first.set_index(['Source', 'id'])['Predicted_Price'] + 1
+
+    # Row 3 changed, row 7 is new (no previous prediction); the rest are reused
+    second = cars_df.copy()
+    second.loc[3, 'Kilometers'] = 5_000
+    previous_predictions = previous_predictions.drop((second.loc[7, 'Source'], second.loc[7, 'id']))
+    calls = []
+    scored = score_listings(second, counting_predict(calls), 2026, previous_predictions,
+                            [(second.loc[3, 'Source'], second.loc[3, 'id'])])
+    assert scored == 2 and calls == [[3, 7]]
+    assert second.loc[3, 'Predicted_Price'] == 10_500
+    assert second.loc[7, 'Predicted_Price'] == first.loc[7, 'Predicted_Price']
+    reused = second.index.difference([3, 7])
+    assert (second.loc[reused, 'Predicted_Price'] == first.loc[reused, 'Predicted_Price'] + 1).all()
+    pd.testing.assert_series_equal(second['price/expected_price'], second['Price'] / second['Predicted_Price'],
+                                  check_names=False)
+
+
+def test_ingest_state_round_trip(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'car_data').mkdir()
+    assert load_ingest_state() is None
+
+    cars_df = listing_frame(20, seed=6)
+    cars_df.to_csv('car_data/cars_for_sale.csv', index=False)
+    score_listings(cars_df, counting_predict([]), 2026)
+    cars_df.to_csv('car_data/cars_predicted.csv', index=False)
+    hashes = {source: pd.Series([f"h{i}" for i in range(len(group))], index=group['id'])
+              for source, group in cars_df.groupby('Source')}
+    meta = {'year': 2026, 'model_version': 'v1'}
+    save_ingest_state(hashes, meta)
+
+    state = load_ingest_state()
+    assert state['meta'] == meta
+    for source, source_hashes in hashes.items():
+        pd.testing.assert_series_equal(state['hashes'][source], source_hashes, check_names=False)
+        assert state['rows'][source]['id'].tolist() == source_hashes.index.tolist()
+    assert state['predictions'][(cars_df.loc[0, 'Source'], cars_df.loc[0, 'id'])] == cars_df.loc[0, 'Predicted_Price']
+    assert load_ingest_state(with_rows=False)['rows'] == {}
+
+
+def test_chunked_auction_check_matches_whole_run(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'car_data').mkdir()
+    write_auction_feeds(str(tmp_path / 'car_data'), 120, seed=7)
+    listing_frame(300, seed=1).to_csv('car_data/dubizzle_cars_sold_out.csv', index=False)
+    write_model(MODEL_PATHS['monitor'], fit_pipeline(training_frame(300)))
+    monkeypatch.setattr(car_price_monitor, '_models', None)
+    # The feeds are read in this process, where the test changed directory
+    monkeypatch.setattr(car_price_monitor, 'run_sources', partial(run_sources, max_workers=1))
+
+    whole_df = car_price_monitor.check_auction_cars()
+    assert len(whole_df) > 20 and set(whole_df['Source']) == {'Marhaba Auctions', 'Emirates Auction'}
+    assert whole_df['Predicted Price'].notna().all()
+    whole = {name: pd.read_csv(f"car_data/{name}.csv") for name in ('auction_sold_cars', 'marhaba_auctions_sold_cars')}
+    whole_typed = read_typed_dataset(parquet_path('car_data/auction_sold_cars.csv'), **AUCTION_SCHEMA)
+
+    for chunk_rows in (7, 1_000):
+        assert car_price_monitor.check_auction_cars(chunk_rows=chunk_rows) == len(whole_df)
+        # Numbers are formatted per chunk, so the CSVs are compared by value
+        for name, expected in whole.items():
+            pd.testing.assert_frame_equal(pd.read_csv(f"car_data/{name}.csv"), expected, check_dtype=False)
+        pd.testing.assert_frame_equal(read_typed_dataset(parquet_path('car_data/auction_sold_cars.csv'),
+                                                         **AUCTION_SCHEMA), whole_typed, check_exact=True)
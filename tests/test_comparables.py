@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from comparables import ComparablesIndex, trim_distance
+from helpers import listing_frame
+
+
+@pytest.fixture(scope='module')
+def df():
+    df = listing_frame(3_000, seed=8)
+    # Round mileages, so many listings tie on kilometers and on distance
+    df['Kilometers'] = (df['Kilometers'] // 10_000) * 10_000
+    df.loc[::17, 'Trim'] = np.nan
+    df['Row'] = np.arange(len(df))
+    return df
+
+
+@pytest.fixture(scope='module')
+def index(df):
+    return ComparablesIndex(df, lambda group: group['Row'].tolist())
+
+
+def lookup_reference(df, make, model, year, kilometers, limit):
+    # Every listing of the (Make, Model, Year), closest kilometers first, ties to the lower mileage then file order
+    group = df[(df['Make'] == make) & (df['Model'] == model) & (df['Year'] == year)]
+    known = group[group['Kilometers'].notna()]
+    if kilometers is not None and not pd.isna(kilometers):
+        known = known.assign(Distance=(known['Kilometers'] - kilometers).abs())
+        known = known.sort_values(['Distance', 'Kilometers', 'Row'])
+    else:
+        known = known.sort_values(['Kilometers', 'Row'])
+    return (known['Row'].tolist() + group.loc[group['Kilometers'].isna(), 'Row'].tolist())[:limit]
+
+
+def nearest_reference(df, make, model, year, kilometers, trim, k, kilometers_per_year=20_000, trim_weight=1.0):
+    # Distances to every listing of the make and model, without any pruning
+    cars = df[(df['Make'] == make) & (df['Model'] == model) & df['Kilometers'].notna()]
+    if trim is None or trim in ('', 'Unknown'):
+        penalties = np.zeros(len(cars))
+    else:
+        penalties = np.array([trim_weight * trim_distance(trim, other) for other in cars['Trim']])
+    distances = (np.abs(cars['Year'] - year) + np.abs(cars['Kilometers'] - kilometers) / kilometers_per_year +
+                 penalties)
+    cars = cars.assign(Distance=distances.to_numpy(), YearDistance=np.abs(cars['Year'] - year))
+    cars = cars.sort_values(['Distance', 'YearDistance', 'Year', 'Kilometers', 'Row'])[:k]
+    return list(zip(cars['Row'], cars['Distance']))
+
+
+QUERIES = [('Toyota', 'Camry', 2015, 40_000), ('Toyota', 'Camry', 2015, 45_000), ('Nissan', 'Patrol', 2024, 0),
+           ('Nissan', 'Sunny', 2005, 250_000), ('Toyota', 'Land Cruiser', 2012, 123_456), ('Nissan', 'Patrol', 2030, 1),
+           ('Toyota', 'Camry', 2015, np.nan), ('Kia', 'K5', 2015, 10_000)]
+
+
+@pytest.mark.parametrize('make, model, year, kilometers', QUERIES)
+@pytest.mark.parametrize('limit', [1, 3, 10, 50])
+def test_lookup_matches_brute_force(df, index, make, model, year, kilometers, limit):
+    assert index.lookup(make, model, year, kilometers, limit) == lookup_reference(df, make, model, year, kilometers,
+                                                                                  limit)
+
+
+def test_lookup_counts_the_whole_group(df, index):
+    group = df[(df['Make'] == 'Toyota') & (df['Model'] == 'Camry') & (df['Year'] == 2015)]
+    assert index.count('Toyota', 'Camry', 2015) == len(group) > 0
+    assert index.count('Kia', 'K5', 2015) == 0
+
+
+@pytest.mark.parametrize('make, model, year, kilometers', QUERIES)
+@pytest.mark.parametrize('trim', [None, 'Unknown', 'SE', 'LE Platinum'])
+@pytest.mark.parametrize('k', [1, 40])
+def test_nearest_matches_brute_force(df, index, make, model, year, kilometers, trim, k):
+    result = index.nearest(make, model, year, kilometers, trim, k)
+    if pd.isna(kilometers):
+        assert result == []
+        return
+    expected = nearest_reference(df, make, model, year, kilometers, trim, k)
+    assert [row for row, _ in result] == [row for row, _ in expected]
+    assert [distance for _, distance in result] == pytest.approx([distance for _, distance in expected])
+
+
+def test_nearest_with_other_weights(df, index):
+    result = index.nearest('Toyota', 'Camry', 2016, 80_000, 'SE', 25, kilometers_per_year=5_000,
+                                  trim_weight=4.0)
+    expected = nearest_reference(df, 'Toyota', 'Camry', 2016, 80_000, 'SE', 25, kilometers_per_year=5_000,
+                                 trim_weight=4.0)
+    assert [row for row, _ in result] == [row for row, _ in expected]
+
+
+def test_get_comparables_endpoint(app_env):
+    client = app_env.app.test_client()
+    assert client.get('/get-comparables?make=Toyota&model=Camry').status_code == 400
+    body = client.get('/get-comparables?make=Toyota&model=Camry&year=2015&km=40000&trim=SE&k=5').get_json()
+    assert body['success'] and body['k'] == 5
+    for field in ('sold_out', 'for_sale'):
+        distances = [car['Distance'] for car in body[field]]
+        assert len(distances) == 5 and distances == sorted(distances)
@@ -0,0 +1,174 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_store import (LISTING_SCHEMA, Dataset, DatasetStore, DatasetWriter, parquet_path, read_typed_csv,
+                        read_typed_dataset, write_dataset)
+
+
+def listing_rows(rows, seed=0, missing_year=False):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'id': [f"{seed}-{i:03d}" for i in range(rows)],
+        'Make': rng.choice(['Toyota', 'Nissan', None, 'NA'], rows),
+        'Model': rng.choice(['Patrol', 'Land Cruiser', 'x, "quoted"\nline', ''], rows),
+        'Trim': rng.choice(['GXR', 'nan', 'null', '007'], rows).astype(object),
+        'Source': 'Dubizzle',
+        'Year': pd.Series(rng.integers(1995, 2025, rows), dtype=object),
+        'Kilometers': rng.choice([12000.0, 0.1, 1e16, np.nan, 0.9320796527335093, 1 / 3], rows),
+        'Price': rng.integers(5_000, 400_000, rows),
+        'Regional Specs': rng.choice(['GCC Specs', np.nan], rows),
+    })
+    if missing_year:
+        df.loc[0, 'Year'] = None
+        df.loc[1, 'Year'] = 2015.0
+    return df
+
+
+def assert_typed_copies_equal(path, columns=None):
+    expected = read_typed_csv(path, LISTING_SCHEMA['numeric_fields'], LISTING_SCHEMA['int_fields'], columns=columns)
+    loaded = read_typed_dataset(parquet_path(path), **LISTING_SCHEMA, columns=columns)
+    # read_csv indexes an empty file with an empty object Index rather than a RangeIndex
+    pd.testing.assert_frame_equal(loaded, expected, check_exact=True, check_index_type=len(expected) > 0)
+
+
+@pytest.mark.parametrize('missing_year', [False, True])
+def test_write_dataset_parquet_loads_like_csv(tmp_path, missing_year):
+    path = str(tmp_path / 'cars.csv')
+    write_dataset(listing_rows(200, missing_year=missing_year), path, **LISTING_SCHEMA)
+    assert_typed_copies_equal(path)
+    assert_typed_copies_equal(path, columns=['id', 'Make', 'Year', 'Price'])
+
+
+@pytest.mark.parametrize('missing_year_chunk', [None, 0, 2])
+def test_dataset_writer_parquet_loads_like_csv(tmp_path, missing_year_chunk):
+    path = str(tmp_path / 'cars.csv')
+    chunks = [listing_rows(50, seed, missing_year=seed == missing_year_chunk) for seed in range(3)]
+    chunks[1] = chunks[1].assign(Kilometers=7.0)
+    with DatasetWriter(path, **LISTING_SCHEMA) as writer:
+        writer.write(chunks[0].iloc[:0])
+        for chunk in chunks:
+            writer.write(chunk)
+    assert writer.rows == 150
+    assert_typed_copies_equal(path)
+
+    # The same rows written at once give the same files
+    whole_path = str(tmp_path / 'whole.csv')
+    write_dataset(pd.concat(chunks, ignore_index=True), whole_path, **LISTING_SCHEMA)
+    assert open(whole_path).read() == open(path).read()
+    pd.testing.assert_frame_equal(read_typed_dataset(parquet_path(path), **LISTING_SCHEMA),
+                                  read_typed_dataset(parquet_path(whole_path), **LISTING_SCHEMA), check_exact=True)
+
+
+def test_dataset_writer_without_rows(tmp_path):
+    path = str(tmp_path / 'cars.csv')
+    with DatasetWriter(path, columns=list(listing_rows(1).columns), **LISTING_SCHEMA):
+        pass
+    assert_typed_copies_equal(path)
+
+
+def test_dataset_writer_without_typed_copy(tmp_path):
+    path = str(tmp_path / 'cars.csv')
+    chunks = [listing_rows(10, seed) for seed in range(2)]
+    with DatasetWriter(path, typed_copy=False) as writer:
+        for chunk in chunks:
+            writer.write(chunk)
+    assert open(path).read() == pd.concat(chunks).to_csv(index=False)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['cars.csv']
+
+
+def test_dataset_writer_discards_on_error(tmp_path):
+    path = str(tmp_path / 'cars.csv')
+    write_dataset(listing_rows(10), path, **LISTING_SCHEMA)
+    before = open(path).read()
+    with pytest.raises(RuntimeError):
+        with DatasetWriter(path, **LISTING_SCHEMA) as writer:
+            writer.write(listing_rows(5, seed=1))
+            raise RuntimeError
+    assert open(path).read() == before
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['cars.csv', 'cars.parquet']
+
+
+def write_ids(path, ids, mtime_ns=None):
+    pd.DataFrame({'id': ids, 'Price': range(len(ids))}).to_csv(path, index=False)
+    if mtime_ns is not None:
+        # Some filesystems keep the mtime of a quick rewrite, so tests set it
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_snapshot_is_reused_until_the_file_changes(tmp_path):
+    path = str(tmp_path / 'cars.csv')
+    write_ids(path, ['a', 'b', 'a'], mtime_ns=1_000_000_000)
+    loads = []
+    store = DatasetStore()
+    store.register('cars', path, lambda source: loads.append(source) or pd.read_csv(source, dtype=str),
+                   unique_key='id')
+
+    first = store.snapshot('cars')
+    assert store.snapshot('cars') is first and len(loads) == 1
+    assert first.unique['id'].tolist() == ['b', 'a'] and first.unique['Price'].tolist() == ['1', '2']
+    builds = []
+    assert first.derived('ids', lambda snapshot: builds.append(1) or set(snapshot.frame['id'])) == {'a', 'b'}
+    assert first.derived('ids', lambda snapshot: builds.append(1) or set()) == {'a', 'b'} and len(builds) == 1
+
+    # Same size, new mtime
+    write_ids(path, ['c', 'd', 'e'], mtime_ns=2_000_000_000)
+    second = store.snapshot('cars')
+    assert second is not first and second.version != first.version and len(loads) == 2
+    assert second.derived('ids', lambda snapshot: builds.append(1) or set(snapshot.frame['id'])) == {'c', 'd', 'e'}
+    assert len(builds) == 2
+    # A request still holding the old snapshot keeps its values
+    assert first.derived('ids', lambda snapshot: set()) == {'a', 'b'}
+
+    # Same mtime, new size
+    write_ids(path, ['c', 'd', 'e', 'f'], mtime_ns=2_000_000_000)
+    assert store.snapshot('cars').frame['id'].tolist() == ['c', 'd', 'e', 'f']
+
+
+def test_snapshot_retries_a_file_replaced_while_it_was_read(tmp_path):
+    path = str(tmp_path / 'cars.csv')
+    write_ids(path, ['a'], mtime_ns=1_000_000_000)
+    reads = []
+
+    def loader(source):
+        frame = pd.read_csv(source, dtype=str)
+        reads.append(frame['id'].tolist())
+        if len(reads) == 1:
+            write_ids(path, ['b', 'c'], mtime_ns=2_000_000_000)
+        return frame
+
+    snapshot = Dataset(path, loader).snapshot()
+    assert reads == [['a'], ['b', 'c']]
+    assert snapshot.frame['id'].tolist() == ['b', 'c']
+    assert snapshot.version == Dataset(path, loader).version()
+
+
+def test_snapshot_gives_up_on_a_file_that_keeps_changing(tmp_path):
+    path = str(tmp_path / 'cars.csv')
+    write_ids(path, ['a'], mtime_ns=1_000_000_000)
+    reads = []
+
+    def loader(source):
+        reads.append(source)
+        write_ids(path, ['a'] * (len(reads) + 1))
+        return pd.read_csv(source, dtype=str)
+
+    with pytest.raises(IOError):
+        Dataset(path, loader, max_read_attempts=3).snapshot()
+    assert len(reads) == 3
+
+
+def test_dataset_prefers_a_current_parquet_copy(tmp_path):
+    path = str(tmp_path / 'cars.csv')
+    write_dataset(listing_rows(10), path, **LISTING_SCHEMA)
+    dataset = Dataset(path, lambda source: read_typed_dataset(source, **LISTING_SCHEMA))
+    assert dataset.source() == parquet_path(path)
+    assert dataset.snapshot().frame['Price'].dtype == 'int64'
+
+    # A CSV newer than its Parquet copy, as an older monitor without pyarrow leaves it
+    stat = os.stat(parquet_path(path))
+    os.utime(path, ns=(stat.st_mtime_ns + 1_000_000_000,) * 2)
+    assert dataset.source() == path
+    assert dataset.snapshot().version[0] == path
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from features import MODEL_FEATURES, FeaturePipeline
+
+CURRENT_YEAR = 2025
+
+
+def cars():
+    return pd.DataFrame({
+        'Year': [2025, 2024, 2015, 2026, 2000, 2018],
+        'Kilometers': [0.0, 12_000.0, 150_000.0, 10.0, np.nan, 75_500.5],
+        'Make': ['Toyota', 'Nissan', 'Toyota', 'Kia', 'BMW', 'Toyota'],
+        'Model': ['Camry', 'Patrol', 'Land Cruiser', 'K5', 'X5', 'Camry'],
+        'Trim': ['SE', 'LE', 'GXR', 'Unknown', np.nan, 'LE'],
+        'Regional Specs': ['GCC Specs'] * 6,
+    })
+
+
+def features_reference(df):
+    # The pandas expressions the models were trained with
+    df = df.copy()
+    df['Age'] = CURRENT_YEAR - df['Year']
+    df['Age_Kilometers'] = df['Age'] * df['Kilometers']
+    df['Kilometers_per_Year'] = df['Kilometers'] / df['Age'].replace(0, 1)
+    return df
+
+
+def test_transform_matches_the_pandas_formulas():
+    expected = features_reference(cars())
+    result = FeaturePipeline(CURRENT_YEAR).transform(cars())
+    pd.testing.assert_frame_equal(result, expected)
+
+
+def test_transform_keeps_an_existing_age():
+    df = features_reference(cars()).drop(columns=['Year', 'Age_Kilometers', 'Kilometers_per_Year'])
+    expected = features_reference(cars()).drop(columns=['Year'])
+    pd.testing.assert_frame_equal(FeaturePipeline(1990).transform(df), expected)
+
+
+@pytest.mark.parametrize('position', range(6))
+def test_row_matches_the_frame(position):
+    record = cars().iloc[position].to_dict()
+    expected = features_reference(cars()).iloc[position]
+    row = FeaturePipeline(CURRENT_YEAR).row(record)
+    assert list(row) == MODEL_FEATURES
+    for feature in ['Age', 'Kilometers', 'Age_Kilometers', 'Kilometers_per_Year']:
+        assert row[feature] == expected[feature] or (np.isnan(row[feature]) and np.isnan(expected[feature]))
+    for feature in ['Make', 'Model', 'Trim', 'Regional Specs']:
+        assert row[feature] == str(expected[feature])
+
+
+def test_row_from_age():
+    row = FeaturePipeline(CURRENT_YEAR).row({'Age': 0, 'Kilometers': 500, 'Make': 'Kia', 'Model': 'K5',
+                                             'Trim': 'LX', 'Regional Specs': 'GCC Specs'})
+    assert (row['Age'], row['Age_Kilometers'], row['Kilometers_per_Year']) == (0, 0, 500)
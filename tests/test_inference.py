@@ -0,0 +1,168 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from features import FeaturePipeline
+from helpers import fit_pipeline, training_frame, write_model
+from inference import PredictionCache, RowPredictor, export_native_model, load_native_model
+from model_registry import MODEL_PATHS
+
+
+def test_row_and_frame_encoding_match_the_pipeline():
+    model = fit_pipeline(training_frame(500))
+    predictor = RowPredictor.from_model(model)
+    assert predictor is not None
+
+    df = training_frame(200, seed=1, missing_trims=True)
+    df.loc[3, 'Make'] = 'Unseen'
+    # Missing and unseen categories encode as all zeros, as handle_unknown='ignore' does
+    assert np.array_equal(predictor.predict_frame(df, round_floats=False), model.predict(df))
+    assert np.array_equal(predictor.predict(df.to_dict('records')), predictor.predict_frame(df))
+
+
+def test_models_with_a_missing_category_use_the_pipeline(tmp_path):
+    # OneHotEncoder keeps NaN as a category when the training data has missing trims
+    model = fit_pipeline(training_frame(500, missing_trims=True))
+    assert any(pd.isna(category) for category in model.steps[0][1].named_transformers_['categorical'].categories_[2])
+    assert RowPredictor.from_model(model) is None
+    with pytest.raises(ValueError):
+        export_native_model(model, str(tmp_path / 'model.joblib'))
+
+
+def test_native_exports_with_a_missing_category_are_not_loaded(tmp_path):
+    model_path = str(tmp_path / 'model.joblib')
+    open(model_path, 'w').close()
+    booster_path, table_path = export_native_model(fit_pipeline(training_frame(500)), model_path)
+    assert load_native_model(model_path) is not None
+
+    # An export written before missing categories were rejected
+    with open(table_path) as table_file:
+        table = json.load(table_file)
+    table['categories'][2].append(float('nan'))
+    with open(table_path, 'w') as table_file:
+        json.dump(table, table_file)
+    assert load_native_model(model_path) is None
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def cache_rows(count, kilometers=10_000):
+    pipeline = FeaturePipeline(2025)
+    return [pipeline.row({'Make': 'Toyota', 'Model': 'Camry', 'Trim': 'SE', 'Regional Specs': 'GCC Specs',
+                          'Year': 2015 + i, 'Kilometers': kilometers}) for i in range(count)]
+
+
+def recording_predict(calls):
+    def predict(rows):
+        calls.append([row['Age'] for row in rows])
+        return [row['Age'] * 1000 + row['Kilometers'] for row in rows]
+    return predict
+
+
+def test_cache_scores_missing_rows_in_one_call():
+    cache, calls = PredictionCache(max_entries=10), []
+    rows = cache_rows(3)
+    assert cache.predict(rows[:2], recording_predict(calls)).tolist() == [20_000, 19_000]
+    result = cache.predict(rows + rows[2:], recording_predict(calls))
+    assert result.tolist() == [20_000, 19_000, 18_000, 18_000]
+    # Only the row not seen before is scored, once though it is requested twice
+    assert calls == [[10, 9], [8]]
+    assert cache.stats() == {'entries': 3, 'hits': 2, 'misses': 4, 'evictions': 0}
+
+
+def test_cache_evicts_the_least_recently_used_rows():
+    cache, calls = PredictionCache(max_entries=3), []
+    rows = cache_rows(5)
+    cache.predict(rows[:3], recording_predict(calls))
+    # Using the oldest entry makes the second one the least recently used
+    cache.predict(rows[:1], recording_predict(calls))
+    cache.predict(rows[3:4], recording_predict(calls))
+    assert cache.stats()['evictions'] == 1
+    assert [row['Age'] for row in cache.recent_rows(10)] == [7, 10, 8]
+
+    calls.clear()
+    cache.predict(rows[:4], recording_predict(calls))
+    assert calls == [[9]]
+    # Scored rows are stored after the hits, pushing out the row that was least recently used then
+    assert [row['Age'] for row in cache.recent_rows(10)] == [9, 7, 8]
+
+
+def test_cache_entries_expire_after_the_ttl():
+    clock, calls = Clock(), []
+    cache = PredictionCache(max_entries=10, ttl=60, clock=clock)
+    rows = cache_rows(2)
+    cache.predict(rows[:1], recording_predict(calls))
+    clock.now = 30
+    cache.predict(rows, recording_predict(calls))
+    clock.now = 61
+    # The first row expired; the second was stored at 30 and is still fresh
+    cache.predict(rows, recording_predict(calls))
+    assert calls == [[10], [9], [10]]
+    clock.now = 200
+    cache.predict(rows, recording_predict(calls))
+    assert calls[-1] == [10, 9]
+
+
+def test_cache_is_dropped_when_the_model_generation_changes():
+    cache, calls = PredictionCache(max_entries=10), []
+    rows = cache_rows(2)
+    cache.predict(rows, recording_predict(calls), version=1)
+    cache.predict(rows, recording_predict(calls), version=2)
+    assert calls == [[10, 9], [10, 9]]
+    assert cache.stats()['entries'] == 2
+
+    # A request still holding the replaced model is scored without reading or filling the cache
+    stale_calls = []
+    assert cache.predict(rows, lambda rows: [0] * len(rows), version=1).tolist() == [0, 0]
+    cache.predict(rows, recording_predict(stale_calls), version=2)
+    assert stale_calls == []
+
+    cache.prime(rows[:1], [123], version=3)
+    assert cache.predict(rows, recording_predict(calls), version=3).tolist() == [123, 19_000]
+    assert calls[-1] == [9]
+
+
+def test_kilometers_buckets_share_one_prediction():
+    cache, calls = PredictionCache(max_entries=10, kilometers_bucket=1000), []
+    first, same_bucket, next_bucket = (cache_rows(1, kilometers)[0] for kilometers in (12_100, 12_900, 13_000))
+    assert cache.predict([first], recording_predict(calls)).tolist() == [22_100]
+    assert cache.predict([same_bucket, next_bucket], recording_predict(calls)).tolist() == [22_100, 23_000]
+    assert calls == [[10], [10]]
+    assert cache.stats()['hits'] == 1
+    # Bucketed keys do not hold the exact rows to warm a new model with
+    assert cache.recent_rows(10) == []
+
+
+def test_cached_trim_fan_out_after_a_model_swap(app_env):
+    row = app_env.feature_pipeline.row({'Make': 'Nissan', 'Model': 'Patrol', 'Trim': 'Unknown',
+                                        'Regional Specs': 'GCC Specs', 'Year': 2019, 'Kilometers': 60_000})
+    trims = ['LE', 'SE', 'Platinum']
+    old = app_env.models.current('valuation')
+    old_prices = app_env.predict_trim_range(row, trims, old)
+
+    path = MODEL_PATHS['valuation']
+    model = fit_pipeline(training_frame(500, seed=1), n_estimators=40)
+    write_model(path, model)
+    os.utime(path, ns=(os.stat(path).st_atime_ns, os.stat(path).st_mtime_ns + 10**9))
+    new = app_env.models.current('valuation')
+    assert new.generation == old.generation + 1
+
+    # The swap's warm-up re-scored the cached trim rows with the new model, so the fan-out is served from the cache
+    stats = app_env.prediction_cache.stats()
+    new.predictor.predict = lambda rows: pytest.fail('scored again')
+    trim_predictions, low, high = app_env.predict_trim_range(row, trims, new)
+    assert app_env.prediction_cache.stats()['hits'] == stats['hits'] + len(trims)
+
+    prices = model.predict(pd.DataFrame([{**row, 'Trim': trim} for trim in trims]))
+    assert trim_predictions == {trim: f"AED {round(price):,}" for trim, price in zip(trims, prices)}
+    assert (low, high) == (pytest.approx(prices.min()), pytest.approx(prices.max()))
+    assert trim_predictions != old_prices[0]
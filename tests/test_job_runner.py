@@ -0,0 +1,66 @@
+import threading
+import time
+
+import pytest
+
+from job_runner import JobRunner
+
+
+def recording_runner(events, fail=()):
+    def job(name, delay=0.0):
+        def func():
+            events.append(('start', name))
+            time.sleep(delay)
+            events.append(('end', name))
+            if name in fail:
+                raise RuntimeError(f"{name} failed")
+        return func
+
+    runner = JobRunner(log=lambda message: None)
+    runner.add('listings', job('listings', 0.05))
+    runner.add('sold', job('sold', 0.05))
+    runner.add('auctions', job('auctions'), after='sold')
+    return runner
+
+
+def test_dependent_job_runs_after_its_dependency():
+    events = []
+    results = recording_runner(events).run_all()
+    assert [(result.name, result.status) for result in results] == [('listings', 'ok'), ('sold', 'ok'),
+                                                                     ('auctions', 'ok')]
+    assert events.index(('start', 'auctions')) > events.index(('end', 'sold'))
+    # Independent jobs still overlap
+    assert events.index(('start', 'listings')) < events.index(('end', 'sold'))
+
+
+def test_dependent_job_is_skipped_when_its_dependency_fails():
+    events = []
+    results = {result.name: result for result in recording_runner(events, fail={'sold'}).run_all()}
+    assert results['sold'].status == 'failed'
+    assert results['auctions'].status == 'skipped'
+    assert ('start', 'auctions') not in events
+    assert results['listings'].status == 'ok'
+
+
+def test_dependent_job_runs_alone_when_selected_alone():
+    events = []
+    results = recording_runner(events).run_all(['auctions'])
+    assert [(result.name, result.status) for result in results] == [('auctions', 'ok')]
+    assert events == [('start', 'auctions'), ('end', 'auctions')]
+
+
+def test_dependency_must_be_added_first():
+    runner = JobRunner(log=lambda message: None)
+    with pytest.raises(ValueError):
+        runner.add('auctions', lambda: None, after='sold')
+
+
+def test_serve_runs_dependent_jobs_after_each_run():
+    events = []
+    runner = recording_runner(events)
+    thread = threading.Thread(target=runner.serve)
+    thread.start()
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+    assert events.count(('start', 'auctions')) == 1
+    assert events.index(('start', 'auctions')) > events.index(('end', 'sold'))
@@ -0,0 +1,93 @@
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from helpers import listing_frame
+from listing_table import ListingTable
+
+
+def listings():
+    df = listing_frame(400, seed=7)
+    df.loc[::13, 'Posted Datetime'] = 'Unknown'
+    df = df[df['Price'] > 0]
+    return df[['Make', 'Model', 'Year', 'Kilometers', 'Regional Specs', 'Price', 'Seller Type', 'Posted Datetime',
+               'Source', 'permalink']]
+
+
+def js_number(value):
+    # parseFloat(value) || 0, and a null compared with a number
+    return 0.0 if value is None or pd.isna(value) else float(value)
+
+
+def js_date(value):
+    if not isinstance(value, str) or value.lower() == 'unknown':
+        return pd.Timestamp(0)
+    return pd.Timestamp(value)
+
+
+def filter_reference(cars, equals, ranges):
+    # applyFilters() of the client-side table in static/js/cars_for_sale.js
+    return [car for car in cars
+            if all(car[field] == value for field, value in equals.items())
+            and all((low is None or js_number(car[field]) >= low) and (high is None or js_number(car[field]) <= high)
+                    for field, (low, high) in ranges.items())]
+
+
+def sort_reference(cars, field, descending):
+    # sortTable(): Array.prototype.sort is stable, and so is a reversed Python sort
+    if field in ListingTable.RANGE_FIELDS:
+        key = lambda car: js_number(car[field])
+    elif field == 'Posted Datetime':
+        key = lambda car: js_date(car[field])
+    else:
+        key = lambda car: car[field]
+    return sorted(cars, key=key, reverse=descending)
+
+
+@pytest.mark.parametrize('equals, ranges', [
+    ({}, {}),
+    ({'Make': 'Toyota'}, {}),
+    ({'Make': 'Nissan', 'Model': 'Patrol', 'Source': 'Dubizzle'}, {'Year': (2010, 2020)}),
+    ({'Seller Type': 'Dealer'}, {'Kilometers': (None, 100_000), 'Price': (40_000, None)}),
+    ({'Regional Specs': 'GCC Specs'}, {'Kilometers': (50_000, None)}),
+    ({'Make': 'Lexus'}, {}),
+])
+def test_filter_page_and_facets_match_the_client_side_table(equals, ranges):
+    df = listings()
+    table = ListingTable(df)
+    cars = df.to_dict('records')
+    expected = filter_reference(cars, equals, ranges)
+
+    mask = table.select(equals, ranges)
+    assert mask.sum() == len(expected)
+    for page in (1, 2, 40):
+        rows = table.page(mask, page, 10).to_dict('records')
+        assert [car['permalink'] for car in rows] == [car['permalink'] for car in expected[(page - 1) * 10:page * 10]]
+    facets = table.facets(mask)
+    for field in ListingTable.EQUALITY_FIELDS:
+        assert facets[field] == dict(Counter(car[field] for car in expected if car[field] is not None))
+
+
+@pytest.mark.parametrize('field', ['Make', 'Model', 'Year', 'Kilometers', 'Regional Specs', 'Price',
+                                   'Posted Datetime', 'Source'])
+@pytest.mark.parametrize('descending', [False, True])
+def test_sort_matches_the_client_side_table(field, descending):
+    df = listings()
+    assert df['Kilometers'].isna().any() and (df['Posted Datetime'] == 'Unknown').any()
+    table = ListingTable(df)
+    mask = table.select({'Source': 'Dubicars'}, {})
+    expected = sort_reference(filter_reference(df.to_dict('records'), {'Source': 'Dubicars'}, {}), field, descending)
+    rows = table.page(mask, 1, len(df), field, descending)
+    assert rows['permalink'].tolist() == [car['permalink'] for car in expected]
+
+
+def test_missing_text_values_sort_last():
+    df = listings()
+    table = ListingTable(df)
+    for descending in (False, True):
+        rows = table.page(np.ones(table.size, dtype=bool), 1, table.size, 'Seller Type', descending)
+        missing = rows['Seller Type'].isna().to_numpy()
+        assert missing.any() and not missing[:-missing.sum()].any()
+        assert rows['Seller Type'].dropna().is_monotonic_decreasing == descending
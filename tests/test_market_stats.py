@@ -0,0 +1,63 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from market_stats import IncrementalMarketStats, listing_analysis, prepare_listing_rows
+
+CURRENT_YEAR = 2026
+
+
+def listings(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'id': [f"{seed}-{i}" for i in range(rows)],
+        'Make': rng.choice(['Toyota', 'Nissan', 'BMW'], rows),
+        'Model': rng.choice(['A', 'B', 'C'], rows),
+        'Year': rng.integers(1995, CURRENT_YEAR + 1, rows),
+        'Kilometers': rng.integers(0, 300_000, rows),
+        'Price': rng.integers(1, 500_000, rows),
+        'Regional Specs': rng.choice(['GCC Specs', 'American Specs'], rows),
+        'Seller Type': rng.choice(['Dealer', 'Owner'], rows),
+        'Body Type': rng.choice(['SUV', 'Sedan'], rows),
+        'Fuel Type': 'Petrol',
+        'Transmission Type': 'Automatic Transmission',
+        'Source': rng.choice(['Dubizzle', 'Dubicars'], rows),
+    })
+
+
+def as_json(analysis):
+    return json.dumps(analysis, sort_keys=True, default=str)
+
+
+def fresh_analysis(df):
+    return as_json(IncrementalMarketStats(prepare_listing_rows).update(df, CURRENT_YEAR, listing_analysis))
+
+
+def test_update_matches_fresh_build_and_keeps_earlier_results():
+    old = listings(2000)
+    new = pd.concat([old.iloc[100:], listings(300, seed=1)], ignore_index=True)
+    new.loc[:50, 'Price'] += 1000
+
+    tracker = IncrementalMarketStats(prepare_listing_rows)
+    old_analysis = tracker.update(old, CURRENT_YEAR, listing_analysis)
+    old_json = as_json(old_analysis)
+    new_analysis = tracker.update(new, CURRENT_YEAR, listing_analysis)
+
+    assert as_json(new_analysis) == fresh_analysis(new)
+    assert as_json(old_analysis) == old_json == fresh_analysis(old)
+
+
+def test_concurrent_updates_from_two_snapshots():
+    # Requests on the old and the reloaded snapshot interleave; each must get the analysis of its own snapshot
+    snapshots = [listings(3000), listings(3000, seed=2)]
+    expected = [fresh_analysis(df) for df in snapshots]
+    tracker = IncrementalMarketStats(prepare_listing_rows)
+
+    def request(i):
+        return i % 2, as_json(tracker.update(snapshots[i % 2], CURRENT_YEAR, listing_analysis))
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        for version, analysis in executor.map(request, range(40)):
+            assert analysis == expected[version]
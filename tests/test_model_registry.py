@@ -0,0 +1,148 @@
+import os
+import threading
+import time
+
+import pytest
+
+from helpers import fit_pipeline, training_frame, write_model
+from model_registry import ModelRegistry, ModelSlot
+
+MODELS = {}
+
+
+def trained(n_estimators):
+    # Fitted once per size and reused: only the file changes between versions
+    if n_estimators not in MODELS:
+        MODELS[n_estimators] = fit_pipeline(training_frame(200), n_estimators=n_estimators)
+    return MODELS[n_estimators]
+
+
+def replace_file(path, content=None, model=None):
+    stat = os.stat(path)
+    if model is not None:
+        write_model(path, model)
+    else:
+        with open(path, 'wb') as model_file:
+            model_file.write(content)
+    # A newer mtime even on filesystems with coarse timestamps
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def model_path(tmp_path):
+    path = str(tmp_path / 'models' / 'model.joblib')
+    write_model(path, trained(5))
+    return path
+
+
+def test_changed_file_is_loaded_in_the_background(model_path):
+    release, warmed = threading.Event(), []
+
+    def warm_up(loaded):
+        warmed.append(loaded.generation)
+        if loaded.generation > 1:
+            release.wait(10)
+
+    slot = ModelSlot('valuation', model_path, warm_up=warm_up, log=lambda message: None)
+    first = slot.current()
+    assert (first.generation, warmed) == (1, [1])
+
+    replace_file(model_path, model=trained(10))
+    # Requests keep the live model while the new one loads and warms up
+    assert slot.current() is first
+    wait_for(lambda: warmed == [1, 2])
+    assert slot.current() is first and slot._reloading
+    release.set()
+    wait_for(lambda: slot.current() is not first)
+    second = slot.current()
+    assert second.generation == 2 and second.version != first.version
+    assert second.pipeline.get_params()['regressor__n_estimators'] == 10
+
+
+def test_failed_reload_keeps_the_live_model_until_the_file_changes(model_path):
+    messages, loads = [], []
+    slot = ModelSlot('valuation', model_path, log=messages.append)
+    load = slot._load
+
+    def counting_load():
+        loads.append(1)
+        return load()
+
+    slot._load = counting_load
+    first = slot.current()
+
+    replace_file(model_path, b'not a model')
+    assert slot.current() is first
+    wait_for(lambda: not slot._reloading and any('Error reloading' in message for message in messages))
+    # The broken file is not loaded again on every request
+    for _ in range(5):
+        assert slot.current() is first
+    time.sleep(0.05)
+    assert len(loads) == 2 and not slot._reloading
+
+    replace_file(model_path, model=trained(10))
+    slot.current()
+    wait_for(lambda: slot.current() is not first)
+    assert len(loads) == 3 and slot.current().generation == 2
+
+
+def test_failed_warm_up_keeps_the_live_model(model_path):
+    def warm_up(loaded):
+        if loaded.generation > 1:
+            raise ValueError("warm-up failed")
+
+    registry = ModelRegistry(background=False, log=lambda message: None)
+    registry.register('valuation', model_path, warm_up=warm_up)
+    first = registry.current('valuation')
+    replace_file(model_path, model=trained(10))
+    with pytest.raises(ValueError):
+        registry.current('valuation')
+    # The version that failed is not retried; the old model stays live
+    assert registry.current('valuation') is first
+    assert registry.info()['valuation']['generation'] == 1
+
+    replace_file(model_path, model=trained(5))
+    with pytest.raises(ValueError):
+        registry.reload('valuation', force=True)
+    assert registry.current('valuation') is first
+
+
+def test_forced_reload_of_an_unchanged_file(model_path):
+    registry = ModelRegistry(background=False, log=lambda message: None)
+    registry.register('valuation', model_path)
+    first = registry.current('valuation')
+    assert registry.reload('valuation') is first
+    second = registry.reload('valuation', force=True)
+    assert second is not first and second.version == first.version and second.generation == 2
+
+
+@pytest.mark.parametrize('headers', [{}, {'X-Admin-Token': 'wrong'}, {'X-Admin-Token': ''}])
+def test_admin_endpoints_require_the_token(app_env, monkeypatch, headers):
+    monkeypatch.setattr(app_env, 'ADMIN_TOKEN', 'secret')
+    client = app_env.app.test_client()
+    assert client.get('/admin/models', headers=headers).status_code == 403
+    assert client.post('/admin/models/valuation/reload', headers=headers).status_code == 403
+
+
+def test_admin_endpoints_are_disabled_without_a_token(app_env, monkeypatch):
+    monkeypatch.setattr(app_env, 'ADMIN_TOKEN', None)
+    client = app_env.app.test_client()
+    assert client.get('/admin/models', headers={'X-Admin-Token': ''}).status_code == 403
+
+
+def test_admin_reload(app_env, monkeypatch):
+    monkeypatch.setattr(app_env, 'ADMIN_TOKEN', 'secret')
+    client = app_env.app.test_client()
+    headers = {'X-Admin-Token': 'secret'}
+    generation = app_env.models.current('valuation').generation
+    body = client.post('/admin/models/valuation/reload?force=1', headers=headers).get_json()
+    assert body['success'] and body['model']['generation'] == generation + 1
+    assert client.get('/admin/models', headers=headers).get_json()['models']['valuation'] == body['model']
+    assert client.post('/admin/models/other/reload', headers=headers).status_code == 404
@@ -0,0 +1,79 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from helpers import carswitch_loop_reference, synthetic_carswitch_df
+from normalization import normalize_carswitch_names, parse_carswitch_kilometers
+
+
+def normalize_carswitch(df):
+    df = df.copy()
+    df['Make'], df['Model'] = normalize_carswitch_names(df['Make'], df['Model'], df['title'])
+    df['Kilometers'] = parse_carswitch_kilometers(df['Kilometers'])
+    return df
+
+
+def assert_matches_loop(df):
+    expected = carswitch_loop_reference(df)
+    result = normalize_carswitch(df)
+    # Values are compared as the CSV text they are written as (the loop leaves object columns)
+    pd.testing.assert_frame_equal(result.astype(str), expected.astype(str))
+    assert result['Kilometers'].map(type).tolist() == expected['Kilometers'].map(type).tolist()
+
+
+@pytest.mark.parametrize('make, model, title', [
+    ('toyota', 'land-cruiser', 'Toyota Land Cruiser GXR'),
+    ('toyota', 'camry', 'toyota Camry SE'),
+    ('toyota', 'camry', 'toyota toyota TOYOTA Camry camry'),
+    ('mercedes-benz', 'c-class', 'Mercedes-Benz C-Class C 200'),
+    ('mercedes-benz', 'g-class', 'mercedes-benz G 63'),
+    ('mercedes-benz', 'g-class', 'mercedes-benz mercedes-benz'),
+    ('mercedes-benz', 'g-class', 'mercedes-benz Mercedes-Benz'),
+    ('land-rover', 'range-rover', 'Land Rover Range Rover Vogue'),
+    ('land-rover', 'range-rover', 'land-rover range-rover'),
+    ('bmw', '3-series', 'bmw bmw 3-Series 330i'),
+    ('rolls-royce', 'ghost', 'rolls-royce Rolls-Royce Ghost'),
+    ('kia', 'k5', 'Kia'),
+    ('kia', 'k5', 'k5 Kia K5'),
+    ('kia', 'k5', ''),
+    ('kia', 'k5', '   '),
+    ('nissan', 'patrol', 'Other Car Entirely'),
+])
+def test_names_match_loop(make, model, title):
+    assert_matches_loop(pd.DataFrame({'Make': [make], 'Model': [model], 'title': [title], 'Kilometers': [None]}))
+
+
+@pytest.mark.parametrize('kilometers', [
+    '12,000 KM', '85000 KM', '8,000 Miles', '0 Miles', 'KM', 'Miles', '45000', '120 000 KM', '1,234,567 KM',
+    '5Miles', None, np.nan, 42000, 3.5,
+])
+def test_kilometers_match_loop(kilometers):
+    assert_matches_loop(pd.DataFrame({'Make': ['kia'], 'Model': ['k5'], 'title': ['Kia K5'],
+                                      'Kilometers': pd.Series([kilometers], dtype=object)}))
+
+
+def test_mixed_rows_match_loop():
+    # Rows influence each other only through the flattened token layout, so mix every token count
+    assert_matches_loop(synthetic_carswitch_df(5_000, seed=3))
+
+
+def test_exhaustive_short_titles_match_loop():
+    words = ['kia', 'Kia', 'k5', 'K5', 'land-rover', 'Land-Rover', 'x']
+    titles = [' '.join(combination) for length in range(4)
+              for combination in itertools.product(words, repeat=length)]
+    rows = [(make, model, title) for make, model in [('kia', 'k5'), ('land-rover', 'k5'), ('kia', 'land-rover')]
+            for title in titles]
+    df = pd.DataFrame(rows, columns=['Make', 'Model', 'title'])
+    df['Kilometers'] = None
+    assert_matches_loop(df)
+
+
+def test_names_keep_index_and_missing_titles():
+    makes = pd.Series(['kia', 'toyota'], index=[7, 3], name='Make')
+    models = pd.Series(['k5', 'land-cruiser'], index=[7, 3], name='Model')
+    result_makes, result_models = normalize_carswitch_names(makes, models, pd.Series([None, 'Toyota LC'], index=[7, 3]))
+    assert result_makes.tolist() == ['kia', 'Toyota']
+    assert result_models.tolist() == ['k5', 'Land Cruiser']
+    assert result_makes.index.tolist() == [7, 3] and result_makes.name == 'Make'
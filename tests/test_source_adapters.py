@@ -0,0 +1,150 @@
+import ast
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from helpers import emirates_update_log, synthetic_marhaba_lots, write_auction_feeds
+from source_adapters import (AUCTION_ADAPTERS, emirates_sold_lots, expand_sold_column, first_and_last_updates,
+                             parse_literal, read_deduplicated_chunks)
+
+
+def test_read_deduplicated_chunks_matches_whole_read(tmp_path):
+    paths = [str(tmp_path / 'a.csv'), str(tmp_path / 'b.csv')]
+    pd.DataFrame({'id': ['1', '2', '3', '2', None], 'x': list('abcde')}).to_csv(paths[0], index=False)
+    pd.DataFrame({'id': ['3', '4', '5'], 'y': list('fgh')}).to_csv(paths[1], index=False)
+    whole = pd.concat([pd.read_csv(path, dtype=str) for path in paths], ignore_index=True)
+    whole = whole.drop_duplicates(subset=['id'], keep='last', ignore_index=True).dropna(subset=['id'])
+    whole = whole[whole['id'] != '5'].reset_index(drop=True)
+    for chunk_rows in (1, 2, 100):
+        chunked = pd.concat(read_deduplicated_chunks(paths, 'id', chunk_rows, drop_ids=['5']), ignore_index=True)
+        pd.testing.assert_frame_equal(chunked, whole)
+
+
+def test_read_deduplicated_chunks_ignores_rows_appended_during_the_read(tmp_path):
+    paths = [str(tmp_path / 'a.csv'), str(tmp_path / 'b.csv')]
+    pd.DataFrame({'id': ['1', '2'], 'x': ['a', 'b']}).to_csv(paths[0], index=False)
+    pd.DataFrame({'id': ['2', '3'], 'x': ['c', 'd']}).to_csv(paths[1], index=False)
+    chunks = read_deduplicated_chunks(paths, 'id', 1)
+    first = next(chunks)
+    # A scraper appends to the first file after the ids were read
+    with open(paths[0], 'a') as feed:
+        feed.write('9,z\n')
+    rows = pd.concat([first, *chunks])
+    assert rows['id'].tolist() == ['1', '2', '3'] and rows['x'].tolist() == ['a', 'c', 'd']
+
+
+@pytest.mark.parametrize('chunk_rows', [7, 100, 10_000])
+def test_emirates_sold_lots_from_reduced_update_log(chunk_rows):
+    updates_df = emirates_update_log(2_000)
+    details_df = pd.DataFrame({'Lot': updates_df['Lot'].dropna().unique(), 'Odometer': '1000'})
+    expected = emirates_sold_lots(details_df, updates_df)
+    assert len(expected) > 0
+
+    reduced = updates_df.iloc[:0]
+    for start in range(0, len(updates_df), chunk_rows):
+        reduced = first_and_last_updates(pd.concat([reduced, updates_df.iloc[start:start + chunk_rows]],
+                                                   ignore_index=True))
+    assert len(reduced) < len(updates_df)
+    pd.testing.assert_frame_equal(emirates_sold_lots(details_df, reduced), expected)
+
+
+@pytest.mark.parametrize('chunk_rows', [1, 7, 10_000])
+def test_auction_chunk_readers_match_whole_read(tmp_path, monkeypatch, chunk_rows):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'car_data').mkdir()
+    write_auction_feeds('car_data', 60)
+    for adapter in AUCTION_ADAPTERS:
+        whole = adapter.normalize(adapter.read())
+        assert len(whole) > 0
+        chunks = list(adapter.read_chunks(chunk_rows))
+        assert max(len(chunk) for chunk in chunks) <= chunk_rows
+        chunked = pd.concat([adapter.normalize(chunk) for chunk in chunks], ignore_index=True)
+        # A chunk whose lots all have a number keeps it as an int, where the whole read may widen it to a float
+        pd.testing.assert_frame_equal(chunked, whole, check_dtype=False)
+
+
+@pytest.mark.parametrize('text', [
+    "{'bid_amount': 120000, 'won': True, 'note': None}",
+    "{'bid_amount': -1.5, 'rate': 1e5, 'count': 0, 'big': 123456789012345678901234567890}",
+    # Python constants and JSON constants inside strings
+    "{'note': 'None given', 'True': False}",
+    "{'note': 'true', 'other': 'null and void', 'x': 'False'}",
+    # Quotes
+    "{'note': \"buyer's premium\"}",
+    "{'note': 'paid \"in full\"'}",
+    "{\"note\": 'mixed', 'other': \"quotes\"}",
+    "'a\\'b'",
+    # Escapes JSON reads the same, and ones it reads differently or not at all
+    "{'note': 'relisted\\nonce\\ttab\\\\back'}",
+    "'\\u00e9\\u20ac'",
+    "'\\ud83d\\ude00'",
+    "'\\ud83d'",
+    "'\\x41\\101\\0'",
+    "'\\/'",
+    "'\\N{EURO SIGN}'",
+    "'nota\xa0bene \U0001f600'",
+    # Literals that are not JSON
+    "(1, 'b')",
+    "{'a': (1, ('b', None))}",
+    "{1, 2}",
+    "{1: 'a', (2, 3): 'b'}",
+    "[1, 2,]",
+    "{'a': .5, 'b': 1j}",
+    "b'bytes'",
+    "{'a': {'b': {'c': [True, None]}}}",
+    '[]',
+    '{}',
+])
+def test_parse_literal_matches_literal_eval(text):
+    # repr tells True from 1, tuples from lists and 1.0 from 1
+    assert repr(parse_literal(text)) == repr(ast.literal_eval(text))
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('{"won": true, "note": null}', {'won': True, 'note': None}),
+    ("{'won': false, 'note': 'null'}", {'won': False, 'note': 'null'}),
+])
+def test_parse_literal_reads_json_constants(text, expected):
+    # JSON payloads are accepted, though literal_eval rejects their constants
+    assert repr(parse_literal(text)) == repr(expected)
+
+
+@pytest.mark.parametrize('text', [
+    'NaN', '[Infinity]', "{'a': -Infinity}",
+    "{'a': 1", '', 'name', "{'a': f(1)}",
+])
+def test_parse_literal_rejects_what_literal_eval_rejects(text):
+    with pytest.raises((ValueError, SyntaxError)) as expected:
+        ast.literal_eval(text)
+    with pytest.raises(expected.type):
+        parse_literal(text)
+
+
+def expand_sold_reference(df):
+    # The per-row literal_eval and json_normalize this replaces
+    df = df.copy()
+    df['sold'] = df['sold'].apply(ast.literal_eval)
+    return df.join(pd.json_normalize(df['sold']))
+
+
+def assert_expanded_like_reference(lots_df):
+    result, expected = expand_sold_column(lots_df), expand_sold_reference(lots_df)
+    pd.testing.assert_frame_equal(result, expected, check_exact=True)
+    # Missing fields are NaN, as json_normalize leaves them, not None
+    pd.testing.assert_frame_equal(result.astype(str), expected.astype(str))
+
+
+def test_expand_sold_column_matches_json_normalize():
+    assert_expanded_like_reference(synthetic_marhaba_lots(2_000))
+
+
+@pytest.mark.parametrize('payloads', [
+    ["{'bid_amount': 1000, 'note': None}", "{'note': 'cash'}", "{'bidder': 'u1', 'bid_amount': None}"],
+    ["{'bid_amount': 1000, 'won': True}", "{'bid_amount': 2000.5, 'won': False}"],
+    ["{'bid': {'amount': 1000, 'by': 'u1'}}", "{'bid': {'amount': 2000}, 'note': 'x'}"],
+    ["{'bid_amount': (1000, 'AED')}", "{'bid_amount': 2000}"],
+    ["{}", "{'note': 'only one'}"],
+])
+def test_expand_sold_column_edge_payloads(payloads):
+    assert_expanded_like_reference(pd.DataFrame({'_id': [str(i) for i in range(len(payloads))], 'sold': payloads}))